@@ -0,0 +1,17 @@
+"""
+Admin URL configuration for Adminova
+Imported lazily by adminova.urls, so admin modules are only discovered
+when the admin is first used
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
+
+# Customize admin site
+admin.site.site_header = 'Adminova Administration'
+admin.site.site_title = 'Adminova Admin'
+admin.site.index_title = f'Welcome to Adminova Dashboard - By {settings.SITE_AUTHOR}'
@@ -0,0 +1,54 @@
+"""
+OpenAPI schema and documentation views for Adminova
+Serve the schema precomputed at build time (manage.py build_openapi_schema)
+as a static asset; WhiteNoise adds the ETag and the gzip variant. Runtime
+schema generation is only a DEBUG fallback.
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import Http404, HttpResponseRedirect
+from apps.core.query_budget import query_budget
+
+SCHEMA_JSON = 'openapi/schema.json'
+SCHEMA_YAML = 'openapi/schema.yaml'
+
+
+def precomputed_schema_url(path=SCHEMA_JSON):
+    """Static URL of a precomputed schema file, or None if it was not built"""
+    if not staticfiles_storage.exists(path):
+        return None
+    return staticfiles_storage.url(path)
+
+
+def _wants_json(request):
+    return request.GET.get('format') == 'json' or 'json' in request.headers.get('Accept', '')
+
+
+@query_budget(0)
+def schema_view(request, *args, **kwargs):
+    """Redirect to the precomputed schema (YAML by default, like SpectacularAPIView)"""
+    url = precomputed_schema_url(SCHEMA_JSON if _wants_json(request) else SCHEMA_YAML)
+    if url:
+        return HttpResponseRedirect(url)
+    if not settings.DEBUG:
+        raise Http404('OpenAPI schema has not been built; run manage.py build_openapi_schema.')
+
+    from drf_spectacular.views import SpectacularAPIView
+    return SpectacularAPIView.as_view()(request, *args, **kwargs)
+
+
+@query_budget(0)
+def swagger_view(request, *args, **kwargs):
+    """Swagger UI pointed straight at the precomputed schema"""
+    from drf_spectacular.views import SpectacularSwaggerView
+    view = SpectacularSwaggerView.as_view(url=precomputed_schema_url(), url_name='schema')
+    return view(request, *args, **kwargs)
+
+
+@query_budget(0)
+def redoc_view(request, *args, **kwargs):
+    """ReDoc pointed straight at the precomputed schema"""
+    from drf_spectacular.views import SpectacularRedocView
+    view = SpectacularRedocView.as_view(url=precomputed_schema_url(), url_name='schema')
+    return view(request, *args, **kwargs)
@@ -14,7 +14,7 @@ SECRET_KEY = config('SECRET_KEY', default='django-insecure-development-key-chang
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',  # autodiscovered in adminova.admin_urls
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -32,12 +32,15 @@ INSTALLED_APPS = [
     'apps.users',
     'apps.subscriptions',
     'apps.payments',
+    'apps.notifications',
+    'apps.jobs',
     'apps.dashboard',
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.core.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,29 +104,106 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+
+# OpenAPI schema generated at build time (manage.py build_openapi_schema)
+# and collected as static/openapi/schema.{json,yaml}
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'build' / 'openapi'
+if OPENAPI_SCHEMA_DIR.exists():
+    STATICFILES_DIRS.append(('openapi', OPENAPI_SCHEMA_DIR))
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are streamed to a temporary file in 64KB chunks instead of being
+# buffered in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Avatar variants (apps.users.avatars): longest edge in pixels per variant,
+# each stored as WebP and JPEG. AVATAR_WORKERS=0 processes them inline.
+AVATAR_VARIANTS = {'thumb': 96, 'medium': 320}
+AVATAR_QUALITY = 82
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=2, cast=int)
+AVATAR_MAX_UPLOAD_SIZE = config('AVATAR_MAX_UPLOAD_SIZE', default=10485760, cast=int)  # 10MB
+
+# Cache (per-process by default; production uses Redis when REDIS_URL is set)
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache.InstrumentedLocMemCache',
+        'LOCATION': 'adminova',
+    }
+}
+# Whether a per-process (LocMem) default cache is still seen by every request,
+# i.e. the site runs as a single process. Cached credentials and rate limits
+# need a shared cache; see apps.core.cache.cache_is_shared().
+CACHE_SHARED = config('CACHE_SHARED', default=False, cast=bool)
+
+# Sessions: 'db' (one row read per request), 'cached_db' (reads served by
+# the default cache, written through to the database) or 'signed_cookies'
+# (no server-side storage; sessions cannot be revoked before they expire).
+# Purge expired database sessions with `manage.py purge_sessions`.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_STRATEGY = config('SESSION_STRATEGY', default='db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+# Flash messages travel in a cookie, so adding one never writes the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Metrics exposed at /metrics/ in the Prometheus text format.
+# Set METRICS_DIR to a directory shared by all gunicorn workers to
+# aggregate across processes.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson when installed (requirements/production.txt), DRF's stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 25,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Proxies in front of the app; client IPs are read from X-Forwarded-For
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+# Rate limits (apps.core.ratelimit) per scope and key: user, phone, ip, username
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'payments.initiate': {'user': '5/min', 'phone': '3/min', 'ip': '30/min'},
+    'auth.token': {'username': '5/min', 'ip': '20/min'},
 }
 
+# API token authentication (apps.users.authentication)
+# Resolved tokens are cached when the cache is shared; entries are invalidated
+# on token delete and user save
+AUTH_TOKEN_CACHE_TIMEOUT = config('AUTH_TOKEN_CACHE_TIMEOUT', default=300, cast=int)
+# Issue signed, expiring tokens from /api/auth/token/ instead of database tokens
+AUTH_SIGNED_TOKENS = config('AUTH_SIGNED_TOKENS', default=False, cast=bool)
+AUTH_SIGNED_TOKEN_MAX_AGE = config('AUTH_SIGNED_TOKEN_MAX_AGE', default=86400, cast=int)
+
 # Spectacular settings for API documentation
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Adminova API',
@@ -141,6 +221,17 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@adminova.com')
 
+# Notification emails (apps.notifications), sent as jobs by `manage.py run_workers`
+NOTIFICATIONS_MAX_ATTEMPTS = config('NOTIFICATIONS_MAX_ATTEMPTS', default=5, cast=int)
+
+# Background jobs (apps.jobs), run by `manage.py run_workers`
+JOBS_PROCESSES = config('JOBS_PROCESSES', default=1, cast=int)
+JOBS_THREADS = config('JOBS_THREADS', default=1, cast=int)
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=5, cast=int)
+JOBS_RETRY_BACKOFF = config('JOBS_RETRY_BACKOFF', default=10, cast=int)  # seconds, doubled per attempt
+JOBS_RETRY_BACKOFF_MAX = config('JOBS_RETRY_BACKOFF_MAX', default=3600, cast=int)
+JOBS_STALE_AFTER = config('JOBS_STALE_AFTER', default=900, cast=int)  # seconds a job may run
+
 # M-Pesa Configuration
 MPESA_ENVIRONMENT = config('MPESA_ENVIRONMENT', default='sandbox')
 MPESA_CONSUMER_KEY = config('MPESA_CONSUMER_KEY', default='')
@@ -148,6 +239,12 @@ MPESA_CONSUMER_SECRET = config('MPESA_CONSUMER_SECRET', default='')
 MPESA_SHORTCODE = config('MPESA_SHORTCODE', default='174379')
 MPESA_PASSKEY = config('MPESA_PASSKEY', default='')
 MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL', default='')
+# Override the Daraja base URL (e.g. the stub used by benchmarks/api_suite.py)
+MPESA_BASE_URL = config('MPESA_BASE_URL', default='')
+# Pending payments older than this are reported as stuck in telemetry
+MPESA_PENDING_ALERT_SECONDS = config('MPESA_PENDING_ALERT_SECONDS', default=300, cast=int)
+# Payments older than this are moved to mpesa_payments_archive by `manage.py archive_payments`
+PAYMENTS_ARCHIVE_AFTER_DAYS = config('PAYMENTS_ARCHIVE_AFTER_DAYS', default=180, cast=int)
 
 # Site settings
 SITE_NAME = 'Adminova'
@@ -30,6 +30,9 @@ DATABASES = {
 #     }
 # }
 
+# runserver is a single process, so its LocMem cache is shared
+CACHE_SHARED = config('CACHE_SHARED', default=True, cast=bool)
+
 # CORS settings for local development
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
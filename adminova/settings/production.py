@@ -8,6 +8,9 @@ DEBUG = False
 
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv(), default='adminova.com,www.adminova.com')
 
+# Serverless mode (Vercel sets VERCEL=1 inside its functions)
+SERVERLESS = config('SERVERLESS', default=bool(os.environ.get('VERCEL')), cast=bool)
+
 # Database configuration - PostgreSQL (Supabase)
 DATABASES = {
     'default': {
@@ -17,12 +20,43 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', default='5432'),
+        # Persistent connections: each worker thread keeps its connection
+        # instead of paying the TLS + auth handshake on every request.
+        # Serverless functions keep theirs for the life of the warm instance.
+        'CONN_MAX_AGE': None if SERVERLESS else config('DB_CONN_MAX_AGE', default=600, cast=int),
+        # Ping reused connections once per request so a connection dropped by
+        # Supabase (or a frozen serverless instance) is replaced, not errored on
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'sslmode': 'require',
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=10, cast=int),
         }
     }
 }
 
+# Supabase transaction pooler (port 6543, PgBouncer in transaction mode)
+# cannot hold server-side cursors or prepared statements across transactions
+if config('DB_TRANSACTION_POOLER', default=SERVERLESS, cast=bool):
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
+# Shared cache across workers and instances
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.core.cache.InstrumentedRedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Vercel's edge proxy sets X-Forwarded-For
+REST_FRAMEWORK['NUM_PROXIES'] = config('NUM_PROXIES', default=1 if SERVERLESS else 0, cast=int)
+
+# Sessions read from Redis when it is available
+SESSION_STRATEGY = config('SESSION_STRATEGY', default='cached_db' if REDIS_URL else 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+
 # Security settings for production
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -35,34 +69,28 @@ SECURE_HSTS_PRELOAD = True
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', cast=Csv(), default='')
 
 # Logging configuration for production
+# Request threads only enqueue records; a background listener thread formats
+# them as JSON and writes them out, so logging never blocks the payment path
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+    'filters': {
+        'rate_limit': {
+            '()': 'apps.core.log.RateLimitFilter',
         },
     },
     'handlers': {
-        'file': {
+        'queue': {
+            '()': 'apps.core.log.QueueListenerHandler',
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'django.log',
-            'formatter': 'verbose',
-        },
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'stream': 'ext://sys.stderr',
+            'filename': config('LOG_FILE', default='' if SERVERLESS else 'django.log'),
+            'queue_size': config('LOG_QUEUE_SIZE', default=10000, cast=int),
+            'filters': ['rate_limit'],
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
 }
@@ -87,6 +115,8 @@ MPESA_BUSINESS_SHORTCODE = config('MPESA_BUSINESS_SHORTCODE')
 # Google Maps API
 GOOGLE_MAP_API_KEY = config('GOOGLE_MAP_API_KEY')
 
-# File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
\ No newline at end of file
+# Request body size limit (file uploads stream to disk, see base.py)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
+
+# A frozen serverless function cannot finish background work after responding
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=0 if SERVERLESS else 2, cast=int)
\ No newline at end of file
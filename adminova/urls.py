@@ -1,14 +1,36 @@
 """
 URL Configuration for Adminova
 Created by Cavin Otieno
+
+The admin, the API apps and the schema/docs views are loaded lazily so a
+cold (serverless) start only imports what the first request needs.
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, URLResolver
+from django.urls.resolvers import RoutePattern
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from apps.core.query_budget import query_budget
+from apps.core.views import metrics_view
+from apps.users.avatars import avatar_variant_view
+from .schema import schema_view, swagger_view, redoc_view
+from .warmup import warmup_view
+
+
+def lazy_include(route, urlconf_module, namespace=None):
+    """
+    Like path(route, include(urlconf_module)), but the URLconf module is
+    imported the first time a URL under `route` is resolved or reversed
+    """
+    return URLResolver(
+        RoutePattern(route, is_endpoint=False),
+        urlconf_module,
+        app_name=namespace,
+        namespace=namespace,
+    )
 
+
+@query_budget(0)
 def test_view(request):
     """Simple test view to verify Django is working"""
     return HttpResponse("✅ Django is working on Vercel! Application deployed successfully.")
@@ -16,30 +38,30 @@ def test_view(request):
 urlpatterns = [
     # Test endpoint
     path('test/', test_view, name='test'),
+    path('warmup/', warmup_view, name='warmup'),
+    path('metrics/', metrics_view, name='metrics'),
+    
+    # Content-hashed avatar variants, served with immutable cache headers
+    path(f"{settings.MEDIA_URL.lstrip('/')}avatars/variants/<str:name>", avatar_variant_view, name='avatar-variant'),
     
     # Admin
-    path('admin/', admin.site.urls),
+    lazy_include('admin/', 'adminova.admin_urls', namespace='admin'),
     
     # API Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path('api/schema/', schema_view, name='schema'),
+    path('api/docs/', swagger_view, name='swagger-ui'),
+    path('api/redoc/', redoc_view, name='redoc'),
     
     # API endpoints
-    path('api/auth/', include('apps.users.urls')),
-    path('api/plans/', include('apps.subscriptions.urls')),
-    path('api/payments/', include('apps.payments.urls')),
+    lazy_include('api/auth/', 'apps.users.urls'),
+    lazy_include('api/plans/', 'apps.subscriptions.urls'),
+    lazy_include('api/payments/', 'apps.payments.urls'),
     
     # Dashboard views
-    path('', include('apps.dashboard.urls')),
+    lazy_include('', 'apps.dashboard.urls'),
 ]
 
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-
-# Customize admin site
-admin.site.site_header = 'Adminova Administration'
-admin.site.site_title = 'Adminova Admin'
-admin.site.index_title = f'Welcome to Adminova Dashboard - By {settings.SITE_AUTHOR}'
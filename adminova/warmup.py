@@ -0,0 +1,55 @@
+"""
+Warmup hook for Adminova
+Primes lazily loaded URLconfs, the database connection, the cache and the
+M-Pesa service so the first real request on a fresh instance is fast
+Created by Cavin Otieno
+"""
+import time
+from django.core.cache import cache
+from django.db import connection
+from django.http import JsonResponse
+from django.urls import get_resolver
+from apps.core.query_budget import query_budget
+
+
+def _load_urls():
+    # Populating the resolver imports every lazily included URLconf
+    get_resolver()._populate()
+
+
+def _connect_database():
+    connection.ensure_connection()
+
+
+def _connect_cache():
+    cache.get('warmup')
+
+
+def _build_mpesa_service():
+    from apps.payments.mpesa_service import get_mpesa_service
+    get_mpesa_service()
+
+
+def warmup(connect_database=True):
+    """
+    Run each warmup step and return its duration in milliseconds
+    
+    Args:
+        connect_database: open the DB connection for the calling thread
+    """
+    steps = [('urls', _load_urls), ('cache', _connect_cache), ('mpesa', _build_mpesa_service)]
+    if connect_database:
+        steps.insert(1, ('database', _connect_database))
+    
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    return timings
+
+
+@query_budget(0)
+def warmup_view(request):
+    """Warm this instance; hit by the Vercel cron (vercel.json) and platform health checks"""
+    return JsonResponse({'status': 'warm', 'timings_ms': warmup()})
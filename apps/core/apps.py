@@ -0,0 +1,17 @@
+"""
+App configuration for Core app
+Created by Cavin Otieno
+"""
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'apps.core'
+    verbose_name = 'Core'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+
+        # Before any connection opens, so every one times its queries for MetricsMiddleware
+        from .metrics import install_query_recorder
+        install_query_recorder()
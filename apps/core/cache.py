@@ -0,0 +1,84 @@
+"""
+Cache backends for Adminova
+Thin subclasses of Django's backends that report hits and misses to the
+per-request metrics (apps.core.metrics), plus incr_windows() for the rate
+limiter (apps.core.ratelimit)
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from .metrics import record_cache_access
+
+_MISSING = object()
+
+
+def cache_is_shared(alias='default'):
+    """
+    Whether every server process sees the same cache `alias`
+    Per-process LocMem counts only with CACHE_SHARED (a single process), so
+    an entry deleted by one gunicorn worker is not still served by another.
+    """
+    return settings.CACHE_SHARED or not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class InstrumentedCacheMixin:
+    """Count hits and misses of get() and get_many()"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            record_cache_access(misses=1)
+            return default
+        record_cache_access(hits=1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        record_cache_access(hits=len(values), misses=len(keys) - len(values))
+        return values
+
+    def incr_windows(self, windows, version=None):
+        """
+        For each (key, previous_key, timeout) increment `key`, created with
+        `timeout` if missing, and read `previous_key`.
+        Returns [(current, previous)], previous being 0 when missing.
+        """
+        results = []
+        for key, previous_key, timeout in windows:
+            self.add(key, 0, timeout, version)
+            try:
+                current = self.incr(key, 1, version)
+            except ValueError:
+                # Expired between add() and incr()
+                self.set(key, 1, timeout, version)
+                current = 1
+            results.append((current, super().get(previous_key, 0, version)))
+        return results
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+
+    def incr_windows(self, windows, version=None):
+        """Same as the mixin, in a single pipelined round trip"""
+        windows = [
+            (self.make_and_validate_key(key, version), self.make_and_validate_key(previous_key, version), timeout)
+            for key, previous_key, timeout in windows
+        ]
+        pipeline = self._cache.get_client(windows[0][0], write=True).pipeline(transaction=False)
+        for key, previous_key, timeout in windows:
+            pipeline.incr(key)
+            pipeline.expire(key, timeout)
+            pipeline.get(previous_key)
+        replies = pipeline.execute()
+        return [
+            (int(replies[index]), int(replies[index + 2] or 0))
+            for index in range(0, len(replies), 3)
+        ]
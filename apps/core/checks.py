@@ -0,0 +1,25 @@
+"""
+System checks for Adminova
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from .cache import cache_is_shared
+
+
+@register(Tags.caches, Tags.security)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """Rate limits counted per process would be multiplied by the number of workers"""
+    if not settings.RATE_LIMIT_ENABLED or cache_is_shared():
+        return []
+    return [
+        Error(
+            'RATE_LIMIT_ENABLED needs a default cache shared by every process.',
+            hint=(
+                'Set REDIS_URL, or CACHE_SHARED=True if the site runs as a single process. '
+                'With a per-process cache each gunicorn worker and serverless instance '
+                'counts its own hits, so every limit in RATE_LIMITS is multiplied.'
+            ),
+            id='core.E001',
+        )
+    ]
@@ -0,0 +1,24 @@
+"""
+Queryset iteration helpers for Adminova
+Created by Cavin Otieno
+"""
+
+
+def keyset_iterator(queryset, chunk_size=1000):
+    """
+    Yield the rows of `queryset` in primary key order, `chunk_size` rows per
+    query (WHERE pk > last ORDER BY pk LIMIT n). Unlike .iterator(), memory
+    stays flat without server-side cursors, which are disabled behind the
+    Supabase transaction pooler. Works with model and .values() querysets;
+    the latter must include the primary key.
+    """
+    pk_name = queryset.model._meta.pk.attname
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][pk_name] if isinstance(rows[-1], dict) else rows[-1].pk
@@ -0,0 +1,162 @@
+"""
+Logging utilities for Adminova
+Non-blocking queue handler, JSON formatter, rate limiting and payload
+redaction used by the production LOGGING configuration
+Created by Cavin Otieno
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Handler that only puts records on an in-memory queue
+    A background QueueListener thread formats them (lazily, as JSON) and
+    writes them to `stream` and/or `filename`, so request threads never
+    wait on I/O. When the queue is full records are dropped, not waited on.
+    """
+
+    def __init__(self, stream=None, filename=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.targets = []
+        if stream is not None:
+            self.targets.append(logging.StreamHandler(stream))
+        if filename:
+            self.targets.append(logging.FileHandler(filename, delay=True))
+        formatter = JsonFormatter()
+        for target in self.targets:
+            target.setFormatter(formatter)
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        # Started lazily, and again after a fork, since threads do not
+        # survive fork (e.g. gunicorn --preload)
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid != os.getpid():
+                self._listener = QueueListener(self.queue, *self.targets)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+                atexit.register(self._listener.stop)
+
+    def prepare(self, record):
+        # Skip QueueHandler's eager formatting; the listener formats the
+        # record. Tracebacks are rendered now because they reference frames.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener_pid = None
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Rate-limit high-frequency messages
+    Records logged with `extra={'rate_limit': seconds}` are emitted at most
+    once per interval per (logger, message template); the next emitted
+    record carries the number of suppressed repeats. Other records pass.
+    """
+
+    def __init__(self, name=''):
+        super().__init__(name)
+        self._last_emitted = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        interval = getattr(record, 'rate_limit', None)
+        if not interval:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        if now - self._last_emitted.get(key, float('-inf')) < interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+        self._last_emitted[key] = now
+        record.suppressed = self._suppressed.pop(key, 0)
+        return True
+
+
+class Redacted:
+    """
+    Log argument that masks sensitive keys and truncates a payload
+    Rendering happens only when (and where) the record is formatted.
+    """
+
+    SENSITIVE_KEYS = {'PhoneNumber', 'phone_number', 'Password', 'password', 'access_token'}
+
+    def __init__(self, payload, max_length=1000):
+        self.payload = payload
+        self.max_length = max_length
+
+    @classmethod
+    def _mask(cls, value):
+        if isinstance(value, dict):
+            return {
+                key: '***' + str(item)[-3:] if key in cls.SENSITIVE_KEYS else cls._mask(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            if value and all(isinstance(item, dict) and 'Name' in item for item in value):
+                # Daraja CallbackMetadata items: [{'Name': ..., 'Value': ...}]
+                return [
+                    {**item, 'Value': '***' + str(item.get('Value'))[-3:]}
+                    if item['Name'] in cls.SENSITIVE_KEYS else cls._mask(item)
+                    for item in value
+                ]
+            return [cls._mask(item) for item in value]
+        return value
+
+    def __str__(self):
+        text = json.dumps(self._mask(self.payload), default=str)
+        if len(text) > self.max_length:
+            return f'{text[:self.max_length]}...(truncated {len(text) - self.max_length} chars)'
+        return text
@@ -0,0 +1,28 @@
+"""
+Management command to precompute the OpenAPI schema at build time
+Run before collectstatic: python manage.py build_openapi_schema
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema as static files for collectstatic'
+
+    def handle(self, *args, **options):
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+
+        output_dir = settings.OPENAPI_SCHEMA_DIR
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for filename, renderer in [
+            ('schema.json', OpenApiJsonRenderer()),
+            ('schema.yaml', OpenApiYamlRenderer()),
+        ]:
+            path = output_dir / filename
+            path.write_bytes(renderer.render(schema, renderer_context={}))
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {path}'))
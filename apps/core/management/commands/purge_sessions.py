@@ -0,0 +1,40 @@
+"""
+Management command to delete expired sessions in chunks
+Run: python manage.py purge_sessions
+     python manage.py purge_sessions --chunk-size 5000 --sleep 0.1
+Created by Cavin Otieno
+
+Unlike `clearsessions`, which deletes every expired row in one statement,
+each chunk is its own short transaction, so a large backlog never holds
+locks on django_session for long. Schedule it daily (cron, Vercel cron).
+Signed cookie sessions keep nothing server-side; rows left from a
+database-backed strategy are still purged.
+"""
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between chunks')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['chunk_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if len(keys) < options['chunk_size']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted:,} expired sessions'))
@@ -0,0 +1,296 @@
+"""
+Management command to generate a large synthetic dataset for performance work
+Run: python manage.py seed_load_data --users 100000 --payments 1000000
+     python manage.py seed_load_data --users 1000000 --payments 10000000 --days 730
+
+Rows are correlated the way production data is:
+- sign-ups grow over the period; about 60% of users subscribe
+- a few subscribers pay many times (Pareto), at their plan's price,
+  roughly once per billing cycle and mostly in business hours
+- payments complete, fail (with Daraja result codes) or stay pending in
+  realistic proportions; completed ones carry receipts and metadata
+- a subscription is active while its last completed payment covers today,
+  otherwise expired or canceled; its user is premium while it is active
+
+Rows are written with COPY on PostgreSQL, otherwise with multi-row
+INSERTs, --batch-size rows per transaction. Ids continue after the
+existing rows and sequences are reset at the end, so it can run on a
+database that already has data. Never run it against production.
+Created by Cavin Otieno
+"""
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+from apps.payments.models import MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+from apps.users.models import Profile
+
+User = get_user_model()
+
+SUBSCRIBER_SHARE = 0.6
+CHURN_SHARE = 0.35
+PAYMENT_OUTCOMES = [
+    # status, result code, result description, weight
+    ('completed', 0, 'The service request is processed successfully.', 86),
+    ('failed', 1032, 'Request cancelled by user', 5),
+    ('failed', 1, 'The balance is insufficient for the transaction.', 3),
+    ('failed', 2001, 'The initiator information is invalid.', 1),
+    ('canceled', 1037, 'DS timeout user cannot be reached', 3),
+    ('pending', None, '', 2),
+]
+OUTCOME_CUM_WEIGHTS = list(accumulate(outcome[3] for outcome in PAYMENT_OUTCOMES))
+# Relative payment volume by hour of day (EAT)
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 7, 9, 10, 10, 10, 11, 10, 10, 10, 9, 9, 8, 7, 5, 4, 3, 2]
+HOURS = range(24)
+HOUR_CUM_WEIGHTS = list(accumulate(HOUR_WEIGHTS))
+CITIES = [('Nairobi', 50), ('Mombasa', 15), ('Kisumu', 10), ('Nakuru', 10), ('Eldoret', 8), ('Thika', 7)]
+
+
+class BatchWriter:
+    """Buffers rows of one model and writes them with COPY or multi-row INSERTs"""
+
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.fields = model._meta.concrete_fields
+        self.columns = [field.attname for field in self.fields]
+        # Declared defaults, '' for other non-null text columns, None otherwise
+        self.defaults = {field.attname: field.get_default() for field in self.fields}
+        self.rows = []
+        self.written = 0
+        self.use_copy = connection.vendor == 'postgresql'
+        if not self.use_copy:
+            self.adapters = [self.adapter(field) for field in self.fields]
+
+    @staticmethod
+    def adapter(field):
+        """Converter of a Python value to what the driver accepts, or None when it takes it as is"""
+        # The connection of this thread, rather than the proxy, for the inner loop
+        ops = connections[DEFAULT_DB_ALIAS].ops
+        if isinstance(field, models.DateTimeField):
+            return ops.adapt_datetimefield_value
+        if isinstance(field, models.DecimalField):
+            return partial(ops.adapt_decimalfield_value, max_digits=field.max_digits, decimal_places=field.decimal_places)
+        if isinstance(field, models.JSONField):
+            return partial(field.get_db_prep_save, connection=connections[DEFAULT_DB_ALIAS])
+        return None
+
+    def add(self, **values):
+        self.rows.append([values[name] if name in values else self.defaults.get(name) for name in self.columns])
+
+    @property
+    def full(self):
+        return len(self.rows) >= self.batch_size
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in self.columns)
+        with transaction.atomic(), connection.cursor() as cursor:
+            if self.use_copy:
+                with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for row in self.rows:
+                        copy.write_row([json.dumps(value) if isinstance(value, dict) else value for value in row])
+            else:
+                rows = [
+                    [adapt(value) if adapt else value for adapt, value in zip(self.adapters, row)]
+                    for row in self.rows
+                ]
+                placeholders = '(' + ', '.join(['%s'] * len(self.columns)) + ')'
+                # Stay under the backend's limit on query parameters
+                per_statement = max(1, min(500, 30000 // len(self.columns)))
+                for start in range(0, len(rows), per_statement):
+                    part = rows[start:start + per_statement]
+                    cursor.execute(
+                        f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(part))}',
+                        [value for row in part for value in row],
+                    )
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Generate correlated users, profiles, subscriptions and payments for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True)
+        parser.add_argument('--payments', type=int, required=True)
+        parser.add_argument('--days', type=int, default=365, help='Length of the generated history')
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.tz = timezone.get_current_timezone()
+        self.start = self.now - timedelta(days=options['days'])
+
+        if not Plan.objects.filter(is_active=True, price__gt=0).exists():
+            call_command('load_plans', stdout=self.stdout)
+        self.plans = list(Plan.objects.filter(is_active=True, price__gt=0).order_by('price'))
+        # Cheaper plans sell more
+        self.plan_weights = [1 / (rank + 1) for rank in range(len(self.plans))]
+
+        users, subscribers = options['users'], int(options['users'] * SUBSCRIBER_SHARE)
+        if options['payments'] and not subscribers:
+            raise CommandError('Payments need subscribers; increase --users')
+        payment_counts = self.allocate(options['payments'], subscribers)
+
+        batch_size = options['batch_size']
+        self.writers = {
+            model: BatchWriter(model, batch_size) for model in (User, Profile, Subscription, MpesaPayment)
+        }
+        self.ids = {model: next_id(model) for model in self.writers}
+        self.password = make_password('load-test')
+
+        # Subscribers are spread over the users; payment_counts is in subscriber order
+        subscriber_flags = [True] * subscribers + [False] * (users - subscribers)
+        self.rng.shuffle(subscriber_flags)
+        counts = iter(payment_counts)
+        for n in range(users):
+            self.add_user(next(counts) if subscriber_flags[n] else None)
+            if any(writer.full for writer in self.writers.values()):
+                self.flush()
+            if n and n % 100000 == 0:
+                self.stdout.write(f'{n:,} users, {self.writers[MpesaPayment].written:,} payments...')
+        self.flush()
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(self.writers)):
+                cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Created {self.writers[User].written:,} users, {self.writers[Subscription].written:,} subscriptions '
+            f'and {self.writers[MpesaPayment].written:,} payments in {time.monotonic() - started:.1f}s'
+        ))
+
+    def flush(self):
+        # Parents before children
+        for writer in self.writers.values():
+            writer.flush()
+
+    def take_id(self, model):
+        self.ids[model] += 1
+        return self.ids[model] - 1
+
+    def allocate(self, payments, subscribers):
+        """Number of payments of each subscriber: heavy-tailed, summing to `payments`"""
+        if not subscribers:
+            return []
+        weights = [self.rng.paretovariate(1.5) for _ in range(subscribers)]
+        total = sum(weights)
+        counts = [int(payments * weight / total) for weight in weights]
+        for index in self.rng.sample(range(subscribers), payments - sum(counts)):
+            counts[index] += 1
+        return counts
+
+    def random_time(self, earliest, latest):
+        """A time between `earliest` and `latest`, moved into a likely hour of that day"""
+        moment = earliest + (latest - earliest) * self.rng.random()
+        hour = self.rng.choices(HOURS, cum_weights=HOUR_CUM_WEIGHTS)[0]
+        local = moment.astimezone(self.tz).replace(
+            hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60)
+        )
+        return min(max(local, earliest), latest)
+
+    def add_user(self, payment_count):
+        """Write a user and profile, plus a subscription and its payments for subscribers"""
+        user_id = self.take_id(User)
+        # Sign-ups grow over the period
+        joined = self.start + (self.now - self.start) * self.rng.random() ** 0.5
+        phone_number = f'2547{user_id % 10 ** 8:08d}'
+        is_premium = False
+
+        if payment_count is not None:
+            plan = self.rng.choices(self.plans, self.plan_weights)[0]
+            is_premium = self.add_subscription(user_id, plan, joined, phone_number, payment_count)
+
+        self.writers[User].add(
+            id=user_id, password=self.password, username=f'load{user_id}', email=f'load{user_id}@example.test',
+            first_name='Load', last_name=f'User {user_id}', phone_number=phone_number, is_active=True,
+            date_joined=joined, created_at=joined, updated_at=joined, email_verified=self.rng.random() < 0.7,
+            is_premium=is_premium, avatar='',
+        )
+        self.writers[Profile].add(
+            id=self.take_id(Profile), user_id=user_id, created_at=joined, updated_at=joined,
+            city=self.rng.choices([city for city, weight in CITIES], [weight for city, weight in CITIES])[0],
+            receive_notifications=self.rng.random() < 0.9, receive_marketing_emails=self.rng.random() < 0.3,
+        )
+
+    def add_subscription(self, user_id, plan, joined, phone_number, payment_count):
+        """Write a subscription and its payments; returns whether it is active"""
+        subscription_id = self.take_id(Subscription)
+        cycle = timedelta(days=plan.get_duration_days())
+        started = joined + (self.now - joined) * self.rng.random() * 0.2
+        # Churners stop paying part way; the rest are still paying today
+        span = (self.now - started) * (self.rng.uniform(0.1, 0.9) if self.rng.random() < CHURN_SHARE else 1)
+        # About one payment per cycle; squeezed together when there are more than fit
+        step = min(cycle, span / max(payment_count, 1))
+
+        last_paid = None
+        for n in range(payment_count):
+            due = started + step * n
+            created = self.random_time(due, due + step)
+            if self.add_payment(user_id, subscription_id, plan, phone_number, created):
+                last_paid = created
+
+        end_date = (last_paid or started) + cycle
+        if not payment_count:
+            status, end_date = 'trialing', started + timedelta(days=14)
+        elif end_date > self.now:
+            status = 'active'
+        else:
+            status = 'canceled' if self.rng.random() < 0.3 else 'expired'
+        self.writers[Subscription].add(
+            id=subscription_id, user_id=user_id, plan_id=plan.pk, status=status, start_date=started,
+            end_date=end_date, auto_renew=status != 'canceled',
+            canceled_at=end_date - cycle / 2 if status == 'canceled' else None,
+            created_at=started, updated_at=last_paid or started,
+        )
+        return status == 'active'
+
+    def add_payment(self, user_id, subscription_id, plan, phone_number, created):
+        """Write a payment; returns whether it completed"""
+        payment_id = self.take_id(MpesaPayment)
+        status, result_code, description, weight = self.rng.choices(
+            PAYMENT_OUTCOMES, cum_weights=OUTCOME_CUM_WEIGHTS
+        )[0]
+        # Callbacks arrive seconds after the STK push
+        settled = created + timedelta(seconds=self.rng.uniform(5, 40))
+        receipt_number = transaction_date = None
+        metadata = {}
+        if status == 'completed':
+            receipt_number = f'L{payment_id:09d}'
+            transaction_date = settled
+            metadata = {
+                'Amount': float(plan.price), 'MpesaReceiptNumber': receipt_number,
+                'TransactionDate': int(f'{settled.astimezone(self.tz):%Y%m%d%H%M%S}'), 'PhoneNumber': int(phone_number),
+            }
+        self.writers[MpesaPayment].add(
+            id=payment_id, user_id=user_id, subscription_id=subscription_id, amount=Decimal(plan.price),
+            phone_number=phone_number, checkout_request_id=f'ws_CO_LOAD_{payment_id}',
+            merchant_request_id=f'LOAD-{payment_id}', mpesa_receipt_number=receipt_number, status=status,
+            result_code=result_code, result_description=description, transaction_date=transaction_date,
+            metadata=metadata, description=f'Subscription: {plan.name}', created_at=created,
+            updated_at=created if status == 'pending' else settled,
+        )
+        return status == 'completed'
@@ -0,0 +1,306 @@
+"""
+In-process metrics for Adminova
+A small counter/histogram registry rendered in the Prometheus text format.
+Under gunicorn each worker periodically writes a snapshot to METRICS_DIR
+and the /metrics/ endpoint merges the snapshots of all workers, plus an
+aggregate of the workers that have exited (absorb_snapshot()).
+Created by Cavin Otieno
+"""
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters and histograms
+    Metrics must be described before use; label values are strings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._values = {}
+        self._collectors = []
+        self._last_flush = 0.0
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        """Register a metric; kind is 'counter', 'histogram' or 'gauge'"""
+        self._descriptions[name] = {'kind': kind, 'help': help_text, 'buckets': tuple(buckets)}
+
+    def add_collector(self, collector):
+        """
+        Register a callable run at scrape time in the scraping process
+        It returns (name, labels, value) gauge samples, e.g. queue depth.
+        """
+        self._collectors.append(collector)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        """Record one observation in a histogram"""
+        buckets = self._descriptions[name]['buckets']
+        key = self._key(name, labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then +Inf, sum and count
+                counts = self._values[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self):
+        """Serializable copy of all values"""
+        with self._lock:
+            return [
+                [name, list(labels), list(value) if isinstance(value, list) else value]
+                for (name, labels), value in self._values.items()
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    # Cross-process aggregation
+
+    def _snapshot_path(self):
+        return Path(settings.METRICS_DIR) / f'{os.getpid()}.json'
+
+    def flush(self, force=False):
+        """Write this process' snapshot to METRICS_DIR, at most once per interval"""
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        path = self._snapshot_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_json(path, self.snapshot())
+
+    def collect(self):
+        """Merged values of every process (or only this one without METRICS_DIR)"""
+        if not settings.METRICS_DIR:
+            return merge_snapshots([self.snapshot()])
+        self.flush(force=True)
+        return merge_snapshots(read_snapshots(settings.METRICS_DIR))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        merged = self.collect()
+        gauges = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges[self._key(name, labels)] = value
+
+        by_name = {}
+        for (metric, labels), value in {**merged, **gauges}.items():
+            by_name.setdefault(metric, []).append((labels, value))
+
+        lines = []
+        for name, description in sorted(self._descriptions.items()):
+            samples = sorted(by_name.get(name, []))
+            lines.append(f'# HELP {name} {description["help"]}')
+            lines.append(f'# TYPE {name} {description["kind"]}')
+            for labels, value in samples:
+                if description['kind'] == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(description['buckets'] + ('+Inf',), value):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+                    lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Counters of exited workers, folded in by absorb_snapshot()
+AGGREGATE_FILE = 'aggregate.json'
+
+
+def merge_snapshots(snapshots):
+    """Sum snapshots into {(name, labels): value}"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                current = merged.setdefault(key, [0] * len(value))
+                merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _read_json(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # removed, or being replaced
+
+
+def _write_json(path, data):
+    with tempfile.NamedTemporaryFile('w', dir=path.parent, delete=False, suffix='.tmp') as handle:
+        json.dump(data, handle)
+    os.replace(handle.name, path)
+
+
+def read_snapshots(metrics_dir):
+    """The aggregate of exited workers plus the snapshot of each live one"""
+    metrics_dir = Path(metrics_dir)
+    aggregate = _read_json(metrics_dir / AGGREGATE_FILE) or {'values': [], 'absorbed': None}
+    snapshots = [aggregate['values']]
+    for path in metrics_dir.glob('*.json'):
+        # Skip one already in the aggregate that absorb_snapshot() is deleting
+        if not path.stem.isdigit() or int(path.stem) == aggregate['absorbed']:
+            continue
+        snapshot = _read_json(path)
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def absorb_snapshot(metrics_dir, pid):
+    """
+    Fold the snapshot of exited worker `pid` into the aggregate and delete it
+    Run by the gunicorn master (child_exit in gunicorn.conf.py), the only
+    writer of the aggregate, so recycled workers leave one file behind
+    rather than one each. The aggregate names the pid while its snapshot is
+    deleted, so a scrape in between counts it once; the master spawns no
+    worker (that could reuse the pid) until this returns.
+    """
+    metrics_dir = Path(metrics_dir)
+    path = metrics_dir / f'{pid}.json'
+    snapshot = _read_json(path)
+    if snapshot is None:
+        return False  # exited before its first flush
+    aggregate_path = metrics_dir / AGGREGATE_FILE
+    aggregate = _read_json(aggregate_path) or {'values': []}
+    values = [
+        [name, [list(pair) for pair in labels], value]
+        for (name, labels), value in merge_snapshots([aggregate['values'], snapshot]).items()
+    ]
+    _write_json(aggregate_path, {'values': values, 'absorbed': pid})
+    path.unlink(missing_ok=True)
+    _write_json(aggregate_path, {'values': values, 'absorbed': None})
+    return True
+
+
+def histogram_quantile(quantile, buckets, counts):
+    """
+    Estimate a quantile from histogram bucket counts, interpolating linearly
+    within the bucket like Prometheus' histogram_quantile()
+    `counts` is a registry histogram value: per-bucket counts, +Inf, sum, count.
+    """
+    total = counts[-1]
+    if not total:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if cumulative + count >= rank:
+            return lower + (bound - lower) * ((rank - cumulative) / count if count else 0)
+        cumulative += count
+        lower = bound
+    return buckets[-1]
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + [(key, str(value)) for key, value in extra.items()]
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = MetricsRegistry()
+
+registry.describe('adminova_http_request_duration_seconds', 'histogram', 'Request latency by URL name')
+registry.describe('adminova_http_requests_total', 'counter', 'Requests by URL name, method and status class')
+registry.describe('adminova_db_queries_total', 'counter', 'Database queries by URL name')
+registry.describe('adminova_db_query_duration_seconds_total', 'counter', 'Database query time by URL name')
+registry.describe('adminova_cache_hits_total', 'counter', 'Cache hits by URL name')
+registry.describe('adminova_cache_misses_total', 'counter', 'Cache misses by URL name')
+
+
+class RequestStats:
+    """Per-request DB and cache counters collected by MetricsMiddleware"""
+
+    __slots__ = ('queries', 'query_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+current_request_stats = contextvars.ContextVar('current_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper() hook timing queries for the current request
+    Installed on every connection (CoreConfig.ready) rather than around the
+    request, so queries of async views, which sync_to_async runs on another
+    thread's connection, are counted too: the request's stats follow them
+    there in the context.
+    """
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def add_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        # First, so an enclosing execute_wrapper() block pops its own hook
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_recorder():
+    """Add record_query() to open connections and, through connection_created, to new ones"""
+    connection_created.connect(add_query_recorder, dispatch_uid='adminova.metrics.record_query')
+    for connection in connections.all(initialized_only=True):
+        add_query_recorder(connection=connection)
+
+
+def record_cache_access(hits=0, misses=0):
+    """Attribute cache hits/misses to the current request, if any"""
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
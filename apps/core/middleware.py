@@ -0,0 +1,100 @@
+"""
+Core middleware for Adminova
+Created by Cavin Otieno
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from .metrics import RequestStats, current_request_stats, registry
+
+
+class MetricsMiddleware:
+    """
+    Record latency, DB queries/time and cache hits per resolved URL name
+    Should be first in MIDDLEWARE so the whole stack is measured. Runs
+    natively under ASGI too, so async views are not moved to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, stats, duration):
+        match = request.resolver_match
+        view = {'view': match.view_name if match else 'unmatched'}
+        registry.observe('adminova_http_request_duration_seconds', duration, view)
+        registry.inc(
+            'adminova_http_requests_total',
+            {**view, 'method': request.method, 'status': f'{response.status_code // 100}xx'}
+        )
+        if stats.queries:
+            registry.inc('adminova_db_queries_total', view, stats.queries)
+            registry.inc('adminova_db_query_duration_seconds_total', view, stats.query_time)
+        if stats.cache_hits:
+            registry.inc('adminova_cache_hits_total', view, stats.cache_hits)
+        if stats.cache_misses:
+            registry.inc('adminova_cache_misses_total', view, stats.cache_misses)
+        registry.flush()
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI
+    WhiteNoise 6.6 is sync only, so Django would run it, and with it every
+    async request, through a thread-sensitive sync_to_async: one request at a
+    time per process. Non-static requests are passed straight on; static
+    files are served from a worker thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,88 @@
+"""
+Viewset mixins for the Adminova read APIs
+Kept out of apps.core.views, which the root URLconf imports, so loading
+the URLconf does not import DRF.
+Created by Cavin Otieno
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+from .serializers import row_serializer
+
+
+class ValuesListMixin:
+    """
+    List action of a viewset served from .values() rows
+    The response is the one the serializer class would give, built by its
+    RowSerializer (apps.core.serializers) without model instances.
+    """
+
+    def list(self, request, *args, **kwargs):
+        rows = row_serializer(self.get_serializer_class())
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(queryset))
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for the list and retrieve actions of a viewset
+    Responses carry an ETag built from the rows' updated_at, so a client
+    polling with If-None-Match gets 304 Not Modified without the rows being
+    read or serialized. A list costs one aggregate query (max updated_at and
+    row count of the filtered queryset, so deletions change it too); an
+    object is validated by its own updated_at and also gets Last-Modified.
+    List some `last_modified_fields` like 'plan__updated_at' for related
+    rows the serializer nests. Writes that bypass updated_at (a bare
+    QuerySet.update()) are not seen, so they must set it.
+    """
+    last_modified_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        latest = {f'last_modified_{n}': Max(field) for n, field in enumerate(self.last_modified_fields)}
+        summary = queryset.aggregate(count=Count('pk'), **latest)
+        last_modified = max(filter(None, (summary[name] for name in latest)), default=None)
+        etag = self.make_etag(queryset.model, summary['count'], last_modified)
+        respond = super().list
+        # No Last-Modified: deleting a row does not move it back
+        return self.conditional_response(etag, None, lambda: respond(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.object_response(instance, lambda: Response(self.get_serializer(instance).data))
+
+    def object_response(self, instance, respond):
+        """respond() unless the client's copy of `instance` is current"""
+        values = (self.lookup_value(instance, field) for field in self.last_modified_fields)
+        last_modified = max(filter(None, values), default=None)
+        etag = self.make_etag(type(instance), instance.pk, last_modified)
+        return self.conditional_response(etag, last_modified, respond)
+
+    @staticmethod
+    def lookup_value(instance, lookup):
+        for name in lookup.split('__'):
+            instance = getattr(instance, name, None)
+        return instance
+
+    def make_etag(self, model, *state):
+        request = self.request
+        key = [model._meta.label, request.user.pk, request.get_full_path(), request.accepted_renderer.format, *state]
+        return f'"{hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()}"'
+
+    def conditional_response(self, etag, last_modified, respond):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = respond()
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # Revalidate on every use rather than trust heuristic freshness
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
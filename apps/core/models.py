@@ -4,6 +4,7 @@ Base models and utilities used across the application
 Created by Cavin Otieno
 """
 from django.db import models
+from django.utils import timezone
 
 
 class TimeStampedModel(models.Model):
@@ -18,25 +19,82 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+def touched_fields(model):
+    """updated_at when the model has it: QuerySet.update() and update_fields skip auto_now otherwise"""
+    return ['updated_at'] if any(field.name == 'updated_at' for field in model._meta.concrete_fields) else []
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """Bulk soft delete and restore, each a single UPDATE"""
+
+    def soft_delete(self):
+        now = timezone.now()
+        touched = dict.fromkeys(touched_fields(self.model), now)
+        return self.filter(is_deleted=False).update(is_deleted=True, deleted_at=now, **touched)
+
+    def restore(self):
+        touched = dict.fromkeys(touched_fields(self.model), timezone.now())
+        return self.filter(is_deleted=True).update(is_deleted=False, deleted_at=None, **touched)
+
+    def alive(self):
+        return self.filter(is_deleted=False)
+
+    def deleted(self):
+        return self.filter(is_deleted=True)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """Default manager of soft-deletable models: hides deleted rows"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+def alive_index(*fields, name):
+    """
+    Partial index over rows that are not soft deleted, e.g. in a subclass:
+        indexes = [deleted_index(name='...'), alive_index('user', '-created_at', name='...')]
+    Smaller than a full index, and matches every query of the default manager.
+    """
+    return models.Index(fields=list(fields), name=name, condition=models.Q(is_deleted=False))
+
+
+def deleted_index(name):
+    """
+    Partial index over soft deleted rows, scanned by purge_soft_deleted
+    Named by each model: index names are unique per database and limited
+    to 30 characters, which '<app_label>_<model>_...' often exceeds.
+    """
+    return models.Index(fields=['deleted_at'], name=name, condition=models.Q(is_deleted=True))
+
+
 class SoftDeleteModel(models.Model):
     """
     Abstract base model that provides soft delete functionality
+    `objects` excludes deleted rows; `all_objects` includes them. Old deleted
+    rows are moved out with `manage.py purge_soft_deleted`; subclasses should
+    list a deleted_index() in their Meta.indexes for it, and extend
+    SoftDeleteModel.Meta.
     """
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    objects = SoftDeleteManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
     class Meta:
         abstract = True
+        # Related lookups and the admin's change view also see deleted rows
+        base_manager_name = 'all_objects'
 
     def soft_delete(self):
         """Soft delete the instance"""
-        from django.utils import timezone
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save()
+        self.save(update_fields=['is_deleted', 'deleted_at', *touched_fields(type(self))])
 
     def restore(self):
         """Restore a soft-deleted instance"""
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
+        self.save(update_fields=['is_deleted', 'deleted_at', *touched_fields(type(self))])
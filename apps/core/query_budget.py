@@ -0,0 +1,64 @@
+"""
+Query budgets for Adminova views
+Every view declares the maximum number of database queries one request
+may run; the test suite fails when a change goes over it (e.g. an N+1
+introduced by a nested serializer or a list_display column).
+
+- function views: the @query_budget(n) decorator (outermost)
+- viewsets: a `query_budgets` dict keyed by action
+- admin: a `changelist_query_budget` attribute on the ModelAdmin
+Created by Cavin Otieno
+"""
+from django.db import connection
+from django.urls import resolve
+
+
+def query_budget(max_queries):
+    """Declare the query budget of a function view"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(match, method='GET'):
+    """
+    Declared budget for a resolved URL and HTTP method, or None
+    Admin views only declare budgets for their changelist.
+    """
+    view = match.func
+    model_admin = getattr(view, 'model_admin', None)
+    if model_admin is not None:
+        if match.url_name and match.url_name.endswith('_changelist'):
+            return getattr(model_admin, 'changelist_query_budget', None)
+        return None
+
+    # DRF viewsets route HTTP methods to actions
+    actions = getattr(view, 'actions', None)
+    if actions:
+        action = actions.get(method.lower())
+        return getattr(view.cls, 'query_budgets', {}).get(action)
+    return getattr(view, 'query_budget', None)
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that requests stay within their view's budget"""
+
+    def assertWithinQueryBudget(self, method, path, client=None, **kwargs):
+        """Request `path` with the test client and check the query count"""
+        # Imported here so views declaring budgets do not load django.test
+        from django.test.utils import CaptureQueriesContext
+
+        match = resolve(path.split('?')[0])
+        budget = get_query_budget(match, method)
+        self.assertIsNotNone(budget, f'{match.view_name} ({method}) declares no query budget')
+
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method.lower())(path, **kwargs)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method} {path} ran {len(queries)} queries, budget is {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
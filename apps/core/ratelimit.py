@@ -0,0 +1,107 @@
+"""
+Sliding-window rate limiting for Adminova
+Limits are declared per scope in settings.RATE_LIMITS, one rate per kind of
+key (user, phone, ip, username):
+
+    RATE_LIMITS = {
+        'payments.initiate': {'user': '5/min', 'phone': '3/min', 'ip': '30/min'},
+    }
+
+Hits are counted per fixed window in the default cache, and the rate is
+estimated from the current window plus the previous one, weighted by how
+much of it still overlaps the sliding window. All keys of a scope are
+counted in one cache round trip (incr_windows, apps.core.cache) and the
+database is never touched. Rejected hits count too, so a client that keeps
+hammering an endpoint stays limited.
+Created by Cavin Otieno
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+from .metrics import registry
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+registry.describe(
+    'adminova_rate_limited_total', 'counter',
+    'Requests rejected by the rate limiter by scope'
+)
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def phone_ident(value):
+    """The last 9 digits, so 0712..., 254712... and +254 712... share a limit"""
+    digits = ''.join(char for char in str(value or '') if char.isdigit())
+    return digits[-9:] or None
+
+
+def check_rate_limit(scope, idents, now=None):
+    """
+    Count a hit for every identifier in `idents` (e.g. {'user': 7, 'ip': '10.0.0.1'})
+    that `scope` has a limit for. Returns the seconds to wait if any limit is
+    exceeded, otherwise None.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    now = time.time() if now is None else now
+
+    windows, limits = [], []
+    for kind, rate in settings.RATE_LIMITS.get(scope, {}).items():
+        ident = idents.get(kind)
+        if ident is None or ident == '':
+            continue
+        limit, period = parse_rate(rate)
+        # Hashed: fixed-length keys, and no emails or phone numbers in the cache
+        digest = hashlib.blake2b(str(ident).encode(), digest_size=10).hexdigest()
+        prefix = f'ratelimit:{scope}:{kind}:{digest}'
+        index = int(now // period)
+        windows.append((f'{prefix}:{index}', f'{prefix}:{index - 1}', period * 2))
+        limits.append((limit, period, now % period))
+    if not windows:
+        return None
+
+    wait = 0
+    for (current, previous), (limit, period, elapsed) in zip(cache.incr_windows(windows), limits):
+        if previous * (1 - elapsed / period) + current <= limit:
+            continue
+        if current > limit:
+            # Wait for this window to weigh little enough as the previous one
+            seconds = period - elapsed + (1 - limit / current) * period
+        else:
+            # Wait for the previous window to weigh little enough
+            seconds = (1 - (limit - current) / previous) * period - elapsed
+        wait = max(wait, seconds)
+    if not wait:
+        return None
+    registry.inc('adminova_rate_limited_total', {'scope': scope})
+    return max(1, math.ceil(wait))
+
+
+class RateLimitThrottle(BaseThrottle):
+    """
+    DRF throttle for the view's `throttle_scope` in RATE_LIMITS
+    DRF answers 429 with a Retry-After header from wait().
+    """
+
+    def allow_request(self, request, view):
+        data = request.data if isinstance(request.data, dict) else {}
+        idents = {
+            'ip': self.get_ident(request),
+            'user': request.user.pk if request.user.is_authenticated else None,
+            'phone': phone_ident(data.get('phone_number')),
+            'username': str(data.get('username', '')).strip().lower(),
+        }
+        self.retry_after = check_rate_limit(view.throttle_scope, idents)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,59 @@
+"""
+orjson renderer and parser for the API
+Drop-in replacements for DRF's JSONRenderer and JSONParser, several times
+faster on large lists. Output is what JSONRenderer gives: compact
+separators, raw UTF-8, escaped U+2028/U+2029, and datetimes, decimals and
+lazy strings converted by DRF's own encoder. The one difference is the
+spelling of floats in exponent form (1e16, not 1e+16); serializers give
+decimals as strings. Pretty printed responses (browsable API, ?indent) and
+anything orjson rejects, such as integers beyond 64 bits, go through the
+stdlib renderer. The parser reads integers beyond 64 bits as floats, and
+hands bodies it rejects to the stdlib parser so errors read the same.
+Without orjson installed both classes behave exactly like DRF's.
+Created by Cavin Otieno
+"""
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Dates and times go to the encoder, which writes UTC as 'Z'
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser that decodes with orjson"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # The stdlib parser words the error
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,124 @@
+"""
+Fast read path for ModelSerializers
+A RowSerializer is compiled once from a read serializer's field tree into a
+list of (key, values() lookup, converter) and turns .values() rows into the
+same dicts serializer.data would: no model instances and no per-row field
+tree. Fields whose output is the database value itself (text, choices,
+integers, booleans, JSON, primary keys) are copied as is; decimals and
+datetimes use equivalent precompiled conversions. Fields it cannot express
+(methods, properties, source='*', many=True) raise ImproperlyConfigured when
+compiled, so a serializer change cannot silently change responses.
+Created by Cavin Otieno
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.JSONField, serializers.PrimaryKeyRelatedField,
+)
+
+_compiled = {}
+
+
+def row_serializer(serializer_class):
+    """The RowSerializer of `serializer_class`, compiled on first use"""
+    rows = _compiled.get(serializer_class)
+    if rows is None:
+        rows = _compiled[serializer_class] = RowSerializer(serializer_class())
+    return rows
+
+
+class RowSerializer:
+    """Serializes .values() rows exactly as `serializer` serializes instances"""
+
+    def __init__(self, serializer, prefix=''):
+        self.model = serializer.Meta.model
+        self.prefix = prefix
+        # (key, lookup, kind, converter or nested RowSerializer)
+        self.fields = [self.compile(name, field) for name, field in serializer.fields.items() if not field.write_only]
+
+    @property
+    def lookups(self):
+        """Arguments for .values()"""
+        for key, lookup, kind, convert in self.fields:
+            yield lookup
+            if kind == 'nested':
+                yield from convert.lookups
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def compile(self, name, field):
+        unsupported = ImproperlyConfigured(f'{type(field.parent).__name__}.{name} cannot be read from .values() rows')
+        source = field.source_attrs
+        if len(source) != 1 or isinstance(field, serializers.SerializerMethodField):
+            raise unsupported
+        try:
+            model_field = self.model._meta.get_field(source[0])
+        except FieldDoesNotExist:
+            raise unsupported
+        if model_field.many_to_many or model_field.one_to_many:
+            raise unsupported
+        lookup = self.prefix + model_field.name
+
+        if isinstance(field, serializers.ModelSerializer) and model_field.many_to_one:
+            # Keyed by the foreign key column, which tells a missing relation apart
+            return name, lookup, 'nested', RowSerializer(field, prefix=f'{lookup}__')
+        if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+            raise unsupported
+        if isinstance(field, serializers.ChoiceField):
+            if all(key == value for key, value in field.choice_strings_to_values.items()):
+                return name, lookup, 'value', None
+        elif isinstance(field, PASSTHROUGH_FIELDS):
+            if not getattr(field, 'pk_field', None) and not getattr(field, 'binary', False):
+                return name, lookup, 'value', None
+        elif isinstance(field, serializers.DecimalField):
+            return name, lookup, 'convert', self.decimal_converter(field)
+        elif isinstance(field, serializers.DateTimeField):
+            iso_8601 = getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+            if iso_8601 and settings.USE_TZ and not hasattr(field, 'timezone'):
+                return name, lookup, 'datetime', None
+        return name, lookup, 'convert', field.to_representation
+
+    @staticmethod
+    def decimal_converter(field):
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if not coerce_to_string or field.localize or field.decimal_places is None:
+            return field.to_representation
+        exponent = -field.decimal_places
+
+        def convert(value):
+            # Database decimals already have the column's places
+            if isinstance(value, Decimal) and value.as_tuple().exponent == exponent:
+                return f'{value:f}'
+            return field.to_representation(value)
+        return convert
+
+    def serialize(self, rows):
+        """Representations of .values() `rows`, as serializer(instances, many=True).data"""
+        tz = timezone.get_current_timezone()
+        return [self.row(row, tz) for row in rows]
+
+    def row(self, row, tz):
+        data = {}
+        for key, lookup, kind, convert in self.fields:
+            value = row[lookup]
+            if value is None:
+                data[key] = None
+            elif kind == 'value':
+                data[key] = value
+            elif kind == 'datetime':
+                value = value.astimezone(tz).isoformat()
+                data[key] = value[:-6] + 'Z' if value.endswith('+00:00') else value
+            elif kind == 'nested':
+                data[key] = convert.row(row, tz)
+            else:
+                data[key] = convert(value)
+        return data
@@ -0,0 +1,111 @@
+"""
+Tests for conditional GET on the read APIs (apps.core.mixins.ConditionalGetMixin)
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from apps.payments.models import MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='poller', email='poller@example.com', password='x')
+        cls.plan = Plan.objects.create(name='Starter', slug='starter', description='', price=Decimal('2500.00'))
+        cls.subscription = Subscription.objects.create(
+            user=cls.user, plan=cls.plan, status='active', end_date=timezone.now() + timedelta(days=30)
+        )
+        cls.payments = [
+            MpesaPayment.objects.create(
+                user=cls.user, amount=Decimal('2500.00'), phone_number='254708374149',
+                checkout_request_id=f'ws_CO_{n}', merchant_request_id=f'm-{n}',
+            )
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_ACCEPT='application/json', **headers)
+
+    def assertNotModified(self, url, etag):
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_list_is_not_modified(self):
+        for url in ('/api/plans/', '/api/plans/subscriptions/', '/api/payments/mpesa/'):
+            with self.subTest(url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                self.assertNotModified(url, response['ETag'])
+
+    def test_not_modified_list_reads_no_rows(self):
+        self.client.logout()
+        etag = self.get('/api/plans/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertNotModified('/api/plans/', etag)
+
+    def test_list_changes_with_updates_additions_and_deletions(self):
+        url = '/api/payments/mpesa/'
+        etags = [self.get(url)['ETag']]
+        self.payments[0].mark_failed(1032, 'Request cancelled by user')
+        etags.append(self.get(url)['ETag'])
+        self.payments[1].delete()
+        etags.append(self.get(url)['ETag'])
+        MpesaPayment.objects.create(
+            user=self.user, amount=Decimal('10.00'), phone_number='254708374149',
+            checkout_request_id='ws_CO_new', merchant_request_id='m-new',
+        )
+        etags.append(self.get(url)['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+    def test_subscriptions_follow_their_plan(self):
+        url = '/api/plans/subscriptions/'
+        etag = self.get(url)['ETag']
+        Plan.objects.filter(pk=self.plan.pk).update(price=Decimal('3000.00'), updated_at=timezone.now())
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['plan']['price'], '3000.00')
+
+    def test_etag_depends_on_query_and_user(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        etag = self.get('/api/payments/mpesa/')['ETag']
+        self.assertNotEqual(self.get('/api/payments/mpesa/?archive=1')['ETag'], etag)
+        self.assertNotEqual(self.get('/api/payments/mpesa/?page=1')['ETag'], etag)
+        self.client.force_login(other)
+        self.assertEqual(self.get('/api/payments/mpesa/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_retrieve_and_active(self):
+        for url in (
+            f'/api/plans/subscriptions/{self.subscription.pk}/',
+            '/api/plans/subscriptions/active/',
+            f'/api/payments/mpesa/{self.payments[0].pk}/',
+            '/api/plans/starter/',
+        ):
+            with self.subTest(url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotModified(url, response['ETag'])
+                self.assertEqual(
+                    self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+                )
+
+    def test_retrieve_changes_with_the_object(self):
+        url = f'/api/plans/subscriptions/{self.subscription.pk}/'
+        etag = self.get(url)['ETag']
+        self.subscription.cancel()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,143 @@
+"""
+Tests for the .values() read path and the orjson renderer and parser
+List responses must be byte for byte what the ModelSerializers and DRF's
+JSONRenderer give.
+Created by Cavin Otieno
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.renderers import ORJSONParser, ORJSONRenderer
+from apps.core.serializers import RowSerializer, row_serializer
+from apps.payments.models import ArchivedMpesaPayment, MpesaPayment
+from apps.payments.serializers import ArchivedMpesaPaymentSerializer, MpesaPaymentSerializer
+from apps.subscriptions.models import Plan, Subscription
+from apps.subscriptions.serializers import PlanSerializer, SubscriptionSerializer
+
+User = get_user_model()
+
+
+class RowSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='x')
+        cls.plan = Plan.objects.create(
+            name='Stärter \u2028', slug='starter', description='', price=Decimal('2500.50'),
+            features={'seats': 3, 'support': ['email'], 'sla': None},
+        )
+        utc = datetime(2024, 1, 2, 10, 0, 0, 123456, tzinfo=dt_timezone.utc)
+        for n in range(3):
+            payment = MpesaPayment.objects.create(
+                user=cls.user, amount=Decimal('100.00') * (n + 1), phone_number='254708374149',
+                checkout_request_id=f'ws_CO_{n}', merchant_request_id=f'm-{n}',
+                mpesa_receipt_number=None if n == 0 else f'R{n}', status='completed',
+            )
+            MpesaPayment.objects.filter(pk=payment.pk).update(created_at=utc + timedelta(days=n))
+        Subscription.objects.create(user=cls.user, plan=cls.plan, status='active', end_date=utc + timedelta(days=30))
+
+    def assertSameData(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = row_serializer(serializer_class).serialize(row_serializer(serializer_class).values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_payments(self):
+        self.assertSameData(MpesaPaymentSerializer, MpesaPayment.objects.all())
+
+    def test_archived_payments(self):
+        ArchivedMpesaPayment.objects.bulk_create(
+            ArchivedMpesaPayment(**row) for row in MpesaPayment.objects.values(
+                *[field.attname for field in MpesaPayment._meta.concrete_fields]
+            )
+        )
+        self.assertSameData(ArchivedMpesaPaymentSerializer, ArchivedMpesaPayment.objects.all())
+
+    def test_plans(self):
+        self.assertSameData(PlanSerializer, Plan.objects.all())
+
+    def test_subscriptions_nest_the_plan(self):
+        self.assertSameData(SubscriptionSerializer, Subscription.objects.all())
+        self.assertNotIn('plan_id', list(row_serializer(SubscriptionSerializer).lookups))
+
+    def test_in_another_time_zone(self):
+        with timezone.override('America/New_York'):
+            self.assertSameData(MpesaPaymentSerializer, MpesaPayment.objects.all())
+        with timezone.override('UTC'):
+            self.assertSameData(MpesaPaymentSerializer, MpesaPayment.objects.all())
+
+    def test_unsupported_fields_are_rejected(self):
+        class MethodSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Plan
+                fields = ['id', 'label']
+
+        class PropertySerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Subscription
+                fields = ['id', 'is_active']
+
+        for serializer_class in (MethodSerializer, PropertySerializer):
+            with self.subTest(serializer_class.__name__):
+                with self.assertRaises(ImproperlyConfigured):
+                    RowSerializer(serializer_class())
+
+    def test_list_endpoints(self):
+        self.client.force_login(self.user)
+        for url, serializer_class, queryset in [
+            ('/api/payments/mpesa/', MpesaPaymentSerializer, MpesaPayment.objects.all()),
+            ('/api/plans/subscriptions/', SubscriptionSerializer, Subscription.objects.all()),
+            ('/api/plans/', PlanSerializer, Plan.objects.all()),
+        ]:
+            with self.subTest(url):
+                response = self.client.get(url, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, 200)
+                results = serializer_class(queryset, many=True).data
+                self.assertEqual(
+                    response.content,
+                    JSONRenderer().render({'count': len(results), 'next': None, 'previous': None, 'results': results}),
+                )
+
+
+class ORJSONTests(TestCase):
+
+    def test_renders_like_json_renderer(self):
+        data = {
+            'text': 'Stärter \u2028 \u2029 "quoted"', 'amount': Decimal('12.50'), 'lazy': gettext_lazy('Hello'),
+            'utc': datetime(2024, 1, 2, 10, 0, tzinfo=dt_timezone.utc),
+            'local': timezone.localtime(datetime(2024, 1, 2, 10, 0, 0, 5, tzinfo=dt_timezone.utc)),
+            'date': datetime(2024, 1, 2).date(), 'items': [1, 2.5, True, None, {}], 3: 'int key',
+            'big': 2 ** 70,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_uses_json_renderer(self):
+        data = {'a': [1, 2]}
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_parses_like_json_parser(self):
+        body = '{"phone_number": "254708374149", "amount": 10.5, "plan_id": 3, "é": [null, true]}'
+        self.assertEqual(
+            ORJSONParser().parse(BytesIO(body.encode())), JSONParser().parse(BytesIO(body.encode()))
+        )
+
+    def test_malformed_body(self):
+        for body in (b'{"a": ', b'NaN', b'\xff'):
+            with self.subTest(body):
+                with self.assertRaises(ParseError):
+                    ORJSONParser().parse(BytesIO(body))
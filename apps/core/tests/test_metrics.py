@@ -0,0 +1,73 @@
+"""
+Tests for merging the metrics snapshots of gunicorn workers
+Created by Cavin Otieno
+"""
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from apps.core.metrics import AGGREGATE_FILE, MetricsRegistry, absorb_snapshot
+
+REQUESTS = 'adminova_http_requests_total'
+DURATION = 'adminova_http_request_duration_seconds'
+VIEW = {'view': 'plan-list'}
+
+
+class SnapshotMergeTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.metrics_dir = Path(directory.name)
+        settings = override_settings(METRICS_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_worker(self, pid, requests, durations=()):
+        worker = MetricsRegistry()
+        worker.describe(DURATION, 'histogram', 'Request latency')
+        worker.inc(REQUESTS, VIEW, requests)
+        for duration in durations:
+            worker.observe(DURATION, duration, VIEW)
+        with mock.patch('os.getpid', return_value=pid):
+            worker.flush(force=True)
+
+    def collect(self):
+        merged = MetricsRegistry().collect()
+        key = MetricsRegistry._key
+        return merged.get(key(REQUESTS, VIEW), 0), merged.get(key(DURATION, VIEW))
+
+    def test_sums_workers(self):
+        self.write_worker(101, 3, [0.01, 0.2])
+        self.write_worker(102, 4, [0.3])
+        requests, duration = self.collect()
+        self.assertEqual(requests, 7)
+        self.assertEqual(duration[-1], 3)
+        self.assertAlmostEqual(duration[-2], 0.51)
+
+    def test_exited_workers_are_absorbed(self):
+        self.write_worker(101, 3, [0.01])
+        self.write_worker(102, 4, [0.3])
+        self.assertTrue(absorb_snapshot(self.metrics_dir, 101))
+        self.assertTrue(absorb_snapshot(self.metrics_dir, 102))
+        self.assertFalse(absorb_snapshot(self.metrics_dir, 103))
+        self.assertEqual(sorted(path.name for path in self.metrics_dir.iterdir()), [AGGREGATE_FILE])
+        requests, duration = self.collect()
+        self.assertEqual(requests, 7)
+        self.assertEqual(duration[-1], 2)
+
+    def test_reused_pid_is_counted(self):
+        self.write_worker(101, 3)
+        absorb_snapshot(self.metrics_dir, 101)
+        self.write_worker(101, 5)
+        self.assertEqual(self.collect()[0], 8)
+
+    def test_absorbed_snapshot_is_not_counted_twice(self):
+        self.write_worker(101, 3)
+        self.write_worker(102, 4)
+        # A scrape between writing the aggregate and deleting the snapshot
+        with mock.patch.object(Path, 'unlink', side_effect=OSError), self.assertRaises(OSError):
+            absorb_snapshot(self.metrics_dir, 101)
+        self.assertTrue((self.metrics_dir / '101.json').exists())
+        self.assertEqual(self.collect()[0], 7)
@@ -0,0 +1,44 @@
+"""
+Tests for MetricsMiddleware under WSGI and ASGI
+Created by Cavin Otieno
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from apps.core.metrics import registry
+from apps.payments.models import MpesaPayment
+
+User = get_user_model()
+
+
+def counter(name, view):
+    return registry._values.get(registry._key(name, {'view': view}), 0)
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='metered', email='metered@example.com', password='x')
+        cls.token = Token.objects.create(user=cls.user)
+        MpesaPayment.objects.create(
+            user=cls.user, amount=Decimal('10.00'), phone_number='254708374149',
+            checkout_request_id='ws_CO_metered', merchant_request_id='m-metered',
+        )
+
+    def test_counts_queries_of_sync_views(self):
+        before = counter('adminova_db_queries_total', 'mpesa-payment-list')
+        response = self.client.get('/api/payments/mpesa/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(counter('adminova_db_queries_total', 'mpesa-payment-list'), before)
+
+    async def test_counts_queries_of_async_views(self):
+        before = counter('adminova_db_queries_total', 'mpesa-status-async')
+        response = await self.async_client.get(
+            '/api/payments/async/mpesa/status/ws_CO_metered/', headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        # The lookups run on a sync_to_async thread
+        self.assertGreater(counter('adminova_db_queries_total', 'mpesa-status-async'), before)
@@ -0,0 +1,28 @@
+"""
+Tests for the purge_sessions management command
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+
+class PurgeSessionsTests(TestCase):
+
+    def test_deletes_only_expired_sessions_in_chunks(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{n:04d}', session_data='', expire_date=now - timedelta(days=1))
+            for n in range(25)
+        )
+        Session.objects.create(session_key='current', session_data='', expire_date=now + timedelta(days=1))
+
+        output = StringIO()
+        with self.assertNumQueries(6):  # select + delete per chunk of up to 10
+            call_command('purge_sessions', chunk_size=10, stdout=output)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['current'])
+        self.assertIn('Deleted 25 expired sessions', output.getvalue())
@@ -0,0 +1,302 @@
+"""
+Query budget tests for Adminova
+Every endpoint and admin changelist declares a query budget
+(apps.core.query_budget); requests are made against several rows per table
+so an N+1 shows up as a budget overrun.
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.core.query_budget import QueryBudgetMixin
+from apps.payments.models import MpesaAccessToken, MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+from apps.users.models import Profile
+
+User = get_user_model()
+
+ROWS = 5
+
+# The project does not ship the dashboard templates; these render the
+# same context the real ones would
+DASHBOARD_TEMPLATES = {
+    'dashboard/home.html': '{% for plan in plans %}{{ plan.name }}{{ plan.price }}{% endfor %}',
+    'dashboard/pricing.html': '{% for plan in plans %}{{ plan.name }}{{ plan.features }}{% endfor %}',
+    'dashboard/dashboard.html': (
+        '{{ active_subscription.plan.name }}'
+        '{% for payment in recent_payments %}{{ payment.amount }}{{ payment.status }}{% endfor %}'
+    ),
+}
+
+TEST_SETTINGS = {
+    'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    'TEMPLATES': [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+            'loaders': [
+                ('django.template.loaders.locmem.Loader', DASHBOARD_TEMPLATES),
+                'django.template.loaders.app_directories.Loader',
+            ],
+        },
+    }],
+}
+
+# Endpoints whose views this project does not own
+EXEMPT_URL_NAMES = {'api-root'}
+
+
+def callback_payload(checkout_request_id, result_code=0):
+    return {
+        'Body': {
+            'stkCallback': {
+                'MerchantRequestID': f'merchant-{checkout_request_id}',
+                'CheckoutRequestID': checkout_request_id,
+                'ResultCode': result_code,
+                'ResultDesc': 'The service request is processed successfully.',
+                'CallbackMetadata': {
+                    'Item': [
+                        {'Name': 'Amount', 'Value': 100},
+                        {'Name': 'MpesaReceiptNumber', 'Value': f'R{checkout_request_id}'},
+                        {'Name': 'TransactionDate', 'Value': 20240101120000},
+                        {'Name': 'PhoneNumber', 'Value': 254708374149},
+                    ]
+                },
+            }
+        }
+    }
+
+
+def stk_push_response(checkout_request_id):
+    return {
+        'MerchantRequestID': f'merchant-{checkout_request_id}',
+        'CheckoutRequestID': checkout_request_id,
+        'ResponseCode': '0',
+    }
+
+
+def project_model_admins():
+    """ModelAdmins defined in this project (the admin is autodiscovered lazily)"""
+    admin.autodiscover()
+    return [
+        (model, model_admin) for model, model_admin in admin.site._registry.items()
+        if type(model_admin).__module__.startswith('apps.')
+    ]
+
+
+def iter_url_patterns(patterns=None):
+    """Every non-admin URLPattern of the project"""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != 'admin':
+                yield from iter_url_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+@override_settings(**TEST_SETTINGS)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Requests to each endpoint stay within their declared budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plans = [
+            Plan.objects.create(
+                name=f'Plan {i}', slug=f'plan-{i}', description='Plan', price=1000 * (i + 1),
+                features={'users': i}, display_order=i,
+            )
+            for i in range(ROWS)
+        ]
+        cls.users = []
+        for i in range(ROWS):
+            user = User.objects.create_user(
+                email=f'user{i}@example.com', username=f'user{i}', password='BudgetPass123!',
+                phone_number=f'25470000000{i}',
+            )
+            Profile.objects.create(user=user)
+            cls.users.append(user)
+        cls.user = cls.users[0]
+        cls.token = Token.objects.create(user=cls.user)
+        cls.staff = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='BudgetPass123!'
+        )
+
+        for user in cls.users:
+            for plan in cls.plans:
+                subscription = Subscription.objects.create(
+                    user=user, plan=plan, status='active' if plan == cls.plans[0] else 'expired'
+                )
+                MpesaPayment.objects.create(
+                    user=user, subscription=subscription, amount=plan.price,
+                    phone_number=user.phone_number, status='completed',
+                    checkout_request_id=f'ws_CO_{user.id}_{plan.id}',
+                    merchant_request_id=f'merchant_{user.id}_{plan.id}',
+                    mpesa_receipt_number=f'R{user.id}{plan.id}',
+                )
+        cls.subscription = Subscription.objects.filter(user=cls.user).first()
+        cls.payment = MpesaPayment.objects.filter(user=cls.user).first()
+        MpesaAccessToken.objects.create(
+            access_token='cached-token', expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+    def setUp(self):
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def pending_payment(self, checkout_request_id):
+        subscription = Subscription.objects.create(user=self.user, plan=self.plans[1], status='trialing')
+        return MpesaPayment.objects.create(
+            user=self.user, subscription=subscription, amount=1000, phone_number='254708374149',
+            checkout_request_id=checkout_request_id, merchant_request_id=f'merchant-{checkout_request_id}',
+        )
+
+    def test_every_endpoint_declares_a_budget(self):
+        missing = []
+        for pattern in iter_url_patterns():
+            view = pattern.callback
+            if pattern.name in EXEMPT_URL_NAMES or view.__module__ == 'django.views.static':
+                continue
+            actions = getattr(view, 'actions', None)
+            if actions:
+                budgets = getattr(view.cls, 'query_budgets', {})
+                missing += [f'{pattern.name} ({action})' for action in actions.values() if action not in budgets]
+            elif getattr(view, 'query_budget', None) is None:
+                missing.append(pattern.name)
+        self.assertEqual(sorted(set(missing)), [])
+
+    def test_every_admin_changelist_declares_a_budget(self):
+        model_admins = project_model_admins()
+        self.assertTrue(model_admins)
+        missing = [
+            type(model_admin).__name__ for model, model_admin in model_admins
+            if getattr(model_admin, 'changelist_query_budget', None) is None
+        ]
+        self.assertEqual(missing, [])
+
+    def test_users(self):
+        self.assertWithinQueryBudget('GET', reverse('user-list'), **self.auth)
+        self.assertWithinQueryBudget('GET', reverse('user-detail', args=[self.user.pk]), **self.auth)
+        self.assertWithinQueryBudget('GET', reverse('user-me'), **self.auth)
+        response = self.assertWithinQueryBudget(
+            'PATCH', reverse('user-detail', args=[self.user.pk]), data={'bio': 'Budgeted'},
+            content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinQueryBudget(
+            'PATCH', reverse('user-update-profile'), data={'city': 'Nairobi'},
+            content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinQueryBudget(
+            'POST', reverse('user-list'),
+            data={
+                'email': 'new@example.com', 'username': 'new', 'password': 'BudgetPass123!',
+                'password_confirm': 'BudgetPass123!',
+            },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_token_auth(self):
+        response = self.assertWithinQueryBudget(
+            'POST', reverse('api-token-auth'),
+            data={'username': self.user.email, 'password': 'BudgetPass123!'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_plans(self):
+        self.assertWithinQueryBudget('GET', reverse('plan-list'))
+        response = self.assertWithinQueryBudget('GET', reverse('plan-detail', args=[self.plans[0].slug]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        response = self.assertWithinQueryBudget('GET', reverse('subscription-list'), **self.auth)
+        self.assertEqual(response.data['count'], ROWS)
+        self.assertWithinQueryBudget('GET', reverse('subscription-detail', args=[self.subscription.pk]), **self.auth)
+        response = self.assertWithinQueryBudget('GET', reverse('subscription-active'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinQueryBudget(
+            'PATCH', reverse('subscription-detail', args=[self.subscription.pk]),
+            data={'auto_renew': False}, content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget('POST', reverse('subscription-cancel', args=[self.subscription.pk]), **self.auth)
+        response = self.assertWithinQueryBudget(
+            'DELETE', reverse('subscription-detail', args=[self.subscription.pk]), **self.auth
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_payments(self):
+        response = self.assertWithinQueryBudget('GET', reverse('mpesa-payment-list'), **self.auth)
+        self.assertEqual(response.data['count'], ROWS)
+        self.assertWithinQueryBudget('GET', reverse('mpesa-payment-detail', args=[self.payment.pk]), **self.auth)
+
+    def test_initiate(self):
+        daraja = mock.Mock(**{'json.return_value': stk_push_response('ws_CO_initiate')})
+        with mock.patch('requests.post', return_value=daraja):
+            response = self.assertWithinQueryBudget(
+                'POST', reverse('mpesa-payment-initiate'),
+                data={'phone_number': '254708374149', 'amount': 100, 'plan_id': self.plans[1].id},
+                content_type='application/json', **self.auth
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_callback(self):
+        self.pending_payment('ws_CO_callback')
+        response = self.assertWithinQueryBudget(
+            'POST', reverse('mpesa-callback'), data=callback_payload('ws_CO_callback'),
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['ResultCode'], 0)
+
+    def test_async_endpoints(self):
+        daraja = mock.Mock(**{'json.return_value': stk_push_response('ws_CO_async')})
+        client = mock.Mock(post=mock.AsyncMock(return_value=daraja))
+        with mock.patch('apps.payments.mpesa_service.get_async_client', return_value=client):
+            response = self.assertWithinQueryBudget(
+                'POST', reverse('mpesa-initiate-async'),
+                data={'phone_number': '254708374149', 'amount': 100, 'plan_id': self.plans[1].id},
+                content_type='application/json', **self.auth
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertWithinQueryBudget('GET', reverse('mpesa-status-async', args=['ws_CO_async']), **self.auth)
+        response = self.assertWithinQueryBudget(
+            'POST', reverse('mpesa-callback-async'), data=callback_payload('ws_CO_async'),
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['ResultCode'], 0)
+
+    def test_dashboard(self):
+        self.assertWithinQueryBudget('GET', reverse('home'))
+        self.assertWithinQueryBudget('GET', reverse('pricing'))
+        self.client.force_login(self.user)
+        response = self.assertWithinQueryBudget('GET', reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_operational_endpoints(self):
+        self.assertWithinQueryBudget('GET', reverse('test'))
+        self.assertWithinQueryBudget('GET', reverse('warmup'))
+        self.client.force_login(self.staff)
+        response = self.assertWithinQueryBudget('GET', reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.staff)
+        for model, model_admin in project_model_admins():
+            with self.subTest(model=model.__name__):
+                opts = model._meta
+                url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+                response = self.assertWithinQueryBudget('GET', url)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,98 @@
+"""
+Tests for the sliding-window rate limiter
+Created by Cavin Otieno
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from apps.core.checks import check_rate_limit_cache
+from apps.core.ratelimit import check_rate_limit
+
+User = get_user_model()
+
+
+@override_settings(RATE_LIMITS={'test': {'user': '2/min'}})
+class CheckRateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sliding_window(self):
+        self.assertIsNone(check_rate_limit('test', {'user': 1}, now=600))
+        self.assertIsNone(check_rate_limit('test', {'user': 1}, now=610))
+        # Denied until the previous window's share has decayed
+        self.assertEqual(check_rate_limit('test', {'user': 1}, now=620), 60)
+        self.assertIsNotNone(check_rate_limit('test', {'user': 1}, now=665))
+        self.assertIsNone(check_rate_limit('test', {'user': 1}, now=800))
+
+    def test_keys_are_independent(self):
+        check_rate_limit('test', {'user': 1}, now=600)
+        check_rate_limit('test', {'user': 1}, now=600)
+        self.assertIsNone(check_rate_limit('test', {'user': 2}, now=600))
+        self.assertIsNone(check_rate_limit('other', {'user': 1}, now=600))
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertIsNone(check_rate_limit('test', {'user': 1}, now=600))
+
+
+class RateLimitedEndpointTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='limited@example.com', username='limited', password='x')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+
+    @override_settings(RATE_LIMITS={'auth.token': {'username': '2/min', 'ip': '100/min'}})
+    def test_token_endpoint_limits_per_username(self):
+        url = reverse('api-token-auth')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'username': 'limited@example.com', 'password': 'no'}).status_code, 400)
+        with mock.patch.object(cache, 'incr_windows', wraps=cache.incr_windows) as incr_windows:
+            with self.assertNumQueries(0):
+                response = self.client.post(url, {'username': 'Limited@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        incr_windows.assert_called_once()
+        # Another account from the same client is unaffected
+        self.assertEqual(self.client.post(url, {'username': 'other@example.com', 'password': 'no'}).status_code, 400)
+
+    @override_settings(RATE_LIMITS={'payments.initiate': {'phone': '1/min'}})
+    def test_initiate_limits_per_phone_number(self):
+        url = reverse('mpesa-payment-initiate')
+        response = self.client.post(url, {'phone_number': '0712345678'}, **self.auth)
+        self.assertEqual(response.status_code, 400)  # validated after the limit
+        response = self.client.post(url, {'phone_number': '+254 712 345678'}, **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(RATE_LIMITS={'payments.initiate': {'user': '1/min'}})
+    def test_async_initiate_limits_per_user(self):
+        url = reverse('mpesa-initiate-async')
+        self.client.post(url, {}, content_type='application/json', **self.auth)
+        response = self.client.post(url, {}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class RateLimitCacheCheckTests(TestCase):
+
+    @override_settings(CACHE_SHARED=False)
+    def test_per_process_cache_is_an_error(self):
+        self.assertEqual([error.id for error in check_rate_limit_cache(None)], ['core.E001'])
+        with self.settings(RATE_LIMIT_ENABLED=False):
+            self.assertEqual(check_rate_limit_cache(None), [])
+
+    @override_settings(CACHE_SHARED=False, CACHES={
+        'default': {'BACKEND': 'apps.core.cache.InstrumentedRedisCache', 'LOCATION': 'redis://localhost:6379/0'},
+    })
+    def test_redis_is_shared(self):
+        self.assertEqual(check_rate_limit_cache(None), [])
+
+    def test_single_process(self):
+        self.assertEqual(check_rate_limit_cache(None), [])
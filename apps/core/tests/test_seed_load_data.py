@@ -0,0 +1,64 @@
+"""
+Tests for the synthetic load data generator
+Created by Cavin Otieno
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+from apps.payments.models import MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+from apps.users.models import Profile
+
+User = get_user_model()
+
+
+class SeedLoadDataTests(TestCase):
+
+    def seed(self, **options):
+        options = {'users': 200, 'payments': 1000, 'batch_size': 150, **options}
+        call_command('seed_load_data', stdout=StringIO(), **options)
+
+    def test_creates_requested_rows(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 200)
+        self.assertEqual(Profile.objects.count(), 200)
+        self.assertEqual(Subscription.objects.count(), 120)
+        self.assertEqual(MpesaPayment.objects.count(), 1000)
+        self.assertTrue(Plan.objects.filter(is_active=True).exists())
+
+    def test_rows_are_correlated(self):
+        self.seed()
+        now = timezone.now()
+        for payment in MpesaPayment.objects.select_related('subscription__plan'):
+            self.assertEqual(payment.subscription.user_id, payment.user_id)
+            self.assertEqual(payment.amount, payment.subscription.plan.price)
+            self.assertEqual(payment.mpesa_receipt_number is not None, payment.status == 'completed')
+            self.assertLessEqual(payment.created_at, now)
+        active = Subscription.objects.filter(status='active')
+        self.assertTrue(active.exists())
+        self.assertFalse(active.filter(end_date__lte=now).exists())
+        self.assertEqual(
+            set(User.objects.filter(is_premium=True).values_list('pk', flat=True)),
+            set(active.values_list('user_id', flat=True)),
+        )
+
+    def test_payments_are_heavy_tailed(self):
+        self.seed()
+        counts = sorted(
+            Subscription.objects.annotate(n=Count('payments')).values_list('n', flat=True), reverse=True
+        )
+        # The top tenth of subscribers make well over a tenth of the payments
+        self.assertGreater(sum(counts[:12]), 300)
+
+    def test_runs_again_on_existing_data(self):
+        self.seed()
+        self.seed(seed=7)
+        self.assertEqual(User.objects.count(), 400)
+        self.assertEqual(MpesaPayment.objects.count(), 2000)
+        # Sequences continue after the generated ids
+        user = User.objects.create_user(username='after', email='after@example.com', password='x')
+        self.assertGreater(user.pk, 400)
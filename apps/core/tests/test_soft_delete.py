@@ -0,0 +1,103 @@
+"""
+Tests for the soft delete managers, bulk operations and purge command
+Created by Cavin Otieno
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import TransactionTestCase
+from django.test.utils import isolate_apps
+from django.utils import timezone
+from apps.core.models import SoftDeleteModel, TimeStampedModel, alive_index, deleted_index
+
+
+@isolate_apps('apps.core')
+class SoftDeleteTests(TransactionTestCase):
+
+    def setUp(self):
+        class Document(TimeStampedModel, SoftDeleteModel):
+            title = models.CharField(max_length=50)
+
+            class Meta(SoftDeleteModel.Meta):
+                app_label = 'core'
+                indexes = [
+                    deleted_index(name='core_document_deleted_idx'),
+                    alive_index('title', name='core_document_title_alive_idx'),
+                ]
+
+        self.Document = Document
+        with connection.schema_editor() as editor:
+            editor.create_model(Document)
+        self.addCleanup(self.drop_table)
+        Document.objects.bulk_create(Document(title=f'doc {n}') for n in range(5))
+
+    def drop_table(self):
+        with connection.schema_editor() as editor:
+            editor.delete_model(self.Document)
+
+    def test_managers_and_bulk_operations(self):
+        Document = self.Document
+        with self.assertNumQueries(1):
+            self.assertEqual(Document.objects.filter(title__in=['doc 0', 'doc 1']).soft_delete(), 2)
+        self.assertEqual(Document.objects.count(), 3)
+        self.assertEqual(Document.all_objects.count(), 5)
+        self.assertEqual(Document.all_objects.deleted().count(), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Document.all_objects.restore(), 2)
+        self.assertEqual(Document.objects.count(), 5)
+        self.assertFalse(Document.all_objects.filter(deleted_at__isnull=False).exists())
+
+    def test_bulk_operations_touch_updated_at(self):
+        Document = self.Document
+        Document.all_objects.update(updated_at=timezone.now() - timedelta(days=1))
+        started = timezone.now()
+        Document.objects.filter(title='doc 0').soft_delete()
+        Document.all_objects.filter(title='doc 1').soft_delete()
+        Document.all_objects.filter(title='doc 1').restore()
+        self.assertEqual(
+            sorted(Document.all_objects.filter(updated_at__gte=started).values_list('title', flat=True)),
+            ['doc 0', 'doc 1'],
+        )
+
+    def test_instance_soft_delete_saves_only_its_fields(self):
+        document = self.Document.objects.get(title='doc 3')
+        with self.assertNumQueries(1) as queries:
+            document.soft_delete()
+        self.assertNotIn('title', queries.captured_queries[0]['sql'])
+        self.assertFalse(self.Document.objects.filter(pk=document.pk).exists())
+
+    def test_indexes_are_partial(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, self.Document._meta.db_table)
+        self.assertIn('core_document_title_alive_idx', constraints)
+        self.assertIn('core_document_deleted_idx', constraints)
+        self.assertEqual(self.Document.check(), [])
+
+    def test_purge_archives_old_rows_in_chunks(self):
+        Document = self.Document
+        Document.objects.filter(title__in=['doc 0', 'doc 1', 'doc 2']).soft_delete()
+        Document.all_objects.filter(title='doc 2').update(deleted_at=timezone.now())
+        Document.all_objects.exclude(title='doc 2').filter(is_deleted=True).update(
+            deleted_at=timezone.now() - timedelta(days=40)
+        )
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('apps.core.management.commands.purge_soft_deleted.apps.get_models', return_value=[Document]):
+            out = StringIO()
+            call_command('purge_soft_deleted', days=30, archive_dir=directory, chunk_size=1, stdout=out)
+            with gzip.open(os.path.join(directory, 'core.document.ndjson.gz')) as archive:
+                archived = [json.loads(line) for line in archive]
+
+        self.assertIn('purged 2 rows', out.getvalue())
+        self.assertEqual([row['title'] for row in archived], ['doc 0', 'doc 1'])
+        # Recently deleted rows stay restorable
+        self.assertEqual(list(Document.all_objects.deleted().values_list('title', flat=True)), ['doc 2'])
+        self.assertEqual(Document.all_objects.count(), 3)
@@ -0,0 +1,24 @@
+"""
+Core views for Adminova
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from .metrics import registry
+from .query_budget import query_budget
+
+
+@query_budget(5)
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    Requires 'Authorization: Bearer <METRICS_TOKEN>' or a staff session.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = bool(token) and constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    )
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,10 +4,12 @@ Created by Cavin Otieno
 """
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from apps.core.query_budget import query_budget
 from apps.subscriptions.models import Plan, Subscription
 from apps.payments.models import MpesaPayment
 
 
+@query_budget(1)
 def home(request):
     """Home page view"""
     plans = Plan.objects.filter(is_active=True).order_by('display_order', 'price')
@@ -16,13 +18,14 @@ def home(request):
     })
 
 
+@query_budget(5)
 @login_required
 def dashboard(request):
     """Main dashboard view"""
     active_subscription = Subscription.objects.filter(
         user=request.user,
         status='active'
-    ).first()
+    ).select_related('plan').first()
     
     recent_payments = MpesaPayment.objects.filter(
         user=request.user
@@ -34,6 +37,7 @@ def dashboard(request):
     })
 
 
+@query_budget(1)
 def pricing(request):
     """Pricing page view"""
     plans = Plan.objects.filter(is_active=True).order_by('display_order', 'price')
@@ -0,0 +1,19 @@
+"""
+Admin configuration for Jobs app
+Created by Cavin Otieno
+"""
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin configuration for Job model"""
+    list_display = ['name', 'status', 'priority', 'attempts', 'run_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    show_full_result_count = False
+    readonly_fields = [
+        'name', 'kwargs', 'attempts', 'last_error', 'claimed_by', 'started_at', 'finished_at', 'created_at', 'updated_at'
+    ]
+    changelist_query_budget = 6
@@ -0,0 +1,16 @@
+"""
+App configuration for Jobs app
+Created by Cavin Otieno
+"""
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    name = 'apps.jobs'
+    verbose_name = 'Background Jobs'
+
+    def ready(self):
+        # Register the queue metrics, then the @job functions of every app's jobs.py
+        from . import queue  # noqa: F401
+        autodiscover_modules('jobs')
@@ -0,0 +1,112 @@
+"""
+Management command to run background job workers
+Run: python manage.py run_workers                          # JOBS_PROCESSES x JOBS_THREADS
+     python manage.py run_workers --processes 2 --threads 4
+     python manage.py run_workers --burst                  # drain the queue and exit
+Created by Cavin Otieno
+
+Each thread is a Worker with its own database connection. Threads suit
+jobs that wait on Daraja or SMTP; add processes for CPU-bound jobs. On
+SQLite keep to one process, as writers serialize on the database file.
+SIGINT/SIGTERM let running jobs finish before exiting.
+"""
+import multiprocessing
+import signal
+import threading
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+
+def serve(threads, batch_size, interval, burst, stop):
+    """Run `threads` workers in this process until `stop` is set (or the queue drains with burst)"""
+    from apps.jobs.queue import Worker
+
+    def work():
+        return Worker(batch_size=batch_size, interval=interval, burst=burst, stop=stop).run()
+
+    def work_in_thread():
+        try:
+            work()
+        finally:
+            connection.close()
+
+    if threads == 1:
+        return work()
+    pool = [threading.Thread(target=work_in_thread, name=f'job-worker-{n}') for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def serve_process(threads, batch_size, interval, burst, stop):
+    """Entry point of a worker process"""
+    django.setup()
+    # The parent relays Ctrl-C through `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    serve(threads, batch_size, interval, burst, stop)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='Default: JOBS_PROCESSES')
+        parser.add_argument('--threads', type=int, help='Worker threads per process; default: JOBS_THREADS')
+        parser.add_argument('--batch-size', type=int, default=1, help='Jobs claimed at once by each worker')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds between polls of an empty queue')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        from apps.jobs.queue import requeue_stale
+
+        processes = options['processes'] or settings.JOBS_PROCESSES
+        threads = options['threads'] or settings.JOBS_THREADS
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} jobs from a stopped worker')
+        self.stdout.write(f'Starting {processes} x {threads} job workers')
+
+        if processes == 1:
+            stop = threading.Event()
+            with self.stop_on_signals(stop):
+                serve(threads, options['batch_size'], options['interval'], options['burst'], stop)
+        else:
+            context = multiprocessing.get_context('spawn')
+            stop = context.Event()
+            # Children open their own connections
+            connections.close_all()
+            children = [
+                context.Process(
+                    target=serve_process,
+                    args=(threads, options['batch_size'], options['interval'], options['burst'], stop),
+                )
+                for _ in range(processes)
+            ]
+            with self.stop_on_signals(stop):
+                for child in children:
+                    child.start()
+                for child in children:
+                    child.join()
+        self.stdout.write(self.style.SUCCESS('✓ Job workers stopped'))
+
+    @staticmethod
+    @contextmanager
+    def stop_on_signals(stop):
+        """Set `stop` on SIGINT/SIGTERM instead of exiting, for the duration of the block"""
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        previous = {
+            signum: signal.signal(signum, lambda *args: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            yield
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
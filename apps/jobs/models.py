@@ -0,0 +1,55 @@
+"""
+Background job models for Adminova
+Created by Cavin Otieno
+"""
+from django.db import models
+from django.utils import timezone
+from apps.core.models import TimeStampedModel
+
+
+class Job(TimeStampedModel):
+    """
+    A call to a registered @job function, queued in the database
+    Claimed by `manage.py run_workers`, see apps.jobs.queue.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=150, help_text='Registered job name')
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first')
+    run_at = models.DateTimeField(default=timezone.now, help_text='Not run before this time')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # Workers only ever scan the queue, in claim order
+            models.Index(
+                fields=['-priority', 'run_at'],
+                name='jobs_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(
+                fields=['started_at'],
+                name='jobs_running_idx',
+                condition=models.Q(status='running'),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
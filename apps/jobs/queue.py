@@ -0,0 +1,240 @@
+"""
+Database-backed job queue for Adminova
+Functions decorated with @job (in an app's jobs.py) are queued as Job rows
+with fn.enqueue(**kwargs): one INSERT in the caller's transaction, so a
+rolled back request queues nothing. `manage.py run_workers` claims ready
+jobs, highest priority first, with SELECT ... FOR UPDATE SKIP LOCKED where
+the database supports it; a conditional UPDATE keeps claims exclusive on
+SQLite. Failed jobs are retried with exponential backoff up to
+max_attempts. Only the existing database is needed, no broker.
+
+    @job(priority=5)
+    def query_stk_status(payment_id): ...
+
+    query_stk_status.enqueue(payment_id=payment.pk, delay=timedelta(seconds=30))
+
+Jobs must be idempotent: a job still running after JOBS_STALE_AFTER is
+assumed lost with its worker and queued again, which counts as an attempt.
+Running workers look for such jobs every JOBS_STALE_AFTER / 4 seconds.
+Created by Cavin Otieno
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from apps.core.metrics import registry
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered job functions by name
+TASKS = {}
+
+registry.describe('adminova_jobs_total', 'counter', 'Jobs run by name and outcome (succeeded, retry, failed)')
+registry.describe(
+    'adminova_job_wait_seconds', 'histogram', 'Time from a job\'s run_at until a worker started it',
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+)
+registry.describe('adminova_job_duration_seconds', 'histogram', 'Job run time by name')
+registry.describe('adminova_jobs_queue_depth', 'gauge', 'Queued jobs that are ready to run or scheduled for later')
+registry.describe('adminova_jobs_running', 'gauge', 'Jobs claimed by a worker')
+registry.describe('adminova_jobs_oldest_ready_seconds', 'gauge', 'Age of the oldest ready job')
+
+
+def job(name=None, priority=0, max_attempts=None):
+    """
+    Register a function as a job; adds fn.enqueue(), fn.aenqueue() and
+    fn.build(), which returns the unsaved Job for a bulk_create()
+    """
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__qualname__}'
+        TASKS[job_name] = func
+        func.job_name = job_name
+        func.build = partial(build_job, job_name, default_priority=priority, default_max_attempts=max_attempts)
+        func.enqueue = partial(enqueue, job_name, default_priority=priority, default_max_attempts=max_attempts)
+        func.aenqueue = partial(aenqueue, job_name, default_priority=priority, default_max_attempts=max_attempts)
+        return func
+    return decorator
+
+
+def build_job(name, priority=None, run_at=None, delay=None, max_attempts=None,
+              default_priority=0, default_max_attempts=None, **kwargs):
+    if name not in TASKS:
+        raise LookupError(f"Unknown job '{name}'")
+    run_at = run_at or timezone.now()
+    if delay:
+        run_at += delay
+    return Job(
+        name=name,
+        kwargs=kwargs,
+        priority=default_priority if priority is None else priority,
+        run_at=run_at,
+        max_attempts=max_attempts or default_max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue(name, **options):
+    """
+    Queue job `name`; priority, run_at, delay and max_attempts are options,
+    all other keyword arguments (JSON serializable) are passed to the job
+    """
+    job = build_job(name, **options)
+    job.save(force_insert=True)
+    return job
+
+
+async def aenqueue(name, **options):
+    """Async version of enqueue()"""
+    job = build_job(name, **options)
+    await job.asave(force_insert=True)
+    return job
+
+
+def retry_delay(attempts):
+    """Exponential backoff with up to 10% jitter, so failed batches spread out"""
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+
+def claim(worker_id, batch_size=1):
+    """Mark up to `batch_size` ready jobs as running for `worker_id` and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        ready = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent workers claim disjoint batches
+            ready = ready.select_for_update(skip_locked=True)
+        ids = list(ready.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # Without SKIP LOCKED two workers may pick the same rows; only one UPDATE matches
+        Job.objects.filter(pk__in=ids, status='queued').update(
+            status='running', claimed_by=worker_id, started_at=now, updated_at=now,
+            attempts=F('attempts') + 1,
+        )
+    jobs = list(Job.objects.filter(pk__in=ids, status='running', claimed_by=worker_id, started_at=now))
+    jobs.sort(key=lambda job: (-job.priority, job.run_at))
+    return jobs
+
+
+def run(job):
+    """Run a claimed job and record its outcome; returns the outcome"""
+    started = time.monotonic()
+    registry.observe('adminova_job_wait_seconds', max((job.started_at - job.run_at).total_seconds(), 0))
+    try:
+        func = TASKS.get(job.name)
+        if func is None:
+            raise LookupError(f"Unknown job '{job.name}'")
+        func(**job.kwargs)
+    except Exception as e:
+        logger.warning("Job %s (%s) failed on attempt %s: %s", job.pk, job.name, job.attempts, e)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            outcome = 'failed'
+            updates = {'status': 'failed', 'finished_at': now}
+        else:
+            outcome = 'retry'
+            updates = {'status': 'queued', 'run_at': now + retry_delay(job.attempts), 'claimed_by': ''}
+        Job.objects.filter(pk=job.pk).update(last_error=f'{type(e).__name__}: {e}', updated_at=now, **updates)
+    else:
+        outcome = 'succeeded'
+        now = timezone.now()
+        Job.objects.filter(pk=job.pk).update(status='succeeded', finished_at=now, updated_at=now)
+    registry.observe('adminova_job_duration_seconds', time.monotonic() - started, {'name': job.name})
+    registry.inc('adminova_jobs_total', {'name': job.name, 'outcome': outcome})
+    return outcome
+
+
+def requeue_stale(older_than=None):
+    """
+    Return jobs claimed by a worker that died back to the queue
+    Attempts are counted when a job is claimed, so a job that keeps taking
+    its worker down fails after max_attempts like one that raises.
+    """
+    older_than = older_than or timedelta(seconds=settings.JOBS_STALE_AFTER)
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', started_at__lt=now - older_than)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, updated_at=now, last_error='Worker lost on the last attempt'
+    )
+    return stale.update(status='queued', claimed_by='', run_at=now, updated_at=now)
+
+
+class Worker:
+    """
+    Claims and runs jobs until `stop` is set
+    One per thread; each thread has its own database connection.
+    """
+
+    def __init__(self, batch_size=1, interval=1.0, burst=False, stop=None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.burst = burst
+        self.stop = stop or threading.Event()
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'[-100:]
+        # run_workers requeues at startup; workers that die later are found by this check
+        self.requeue_at = time.monotonic() + settings.JOBS_STALE_AFTER / 4
+
+    def run_once(self):
+        """Claim and run one batch; returns the number of jobs run"""
+        if not connection.in_atomic_block:
+            # As between requests: drop connections that broke or outlived CONN_MAX_AGE
+            close_old_connections()
+        if time.monotonic() >= self.requeue_at:
+            self.requeue_at = time.monotonic() + settings.JOBS_STALE_AFTER / 4
+            requeued = requeue_stale()
+            if requeued:
+                logger.warning("Job worker %s requeued %s jobs from a stopped worker", self.worker_id, requeued)
+        jobs = claim(self.worker_id, self.batch_size)
+        for claimed in jobs:
+            run(claimed)
+        registry.flush()
+        return len(jobs)
+
+    def run(self):
+        processed = 0
+        while not self.stop.is_set():
+            try:
+                count = self.run_once()
+            except Exception:
+                # Lost database connection, locked SQLite file and the like; try again shortly
+                logger.exception("Job worker %s failed to claim jobs", self.worker_id)
+                self.stop.wait(self.interval)
+                continue
+            processed += count
+            if count:
+                continue
+            if self.burst:
+                break
+            self.stop.wait(self.interval)
+        return processed
+
+
+def queue_gauges():
+    now = timezone.now()
+    counts = Job.objects.filter(status__in=['queued', 'running']).aggregate(
+        ready=Count('pk', filter=Q(status='queued', run_at__lte=now)),
+        scheduled=Count('pk', filter=Q(status='queued', run_at__gt=now)),
+        running=Count('pk', filter=Q(status='running')),
+        oldest=Min('run_at', filter=Q(status='queued', run_at__lte=now)),
+    )
+    oldest = (now - counts['oldest']).total_seconds() if counts['oldest'] else 0
+    return [
+        ('adminova_jobs_queue_depth', {'state': 'ready'}, counts['ready']),
+        ('adminova_jobs_queue_depth', {'state': 'scheduled'}, counts['scheduled']),
+        ('adminova_jobs_running', None, counts['running']),
+        ('adminova_jobs_oldest_ready_seconds', None, oldest),
+    ]
+
+
+registry.add_collector(queue_gauges)
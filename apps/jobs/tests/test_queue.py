@@ -0,0 +1,116 @@
+"""
+Tests for the database-backed job queue
+Created by Cavin Otieno
+"""
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.jobs.models import Job
+from apps.jobs.queue import Worker, claim, enqueue, job, queue_gauges, requeue_stale
+
+calls = []
+
+
+@job('tests.record')
+def record(label):
+    calls.append(label)
+
+
+@job('tests.flaky', max_attempts=2)
+def flaky():
+    raise ConnectionError('Daraja unreachable')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_ready_jobs_by_priority(self):
+        record.enqueue(label='low')
+        record.enqueue(label='high', priority=10)
+        record.enqueue(label='later', delay=timedelta(hours=1))
+
+        out = StringIO()
+        call_command('run_workers', burst=True, batch_size=5, stdout=out)
+        self.assertIn('✓ Job workers stopped', out.getvalue())
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(
+            sorted(Job.objects.values_list('kwargs__label', 'status', 'attempts')),
+            [('high', 'succeeded', 1), ('later', 'queued', 0), ('low', 'succeeded', 1)],
+        )
+
+    @override_settings(JOBS_RETRY_BACKOFF=30)
+    def test_retries_with_backoff_then_fails(self):
+        queued = flaky.enqueue()
+        worker = Worker(burst=True)
+        self.assertEqual(worker.run_once(), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertEqual(queued.last_error, 'ConnectionError: Daraja unreachable')
+        self.assertGreaterEqual(queued.run_at, timezone.now() + timedelta(seconds=29))
+        self.assertEqual(worker.run_once(), 0)  # not due yet
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        worker.run_once()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_claims_are_exclusive(self):
+        for n in range(3):
+            record.enqueue(label=n)
+        first = claim('worker-a', batch_size=2)
+        second = claim('worker-b', batch_size=2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({j.pk for j in first} & {j.pk for j in second})
+        self.assertEqual(claim('worker-c', batch_size=2), [])
+
+    def test_requeues_jobs_of_dead_workers(self):
+        record.enqueue(label='lost')
+        claim('worker-a')
+        self.assertEqual(requeue_stale(timedelta(minutes=15)), 0)
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(timedelta(minutes=15)), 1)
+        self.assertEqual(len(claim('worker-b')), 1)
+
+    @override_settings(JOBS_STALE_AFTER=900)
+    def test_running_workers_requeue_jobs_of_workers_that_died(self):
+        worker = Worker(burst=True)
+        record.enqueue(label='lost')
+        claim('worker-a')
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(worker.run(), 0)  # not checked again until a quarter of JOBS_STALE_AFTER passed
+        later = time.monotonic() + 225
+        with mock.patch('apps.jobs.queue.time.monotonic', return_value=later):
+            self.assertEqual(worker.run(), 1)
+        self.assertEqual(calls, ['lost'])
+
+    def test_stale_jobs_fail_after_max_attempts(self):
+        queued = flaky.enqueue()
+        for attempt in (1, 2):
+            claim(f'worker-{attempt}')
+            Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+            requeue_stale(timedelta(minutes=15))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+        self.assertEqual(queued.last_error, 'Worker lost on the last attempt')
+        self.assertEqual(claim('worker-3'), [])
+
+    def test_queue_gauges(self):
+        record.enqueue(label='now')
+        record.enqueue(label='later', run_at=timezone.now() + timedelta(hours=1))
+        gauges = {(name, tuple((labels or {}).items())): value for name, labels, value in queue_gauges()}
+        self.assertEqual(gauges[('adminova_jobs_queue_depth', (('state', 'ready'),))], 1)
+        self.assertEqual(gauges[('adminova_jobs_queue_depth', (('state', 'scheduled'),))], 1)
+        self.assertEqual(gauges[('adminova_jobs_running', ())], 0)
+
+    def test_unknown_job(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
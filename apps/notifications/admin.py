@@ -0,0 +1,18 @@
+"""
+Admin configuration for Notifications app
+Created by Cavin Otieno
+"""
+from django.contrib import admin
+from .models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """Admin configuration for Notification model"""
+    list_display = ['user', 'kind', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['user__email']
+    list_select_related = ['user']
+    show_full_result_count = False
+    readonly_fields = ['user', 'kind', 'context', 'attempts', 'last_error', 'sent_at', 'dedupe_key', 'created_at', 'updated_at']
+    changelist_query_budget = 6
@@ -0,0 +1,10 @@
+"""
+App configuration for Notifications app
+Created by Cavin Otieno
+"""
+from django.apps import AppConfig
+
+
+class NotificationsConfig(AppConfig):
+    name = 'apps.notifications'
+    verbose_name = 'Notifications'
@@ -0,0 +1,159 @@
+"""
+Notification dispatch for Adminova
+notify() queues an email as a Notification row plus a job to deliver it
+(apps.jobs), so a request pays two INSERTs (in the caller's transaction, so
+rolled back work sends nothing) and never waits on SMTP. The job workers
+(`manage.py run_workers`) claim, retry and requeue deliveries; each worker
+thread keeps one Dispatcher, so its SMTP connection stays open and each
+kind's templates are loaded once. Users whose profile opted out are skipped.
+
+Templates: notifications/<kind>_subject.txt and notifications/<kind>.txt,
+rendered with the notification context plus `user` and SITE_NAME.
+Created by Cavin Otieno
+"""
+import logging
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+from apps.core.metrics import registry
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Profile preference that must be set for each kind to be sent
+PREFERENCES = {
+    'welcome': 'receive_notifications',
+    'payment_receipt': 'receive_notifications',
+    'payment_failed': 'receive_notifications',
+    'subscription_canceled': 'receive_notifications',
+    'subscription_expiring': 'receive_notifications',
+}
+
+registry.describe(
+    'adminova_notifications_total', 'counter',
+    'Notifications processed by kind and outcome (sent, skipped, retry, failed)'
+)
+
+
+def notify(user_id, kind, dedupe_key=None, **context):
+    """Queue a `kind` email for a user; context values must be JSON serializable"""
+    notification = Notification.objects.create(user_id=user_id, kind=kind, context=context, dedupe_key=dedupe_key)
+    queue_delivery([notification])
+    return notification
+
+
+def queue_delivery(notifications):
+    """Queue the delivery jobs of saved notifications"""
+    from apps.jobs.models import Job
+    from .jobs import deliver_notification
+
+    Job.objects.bulk_create(
+        (
+            deliver_notification.build(
+                notification_id=notification.pk, max_attempts=settings.NOTIFICATIONS_MAX_ATTEMPTS
+            )
+            for notification in notifications
+        ),
+        batch_size=1000,
+    )
+
+
+class Dispatcher:
+    """
+    Sends notifications over one mail connection
+    The connection is opened by the first send and kept open; a failed send
+    closes it so the next one reconnects.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection()
+        self.is_open = False
+        self.templates = {}
+
+    def close(self):
+        if self.is_open:
+            self.connection.close()
+            self.is_open = False
+
+    def render(self, notification):
+        if notification.kind not in self.templates:
+            self.templates[notification.kind] = (
+                get_template(f'notifications/{notification.kind}_subject.txt'),
+                get_template(f'notifications/{notification.kind}.txt'),
+            )
+        subject, body = self.templates[notification.kind]
+        context = {**notification.context, 'user': notification.user, 'SITE_NAME': settings.SITE_NAME}
+        return EmailMessage(
+            subject=' '.join(subject.render(context).split()),
+            body=body.render(context),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.user.email],
+            connection=self.connection,
+        )
+
+    def send_message(self, message):
+        if not self.is_open:
+            self.connection.open()
+            self.is_open = True
+        try:
+            self.connection.send_messages([message])
+        except SMTPServerDisconnected:
+            # Timed out while idle between jobs; reconnect once
+            self.close()
+            self.connection.open()
+            self.is_open = True
+            self.connection.send_messages([message])
+
+    @staticmethod
+    def claim(notification):
+        """
+        Mark `notification` as sending and count the attempt, unless it was
+        sent or another delivery job is sending it (overlapping
+        queue_expiry_reminders runs may queue two). A claim older than
+        JOBS_STALE_AFTER belonged to a worker that died.
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.JOBS_STALE_AFTER)
+        claimed = Notification.objects.filter(
+            Q(status='pending') | Q(status='sending', updated_at__lt=stale), pk=notification.pk
+        ).update(status='sending', attempts=F('attempts') + 1, updated_at=now)
+        notification.attempts += 1
+        return bool(claimed)
+
+    def send(self, notification):
+        """
+        Send one notification and record the outcome: 'sent', 'skipped', or
+        None when it was not claimed. A failure is recorded (as 'retry', or
+        'failed' on the last attempt) and re-raised, so the job is retried.
+        """
+        if not self.claim(notification):
+            return None
+        profile = getattr(notification.user, 'profile', None)
+        if profile is not None and not getattr(profile, PREFERENCES[notification.kind]):
+            self.record(notification, 'skipped')
+            return 'skipped'
+        try:
+            self.send_message(self.render(notification))
+        except Exception as e:
+            logger.warning("Notification %s failed: %s", notification.pk, e)
+            self.close()
+            final = notification.attempts >= settings.NOTIFICATIONS_MAX_ATTEMPTS
+            self.record(notification, 'failed' if final else 'retry', last_error=str(e))
+            raise
+        self.record(notification, 'sent')
+        return 'sent'
+
+    @staticmethod
+    def record(notification, outcome, **updates):
+        now = timezone.now()
+        statuses = {'sent': 'sent', 'skipped': 'skipped', 'retry': 'pending', 'failed': 'failed'}
+        updates.update(status=statuses[outcome], updated_at=now)
+        if outcome == 'sent':
+            updates['sent_at'] = now
+        Notification.objects.filter(pk=notification.pk).update(**updates)
+        registry.inc('adminova_notifications_total', {'kind': notification.kind, 'outcome': outcome})
@@ -0,0 +1,35 @@
+"""
+Background jobs for Notifications app
+Created by Cavin Otieno
+"""
+import threading
+
+from apps.jobs.queue import job
+from .dispatch import Dispatcher
+from .models import Notification
+
+_local = threading.local()
+
+
+def get_dispatcher():
+    """The calling worker thread's Dispatcher, reused from one job to the next"""
+    if getattr(_local, 'dispatcher', None) is None:
+        _local.dispatcher = Dispatcher()
+    return _local.dispatcher
+
+
+def close_dispatcher():
+    dispatcher = getattr(_local, 'dispatcher', None)
+    if dispatcher is not None:
+        dispatcher.close()
+        _local.dispatcher = None
+
+
+@job('notifications.deliver')
+def deliver_notification(notification_id):
+    """Send a queued notification; a job run again (or twice) sends it once"""
+    notification = Notification.objects.select_related('user__profile').filter(
+        pk=notification_id, status__in=['pending', 'sending']
+    ).first()
+    if notification is not None:
+        get_dispatcher().send(notification)
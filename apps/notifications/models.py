@@ -0,0 +1,63 @@
+"""
+Notification models for Adminova
+Outbox of emails queued by payment, subscription and account events
+Created by Cavin Otieno
+"""
+from django.db import models
+from django.conf import settings
+from apps.core.models import TimeStampedModel
+
+
+class Notification(TimeStampedModel):
+    """
+    Email queued for a user
+    Written on the request path with its delivery job and sent by the
+    job workers, see apps.notifications.dispatch.
+    """
+    KIND_CHOICES = [
+        ('welcome', 'Welcome'),
+        ('payment_receipt', 'Payment Receipt'),
+        ('payment_failed', 'Payment Failed'),
+        ('subscription_canceled', 'Subscription Canceled'),
+        ('subscription_expiring', 'Subscription Expiring'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    context = models.JSONField(default=dict, blank=True, help_text='Template context')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    # Set for notifications that must be queued at most once, e.g. reminders
+    dedupe_key = models.CharField(max_length=150, unique=True, null=True, blank=True)
+    
+    class Meta:
+        db_table = 'notifications'
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notifications'
+        ordering = ['-created_at']
+        indexes = [
+            # Only pending rows are looked up in bulk (queue_expiry_reminders)
+            models.Index(
+                fields=['created_at'],
+                name='notifications_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} for user {self.user_id} ({self.status})"
@@ -0,0 +1,119 @@
+"""
+Tests for queued notification emails
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.jobs.models import Job
+from apps.notifications.dispatch import notify
+from apps.notifications.jobs import close_dispatcher, deliver_notification
+from apps.notifications.models import Notification
+from apps.subscriptions.models import Plan, Subscription
+from apps.users.models import Profile
+
+User = get_user_model()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendNotificationsTests(TestCase):
+
+    def setUp(self):
+        self.subscriber = User.objects.create_user(
+            email='subscriber@example.com', username='subscriber', password='x', first_name='Amina'
+        )
+        Profile.objects.create(user=self.subscriber)
+        self.opted_out = User.objects.create_user(email='quiet@example.com', username='quiet', password='x')
+        Profile.objects.create(user=self.opted_out, receive_notifications=False)
+        # Each test gets a worker thread Dispatcher on its own mail backend
+        close_dispatcher()
+        self.addCleanup(close_dispatcher)
+
+    def send(self, **options):
+        call_command('run_workers', burst=True, stdout=StringIO(), **options)
+
+    def test_sends_over_one_connection_and_respects_preferences(self):
+        notify(self.subscriber.pk, 'payment_receipt', amount='1000.00', receipt_number='QAB123', plan='Pro')
+        notify(self.subscriber.pk, 'welcome')
+        notify(self.opted_out.pk, 'welcome')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as open_connection:
+            self.send(batch_size=1)
+        open_connection.assert_called_once()
+
+        self.assertEqual(len(mail.outbox), 2)
+        receipt = next(message for message in mail.outbox if 'QAB123' in message.subject)
+        self.assertEqual(receipt.to, ['subscriber@example.com'])
+        self.assertIn('Hi Amina', receipt.body)
+        self.assertIn('Plan: Pro', receipt.body)
+        self.assertEqual(
+            dict(Notification.objects.values_list('user__email', 'status').filter(kind='welcome')),
+            {'subscriber@example.com': 'sent', 'quiet@example.com': 'skipped'},
+        )
+
+    @override_settings(NOTIFICATIONS_MAX_ATTEMPTS=2, JOBS_RETRY_BACKOFF=0)
+    def test_failures_are_retried_then_marked_failed(self):
+        notification = notify(self.subscriber.pk, 'welcome')
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')
+        ):
+            self.send()
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 2))
+        self.assertEqual(notification.last_error, 'refused')
+        self.assertEqual(Job.objects.get().status, 'failed')
+
+    def test_delivery_runs_once(self):
+        notification = notify(self.subscriber.pk, 'welcome')
+        self.send()
+        Job.objects.update(status='queued')
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('sent', 1))
+
+    def test_a_notification_is_delivered_by_one_job(self):
+        notification = notify(self.subscriber.pk, 'welcome')
+        deliver_notification(notification.pk)
+        deliver_notification(notification.pk)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # A job finding the row claimed by a live worker leaves it alone...
+        claimed = notify(self.subscriber.pk, 'welcome')
+        Notification.objects.filter(pk=claimed.pk).update(status='sending', attempts=1)
+        deliver_notification(claimed.pk)
+        self.assertEqual(len(mail.outbox), 1)
+        # ...and takes it over once that worker is stale
+        Notification.objects.filter(pk=claimed.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        deliver_notification(claimed.pk)
+        self.assertEqual(len(mail.outbox), 2)
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.status, claimed.attempts), ('sent', 2))
+
+    def test_rolled_back_notifications_queue_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            notify(self.subscriber.pk, 'welcome')
+            raise RuntimeError
+        self.assertFalse(Job.objects.exists())
+
+    def test_expiry_reminders_are_queued_once(self):
+        plan = Plan.objects.create(name='Pro', slug='pro', description='Pro', price=1000)
+        Subscription.objects.create(
+            user=self.subscriber, plan=plan, status='active', end_date=timezone.now() + timedelta(days=2)
+        )
+        Subscription.objects.create(
+            user=self.opted_out, plan=plan, status='active', end_date=timezone.now() + timedelta(days=20)
+        )
+        call_command('queue_expiry_reminders', stdout=StringIO())
+        call_command('queue_expiry_reminders', stdout=StringIO())
+        reminder = Notification.objects.get()
+        self.assertEqual((reminder.user, reminder.kind), (self.subscriber, 'subscription_expiring'))
+        self.assertEqual(reminder.context['plan'], 'Pro')
+        self.assertEqual(list(Job.objects.values_list('kwargs', flat=True)), [{'notification_id': reminder.pk}])
@@ -3,7 +3,10 @@ Admin configuration for Payments app
 Created by Cavin Otieno
 """
 from django.contrib import admin
-from .models import MpesaPayment, MpesaAccessToken
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import ArchivedMpesaPayment, MpesaPayment, MpesaAccessToken
+from . import telemetry
 
 
 @admin.register(MpesaPayment)
@@ -38,6 +41,64 @@ class MpesaPaymentAdmin(admin.ModelAdmin):
     ]
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    list_select_related = ['user']
+    # Skip the unfiltered COUNT(*) on this large table
+    show_full_result_count = False
+    changelist_query_budget = 6
+    change_list_template = 'admin/payments/mpesapayment/change_list.html'
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'subscription':
+            # Subscription.__str__ shows the user's email and the plan name
+            kwargs['queryset'] = db_field.related_model.objects.select_related('user', 'plan')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'telemetry/',
+                self.admin_site.admin_view(self.telemetry_view),
+                name='payments_mpesapayment_telemetry'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def telemetry_view(self, request):
+        """Daraja latency, token refreshes, callback lag and outcomes"""
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'M-Pesa Telemetry',
+            'opts': self.model._meta,
+            'telemetry': telemetry.summary(),
+        }
+        return TemplateResponse(request, 'admin/payments/mpesapayment/telemetry.html', context)
+
+
+@admin.register(ArchivedMpesaPayment)
+class ArchivedMpesaPaymentAdmin(admin.ModelAdmin):
+    """Read-only admin for payments moved out by `manage.py archive_payments`"""
+    list_display = [
+        'user',
+        'amount',
+        'phone_number',
+        'status',
+        'mpesa_receipt_number',
+        'created_at',
+        'archived_at'
+    ]
+    list_filter = ['status']
+    search_fields = ['user__email', 'mpesa_receipt_number']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at']
+    list_select_related = ['user']
+    show_full_result_count = False
+    changelist_query_budget = 6
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(MpesaAccessToken)
@@ -46,6 +107,7 @@ class MpesaAccessTokenAdmin(admin.ModelAdmin):
     list_display = ['access_token_preview', 'expires_at', 'created_at']
     readonly_fields = ['access_token', 'expires_at', 'created_at']
     ordering = ['-created_at']
+    changelist_query_budget = 5
     
     def access_token_preview(self, obj):
         """Show preview of access token"""
@@ -0,0 +1,14 @@
+"""
+App configuration for Payments app
+Created by Cavin Otieno
+"""
+from django.apps import AppConfig
+
+
+class PaymentsConfig(AppConfig):
+    name = 'apps.payments'
+    verbose_name = 'Payments'
+
+    def ready(self):
+        # Register M-Pesa metrics and gauges with the shared registry
+        from . import telemetry  # noqa: F401
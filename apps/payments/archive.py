@@ -0,0 +1,54 @@
+"""
+Time-based archival of M-Pesa payments
+Payments older than PAYMENTS_ARCHIVE_AFTER_DAYS are moved, ids intact, from
+mpesa_payments to mpesa_payments_archive in chunks, each chunk copied and
+deleted in one short transaction. Callbacks, initiation and the default
+payment list only ever touch the small hot table; archived months are read
+through MpesaPaymentViewSet with ?archive=1.
+
+Native PostgreSQL partitioning is not used: a partitioned table can only
+enforce the unique checkout_request_id and merchant_request_id if they
+include the partition key, and callbacks look payments up by those ids
+alone, which would probe every partition.
+Created by Cavin Otieno
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedMpesaPayment, MpesaPayment
+
+
+def archive_cutoff(days=None):
+    days = settings.PAYMENTS_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_payments(before, chunk_size=1000, sleep=0):
+    """Move payments created before `before` to the archive; returns the number moved"""
+    fields = [field.attname for field in MpesaPayment._meta.concrete_fields]
+    old = MpesaPayment.objects.filter(created_at__lt=before).order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.values(*fields)[:chunk_size])
+            if not rows:
+                break
+            ArchivedMpesaPayment.objects.bulk_create(ArchivedMpesaPayment(**row) for row in rows)
+            MpesaPayment.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+        if len(rows) < chunk_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+    return moved
+
+
+def parse_month(value):
+    """'2025-01' -> (start, end) of that month in the current time zone; ValueError if malformed"""
+    year, month = (int(part) for part in value.split('-'))
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return start, end
@@ -0,0 +1,26 @@
+"""
+Management command to move old M-Pesa payments to the archive table
+Run: python manage.py archive_payments
+     python manage.py archive_payments --days 90 --chunk-size 5000 --sleep 0.1
+Created by Cavin Otieno
+
+Schedule it daily or monthly (cron, Vercel cron). See apps/payments/archive.py.
+"""
+from django.core.management.base import BaseCommand
+from apps.payments.archive import archive_cutoff, archive_payments
+
+
+class Command(BaseCommand):
+    help = 'Move M-Pesa payments older than PAYMENTS_ARCHIVE_AFTER_DAYS to the archive table in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Defaults to PAYMENTS_ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between chunks')
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        moved = archive_payments(before, chunk_size=options['chunk_size'], sleep=options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Archived {moved:,} payments created before {before:%Y-%m-%d}'
+        ))
@@ -0,0 +1,84 @@
+"""
+Management command to reconcile an M-Pesa statement CSV with our payments
+Run: python manage.py reconcile_statement statement.csv
+     python manage.py reconcile_statement statement.csv --report discrepancies.csv --apply
+Created by Cavin Otieno
+
+Matches statement rows by receipt number and amount (payments whose
+callback was lost by amount, phone number and time), and reports amount
+mismatches, payments we marked failed or canceled, receipts we have no
+payment for, and completed payments the statement does not list (within
+the statement's period, or --since/--until).
+See apps/payments/reconciliation.py.
+"""
+import csv
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.payments import reconciliation
+from apps.payments.reconciliation import StatementReconciler
+
+
+def aware_date(value):
+    return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+
+
+class Command(BaseCommand):
+    help = 'Reconcile an M-Pesa statement CSV against payments by receipt number and amount'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Statement CSV file')
+        parser.add_argument('--report', help='Write discrepancies to this CSV file')
+        parser.add_argument('--apply', action='store_true', help='Complete matched pending payments and fill in missing dates')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--since', type=aware_date, help='YYYY-MM-DD; default: first completion time')
+        parser.add_argument('--until', type=aware_date, help='YYYY-MM-DD; default: last completion time')
+        parser.add_argument('--receipt-column', default=reconciliation.RECEIPT_COLUMN)
+        parser.add_argument('--amount-column', default=reconciliation.AMOUNT_COLUMN)
+        parser.add_argument('--time-column', default=reconciliation.TIME_COLUMN)
+        parser.add_argument('--status-column', default=reconciliation.STATUS_COLUMN)
+        parser.add_argument(
+            '--details-column', default=reconciliation.DETAILS_COLUMN, help="Column with the payer's phone number"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        report_file = open(options['report'], 'w', newline='') if options['report'] else None
+        try:
+            report = None
+            if report_file:
+                report = csv.writer(report_file)
+                report.writerow(['kind', 'receipt_number', 'statement_amount', 'our_amount', 'payment_id'])
+            reconciler = StatementReconciler(
+                chunk_size=options['chunk_size'],
+                apply=options['apply'],
+                report=report,
+                receipt_column=options['receipt_column'],
+                amount_column=options['amount_column'],
+                time_column=options['time_column'],
+                status_column=options['status_column'],
+                details_column=options['details_column'],
+            )
+            # utf-8-sig: statements exported from Excel start with a byte order mark
+            with open(options['statement'], newline='', encoding='utf-8-sig') as statement:
+                counts = reconciler.run(statement, since=options['since'], until=options['until'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if report_file:
+                report_file.close()
+
+        self.stdout.write(f"Statement rows:          {counts['rows']:,} ({counts['ignored']:,} not payments received)")
+        self.stdout.write(f"Matched:                 {counts['matched']:,}")
+        self.stdout.write(f"Amount mismatches:       {counts[reconciliation.AMOUNT_MISMATCH]:,}")
+        self.stdout.write(f"Failed or canceled here: {counts[reconciliation.STATUS_MISMATCH]:,}")
+        self.stdout.write(f"Missing on our side:     {counts[reconciliation.MISSING_HERE]:,}")
+        self.stdout.write(f"Missing from statement:  {counts[reconciliation.MISSING_FROM_STATEMENT]:,}")
+        corrections = counts['corrections']
+        if corrections and not options['apply']:
+            self.stdout.write(f'Corrections:             {corrections:,} (run with --apply to save them)')
+        else:
+            self.stdout.write(f'Corrections applied:     {corrections:,}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Reconciled in {time.monotonic() - started:.1f}s'))
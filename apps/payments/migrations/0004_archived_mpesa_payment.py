@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_initial'),
+        ('subscriptions', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMpesaPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('phone_number', models.CharField(max_length=15)),
+                ('checkout_request_id', models.CharField(max_length=100)),
+                ('merchant_request_id', models.CharField(max_length=100)),
+                ('mpesa_receipt_number', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('canceled', 'Canceled')], max_length=20)),
+                ('result_code', models.IntegerField(blank=True, null=True)),
+                ('result_description', models.TextField(blank=True)),
+                ('transaction_date', models.DateTimeField(blank=True, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_payments', to='subscriptions.subscription')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_mpesa_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived M-Pesa Payment',
+                'verbose_name_plural': 'Archived M-Pesa Payments',
+                'db_table': 'mpesa_payments_archive',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='mpesa_payme_user_id_ea972f_idx'), models.Index(fields=['-created_at'], name='mpesa_payme_created_b289f0_idx')],
+            },
+        ),
+    ]
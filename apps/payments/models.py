@@ -80,14 +80,64 @@ class MpesaPayment(TimeStampedModel):
         self.transaction_date = transaction_date
         if metadata:
             self.metadata = metadata
-        self.save()
+        self.save(update_fields=[
+            'status', 'result_code', 'mpesa_receipt_number', 'transaction_date', 'metadata', 'updated_at'
+        ])
     
     def mark_failed(self, result_code, result_description):
         """Mark payment as failed"""
         self.status = 'failed'
         self.result_code = result_code
         self.result_description = result_description
-        self.save()
+        self.save(update_fields=['status', 'result_code', 'result_description', 'updated_at'])
+
+
+class ArchivedMpesaPayment(models.Model):
+    """
+    M-Pesa payments moved out of mpesa_payments by `manage.py archive_payments`
+    Same columns and ids as MpesaPayment, plus archived_at. Keeps the hot
+    table, its indexes and its vacuums limited to recent months.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_mpesa_payments'
+    )
+    subscription = models.ForeignKey(
+        'subscriptions.Subscription',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_payments'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    phone_number = models.CharField(max_length=15)
+    checkout_request_id = models.CharField(max_length=100)
+    merchant_request_id = models.CharField(max_length=100)
+    mpesa_receipt_number = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    status = models.CharField(max_length=20, choices=MpesaPayment.STATUS_CHOICES)
+    result_code = models.IntegerField(null=True, blank=True)
+    result_description = models.TextField(blank=True)
+    transaction_date = models.DateTimeField(null=True, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'mpesa_payments_archive'
+        verbose_name = 'Archived M-Pesa Payment'
+        verbose_name_plural = 'Archived M-Pesa Payments'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Payment {self.mpesa_receipt_number or self.checkout_request_id} - KSh {self.amount} ({self.status})"
 
 
 class MpesaAccessToken(TimeStampedModel):
@@ -3,18 +3,119 @@ M-Pesa integration service for Adminova
 Handles M-Pesa STK Push and callback processing
 Created by Cavin Otieno
 """
+import asyncio
 import base64
 import json
 import logging
-import requests
+import weakref
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.db import connection, transaction
+from django.db.models.sql import UpdateQuery
 from django.utils import timezone
+from apps.notifications.dispatch import notify
+from apps.subscriptions.models import Subscription
 from .models import MpesaPayment, MpesaAccessToken
+from . import telemetry
 
 logger = logging.getLogger(__name__)
 
 
+def receipt_context(payment):
+    """Template context of the payment_receipt notification"""
+    context = {'amount': str(payment.amount), 'receipt_number': payment.mpesa_receipt_number}
+    if payment.subscription:
+        context['plan'] = payment.subscription.plan.name
+        context['end_date'] = f'{payment.subscription.end_date:%Y-%m-%d}'
+    return context
+
+
+def complete_payment(payment, changes):
+    """
+    Complete a pending payment and activate its subscription
+    On PostgreSQL this is one statement: the conditional UPDATE of the
+    payment in a data-modifying CTE whose RETURNING drives the subscription
+    UPDATE. Other databases take two. Returns whether the payment was pending.
+    """
+    pending = MpesaPayment.objects.filter(pk=payment.pk, status='pending')
+    if connection.vendor != 'postgresql':
+        if not pending.update(**changes):
+            return False
+        if payment.subscription_id:
+            Subscription.objects.filter(pk=payment.subscription_id).update(
+                status='active', updated_at=changes['updated_at']
+            )
+        return True
+    
+    query = pending.query.chain(UpdateQuery)
+    query.add_update_values(changes)
+    sql, params = query.get_compiler(connection=connection).as_sql()
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH paid AS ({sql} RETURNING {qn("subscription_id")}), '
+            f'activated AS (UPDATE {qn(Subscription._meta.db_table)} SET {qn("status")} = %s, {qn("updated_at")} = %s '
+            f'WHERE {qn("id")} IN (SELECT {qn("subscription_id")} FROM paid)) '
+            f'SELECT count(*) FROM paid',
+            (*params, 'active', changes['updated_at']),
+        )
+        return cursor.fetchone()[0] > 0
+
+
+def apply_callback(payment, result):
+    """
+    Apply a parsed callback to a payment read without locks
+    The pending -> completed/failed transition is one conditional UPDATE
+    (WHERE status = 'pending'): of concurrent duplicate callbacks exactly one
+    matches the row, the rest change nothing. The winner's UPDATE also
+    activates the subscription (see complete_payment) and the email is
+    queued in the same transaction, so the row lock is held briefly.
+    
+    Returns 'completed', 'failed' or 'duplicate'.
+    """
+    now = timezone.now()
+    if result['result_code'] == 0:
+        outcome = 'completed'
+        changes = {
+            'status': 'completed',
+            'result_code': 0,
+            'mpesa_receipt_number': result['receipt_number'],
+            'transaction_date': result['transaction_date'],
+            'metadata': result['metadata'] or payment.metadata,
+        }
+    else:
+        outcome = 'failed'
+        changes = {
+            'status': 'failed',
+            'result_code': result['result_code'],
+            'result_description': result['result_desc'] or '',
+        }
+    
+    changes['updated_at'] = now
+    
+    with transaction.atomic():
+        if outcome == 'completed':
+            updated = complete_payment(payment, changes)
+        else:
+            updated = MpesaPayment.objects.filter(pk=payment.pk, status='pending').update(**changes)
+        if not updated:
+            return 'duplicate'
+        for field, value in changes.items():
+            setattr(payment, field, value)
+        
+        if outcome == 'completed':
+            if payment.subscription:
+                payment.subscription.status = 'active'
+                payment.subscription.updated_at = now
+            notify(payment.user_id, 'payment_receipt', **receipt_context(payment))
+        else:
+            notify(payment.user_id, 'payment_failed', amount=str(payment.amount), reason=payment.result_description)
+    return outcome
+
+
 class MpesaService:
     """Service class for M-Pesa integration"""
     
@@ -25,8 +126,10 @@ class MpesaService:
         self.passkey = settings.MPESA_PASSKEY
         self.callback_url = settings.MPESA_CALLBACK_URL
         
-        # Set base URLs based on environment
-        if settings.MPESA_ENVIRONMENT == 'sandbox':
+        # Set base URLs based on environment (MPESA_BASE_URL overrides, e.g. a stub)
+        if settings.MPESA_BASE_URL:
+            self.base_url = settings.MPESA_BASE_URL.rstrip('/')
+        elif settings.MPESA_ENVIRONMENT == 'sandbox':
             self.base_url = 'https://sandbox.safaricom.co.ke'
         else:
             self.base_url = 'https://api.safaricom.co.ke'
@@ -41,66 +144,65 @@ class MpesaService:
             token_obj = MpesaAccessToken.objects.filter(
                 expires_at__gt=timezone.now()
             ).latest('created_at')
-            logger.info("Using cached M-Pesa access token")
+            telemetry.record_token_lookup('cache')
+            logger.info("Using cached M-Pesa access token", extra={'rate_limit': 60})
             return token_obj.access_token
         except MpesaAccessToken.DoesNotExist:
             pass
         
-        # Generate new token
-        url = f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials'
-        auth_string = f'{self.consumer_key}:{self.consumer_secret}'
-        auth_bytes = auth_string.encode('utf-8')
-        auth_base64 = base64.b64encode(auth_bytes).decode('utf-8')
-        
-        headers = {
-            'Authorization': f'Basic {auth_base64}',
-            'Content-Type': 'application/json',
-        }
+        # Generate new token (HTTP client imported on first use to keep cold starts fast)
+        import requests
+        url, headers = self.build_token_request()
         
         try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+            telemetry.record_token_lookup('daraja')
+            with telemetry.daraja_call('oauth'):
+                response = requests.get(url, headers=headers, timeout=30)
+                response.raise_for_status()
             data = response.json()
             
             access_token = data.get('access_token')
-            expires_in = int(data.get('expires_in', 3600))
             
             # Cache the token
             MpesaAccessToken.objects.create(
                 access_token=access_token,
-                expires_at=timezone.now() + timedelta(seconds=expires_in - 60)  # Expire 1 minute early
+                expires_at=self.token_expiry(data)
             )
             
             logger.info("Generated new M-Pesa access token")
             return access_token
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error getting M-Pesa access token: {str(e)}")
+            logger.error("Error getting M-Pesa access token: %s", e)
             raise Exception(f"Failed to get M-Pesa access token: {str(e)}")
     
+    def build_token_request(self):
+        """Build the URL and headers for an OAuth token request"""
+        url = f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials'
+        auth_string = f'{self.consumer_key}:{self.consumer_secret}'
+        auth_bytes = auth_string.encode('utf-8')
+        auth_base64 = base64.b64encode(auth_bytes).decode('utf-8')
+        
+        headers = {
+            'Authorization': f'Basic {auth_base64}',
+            'Content-Type': 'application/json',
+        }
+        return url, headers
+    
+    @staticmethod
+    def token_expiry(data):
+        """Expiry time for a token response, 1 minute early"""
+        expires_in = int(data.get('expires_in', 3600))
+        return timezone.now() + timedelta(seconds=expires_in - 60)
+    
     def generate_password(self, timestamp):
         """Generate password for STK Push request"""
         data_to_encode = f'{self.shortcode}{self.passkey}{timestamp}'
         encoded = base64.b64encode(data_to_encode.encode('utf-8'))
         return encoded.decode('utf-8')
     
-    def initiate_stk_push(self, phone_number, amount, account_reference, transaction_desc, user):
-        """
-        Initiate STK Push request to M-Pesa
-        
-        Args:
-            phone_number: Phone number in format 2547XXXXXXXX
-            amount: Amount to charge in KSh
-            account_reference: Reference for the transaction
-            transaction_desc: Description of the transaction
-            user: User object making the payment
-        
-        Returns:
-            MpesaPayment object
-        """
-        # Get access token
-        access_token = self.get_access_token()
-        
+    def build_stk_push_request(self, access_token, phone_number, amount, account_reference, transaction_desc):
+        """Build the URL, headers and payload for an STK Push request"""
         # Generate timestamp and password
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
         password = self.generate_password(timestamp)
@@ -125,11 +227,35 @@ class MpesaService:
             'AccountReference': account_reference,
             'TransactionDesc': transaction_desc,
         }
+        return url, headers, payload
+    
+    def initiate_stk_push(self, phone_number, amount, account_reference, transaction_desc, user):
+        """
+        Initiate STK Push request to M-Pesa
+        
+        Args:
+            phone_number: Phone number in format 2547XXXXXXXX
+            amount: Amount to charge in KSh
+            account_reference: Reference for the transaction
+            transaction_desc: Description of the transaction
+            user: User object making the payment
+        
+        Returns:
+            MpesaPayment object
+        """
+        import requests
+        
+        # Get access token
+        access_token = self.get_access_token()
+        url, headers, payload = self.build_stk_push_request(
+            access_token, phone_number, amount, account_reference, transaction_desc
+        )
         
         try:
-            logger.info(f"Initiating STK Push for {phone_number}, Amount: {amount}")
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
+            logger.info("Initiating STK Push for %s, Amount: %s", phone_number, amount)
+            with telemetry.daraja_call('stkpush'):
+                response = requests.post(url, json=payload, headers=headers, timeout=30)
+                response.raise_for_status()
             data = response.json()
             
             # Create payment record
@@ -143,13 +269,69 @@ class MpesaService:
                 status='pending',
             )
             
-            logger.info(f"STK Push initiated successfully. Checkout Request ID: {payment.checkout_request_id}")
+            logger.info("STK Push initiated successfully. Checkout Request ID: %s", payment.checkout_request_id)
             return payment
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error initiating STK Push: {str(e)}")
+            logger.error("Error initiating STK Push: %s", e)
             raise Exception(f"Failed to initiate M-Pesa payment: {str(e)}")
     
+    @staticmethod
+    def parse_callback(callback_data):
+        """
+        Extract the fields of an STK Push callback payload
+        
+        Returns:
+            dict with checkout_request_id, result_code, result_desc,
+            metadata, receipt_number and transaction_date
+        """
+        body = callback_data.get('Body', {})
+        stk_callback = body.get('stkCallback', {})
+        
+        # Extract metadata
+        callback_metadata = stk_callback.get('CallbackMetadata', {})
+        metadata = {}
+        for item in callback_metadata.get('Item', []):
+            metadata[item.get('Name')] = item.get('Value')
+        
+        # Parse transaction date
+        transaction_date = None
+        transaction_date_str = str(metadata.get('TransactionDate', ''))
+        if transaction_date_str:
+            try:
+                transaction_date = datetime.strptime(transaction_date_str, '%Y%m%d%H%M%S')
+            except ValueError:
+                transaction_date = timezone.now()
+        
+        return {
+            'checkout_request_id': stk_callback.get('CheckoutRequestID'),
+            'result_code': stk_callback.get('ResultCode'),
+            'result_desc': stk_callback.get('ResultDesc'),
+            'metadata': metadata,
+            'receipt_number': metadata.get('MpesaReceiptNumber'),
+            'transaction_date': transaction_date,
+        }
+    
+    @staticmethod
+    def record_outcome(payment, result, outcome):
+        """Log the outcome of apply_callback(); returns whether the payment succeeded"""
+        checkout_request_id = payment.checkout_request_id
+        if outcome == 'duplicate':
+            # A concurrent duplicate callback got there first
+            logger.info("Payment %s already processed", checkout_request_id)
+            telemetry.record_callback('duplicate', result['result_code'])
+            return True
+        telemetry.record_callback(outcome, result['result_code'], payment.created_at)
+        if outcome == 'completed':
+            logger.info("Payment %s completed. Receipt: %s", checkout_request_id, payment.mpesa_receipt_number)
+            if payment.subscription:
+                logger.info("Activated subscription %s", payment.subscription.id)
+            return True
+        logger.warning(
+            "Payment %s failed. Code: %s, Desc: %s", checkout_request_id, payment.result_code, payment.result_description
+        )
+        return False
+    
     def process_callback(self, callback_data):
         """
         Process M-Pesa callback from STK Push
@@ -158,65 +340,174 @@ class MpesaService:
             callback_data: Callback payload from M-Pesa
         """
         try:
-            body = callback_data.get('Body', {})
-            stk_callback = body.get('stkCallback', {})
-            
-            checkout_request_id = stk_callback.get('CheckoutRequestID')
-            result_code = stk_callback.get('ResultCode')
-            result_desc = stk_callback.get('ResultDesc')
+            result = self.parse_callback(callback_data)
+            checkout_request_id = result['checkout_request_id']
+            result_code = result['result_code']
             
             # Find payment record
             try:
-                payment = MpesaPayment.objects.get(checkout_request_id=checkout_request_id)
+                payment = MpesaPayment.objects.select_related('subscription__plan').get(
+                    checkout_request_id=checkout_request_id
+                )
             except MpesaPayment.DoesNotExist:
-                logger.error(f"Payment not found for Checkout Request ID: {checkout_request_id}")
+                logger.error("Payment not found for Checkout Request ID: %s", checkout_request_id)
+                telemetry.record_callback('not_found', result_code)
                 return False
             
             # Check if already processed (idempotency)
             if payment.status != 'pending':
-                logger.info(f"Payment {checkout_request_id} already processed. Status: {payment.status}")
+                logger.info("Payment %s already processed. Status: %s", checkout_request_id, payment.status)
+                telemetry.record_callback('duplicate', result_code)
                 return True
             
-            # Process based on result code
-            if result_code == 0:
-                # Success
-                callback_metadata = stk_callback.get('CallbackMetadata', {})
-                items = callback_metadata.get('Item', [])
+            return self.record_outcome(payment, result, apply_callback(payment, result))
                 
-                # Extract metadata
-                metadata = {}
-                for item in items:
-                    name = item.get('Name')
-                    value = item.get('Value')
-                    metadata[name] = value
-                
-                receipt_number = metadata.get('MpesaReceiptNumber')
-                transaction_date_str = str(metadata.get('TransactionDate', ''))
-                
-                # Parse transaction date
-                transaction_date = None
-                if transaction_date_str:
-                    try:
-                        transaction_date = datetime.strptime(transaction_date_str, '%Y%m%d%H%M%S')
-                    except ValueError:
-                        transaction_date = timezone.now()
-                
-                payment.mark_completed(receipt_number, transaction_date, metadata)
-                logger.info(f"Payment {checkout_request_id} completed. Receipt: {receipt_number}")
-                
-                # Activate subscription if linked
-                if payment.subscription:
-                    payment.subscription.status = 'active'
-                    payment.subscription.save()
-                    logger.info(f"Activated subscription {payment.subscription.id}")
-                
-                return True
-            else:
-                # Failed
-                payment.mark_failed(result_code, result_desc)
-                logger.warning(f"Payment {checkout_request_id} failed. Code: {result_code}, Desc: {result_desc}")
+        except Exception as e:
+            logger.error("Error processing M-Pesa callback: %s", e)
+            telemetry.record_callback('error')
+            return False
+
+
+# Services are built on first use rather than per request or at import time
+_services = {}
+
+
+def get_mpesa_service(service_class=MpesaService):
+    """Return the shared instance of `service_class`, constructing it on first use"""
+    service = _services.get(service_class)
+    if service is None:
+        service = _services[service_class] = service_class()
+    return service
+
+
+@receiver(setting_changed)
+def reset_mpesa_services(*, setting, **kwargs):
+    """Rebuild services when M-Pesa settings change (e.g. override_settings)"""
+    if setting.startswith('MPESA_'):
+        _services.clear()
+
+
+# One AsyncClient per event loop: the client's connection pool is bound to
+# the loop it was created on (ASGI has one loop per process, while sync
+# callers going through async_to_sync get a fresh loop each time)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the shared httpx.AsyncClient for the running event loop"""
+    import httpx
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=500, max_keepalive_connections=100),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+class AsyncMpesaService(MpesaService):
+    """
+    Non-blocking M-Pesa service for async views under ASGI
+    Daraja calls are awaited on a shared httpx client, so in-flight
+    requests do not hold a worker thread each
+    """
+    
+    async def aget_access_token(self):
+        """Async version of get_access_token()"""
+        token_obj = await MpesaAccessToken.objects.filter(
+            expires_at__gt=timezone.now()
+        ).order_by('-created_at').afirst()
+        if token_obj is not None:
+            telemetry.record_token_lookup('cache')
+            logger.info("Using cached M-Pesa access token", extra={'rate_limit': 60})
+            return token_obj.access_token
+        
+        import httpx
+        url, headers = self.build_token_request()
+        
+        try:
+            telemetry.record_token_lookup('daraja')
+            with telemetry.daraja_call('oauth'):
+                response = await get_async_client().get(url, headers=headers)
+                response.raise_for_status()
+            data = response.json()
+            
+            access_token = data.get('access_token')
+            await MpesaAccessToken.objects.acreate(
+                access_token=access_token,
+                expires_at=self.token_expiry(data)
+            )
+            
+            logger.info("Generated new M-Pesa access token")
+            return access_token
+            
+        except httpx.HTTPError as e:
+            logger.error("Error getting M-Pesa access token: %s", e)
+            raise Exception(f"Failed to get M-Pesa access token: {str(e)}")
+    
+    async def ainitiate_stk_push(self, phone_number, amount, account_reference, transaction_desc, user,
+                                 subscription=None):
+        """Async version of initiate_stk_push()"""
+        import httpx
+        
+        access_token = await self.aget_access_token()
+        url, headers, payload = self.build_stk_push_request(
+            access_token, phone_number, amount, account_reference, transaction_desc
+        )
+        
+        try:
+            logger.info("Initiating STK Push for %s, Amount: %s", phone_number, amount)
+            with telemetry.daraja_call('stkpush'):
+                response = await get_async_client().post(url, json=payload, headers=headers)
+                response.raise_for_status()
+            data = response.json()
+            
+            payment = await MpesaPayment.objects.acreate(
+                user=user,
+                subscription=subscription,
+                amount=amount,
+                phone_number=phone_number,
+                checkout_request_id=data.get('CheckoutRequestID'),
+                merchant_request_id=data.get('MerchantRequestID'),
+                description=transaction_desc,
+                status='pending',
+            )
+            
+            logger.info("STK Push initiated successfully. Checkout Request ID: %s", payment.checkout_request_id)
+            return payment
+            
+        except httpx.HTTPError as e:
+            logger.error("Error initiating STK Push: %s", e)
+            raise Exception(f"Failed to initiate M-Pesa payment: {str(e)}")
+    
+    async def aprocess_callback(self, callback_data):
+        """Async version of process_callback()"""
+        try:
+            result = self.parse_callback(callback_data)
+            checkout_request_id = result['checkout_request_id']
+            result_code = result['result_code']
+            
+            try:
+                payment = await MpesaPayment.objects.select_related('subscription__plan').aget(
+                    checkout_request_id=checkout_request_id
+                )
+            except MpesaPayment.DoesNotExist:
+                logger.error("Payment not found for Checkout Request ID: %s", checkout_request_id)
+                telemetry.record_callback('not_found', result_code)
                 return False
+            
+            # Check if already processed (idempotency)
+            if payment.status != 'pending':
+                logger.info("Payment %s already processed. Status: %s", checkout_request_id, payment.status)
+                telemetry.record_callback('duplicate', result_code)
+                return True
+            
+            outcome = await sync_to_async(apply_callback)(payment, result)
+            return self.record_outcome(payment, result, outcome)
                 
         except Exception as e:
-            logger.error(f"Error processing M-Pesa callback: {str(e)}")
+            logger.error("Error processing M-Pesa callback: %s", e)
+            telemetry.record_callback('error')
             return False
@@ -0,0 +1,287 @@
+"""
+M-Pesa statement reconciliation for Adminova
+Matches the rows of an M-Pesa statement CSV, as downloaded by finance,
+against our payments by receipt number and amount. The statement is read
+as a stream, `chunk_size` rows at a time; each chunk is looked up with one
+values_list query per payment table into a small receipt index, so memory
+holds a chunk plus the ids of matched payments. Used by
+`manage.py reconcile_statement`.
+
+A payment only gets its receipt number from the callback, so one whose
+callback was lost (still pending, or failed by a timeout although the
+customer paid) is looked for by amount, the payer's phone number (masked
+on the statement, e.g. 2547XXXXX001) and an initiation shortly before the
+completion time. Such a match is used only if it is unambiguous.
+
+Amount mismatches are only reported: which side is wrong needs a person;
+so are matched payments we marked failed or canceled. With apply=True,
+matched pending payments are completed through apply_callback(), as their
+lost callback would have (activating the subscription and queuing the
+receipt), and completed ones lacking a transaction date get it with
+bulk_update.
+Created by Cavin Otieno
+"""
+import csv
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from apps.core.iterators import keyset_iterator
+from .models import ArchivedMpesaPayment, MpesaPayment
+from .mpesa_service import apply_callback
+
+# Column names of the Safaricom organisation statement
+RECEIPT_COLUMN = 'Receipt No.'
+AMOUNT_COLUMN = 'Paid In'
+TIME_COLUMN = 'Completion Time'
+STATUS_COLUMN = 'Transaction Status'
+DETAILS_COLUMN = 'Details'
+
+# How long before its completion a payment without receipt may have been initiated
+MATCH_WINDOW = timedelta(minutes=10)
+
+# Payer's phone number in the details: 2547XXXXX001, 254712***001 or 0712***001
+PHONE_PATTERN = re.compile(r'(?<![\dX*])(254|0)([\dX*]{9})(?![\dX*])', re.IGNORECASE)
+
+TIME_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M')
+
+# Kinds of rows written to the discrepancy report
+AMOUNT_MISMATCH = 'amount_mismatch'
+STATUS_MISMATCH = 'status_mismatch'
+MISSING_HERE = 'missing_here'
+MISSING_FROM_STATEMENT = 'missing_from_statement'
+
+
+def parse_amount(value):
+    """'1,000.00' -> Decimal('1000.00'); None for blank or malformed cells"""
+    try:
+        return Decimal(value.replace(',', '')) if value.strip() else None
+    except InvalidOperation:
+        return None
+
+
+def parse_time(value):
+    """Statement time in the current time zone, or None"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for time_format in TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(value, time_format)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_phone(value):
+    """Masked phone number in statement details, as 2547XXXXX001, or None"""
+    match = PHONE_PATTERN.search(value)
+    return '254' + match.group(2).upper() if match else None
+
+
+def phone_matches(masked, phone):
+    """Whether `phone` (2547XXXXXXXX) is the masked statement number"""
+    return len(masked) == len(phone) and all(m in 'X*' or m == digit for m, digit in zip(masked, phone))
+
+
+def read_statement(lines, receipt_column=RECEIPT_COLUMN):
+    """
+    Yield statement rows as dicts
+    Skips the preamble (account name, period, ...) before the header row.
+    """
+    reader = csv.reader(lines)
+    for header in reader:
+        header = [column.strip() for column in header]
+        if receipt_column in header:
+            break
+    else:
+        raise ValueError(f"No header row with a '{receipt_column}' column")
+    for row in reader:
+        if row:
+            yield dict(zip(header, row))
+
+
+class StatementReconciler:
+    """Streams a statement and tallies matches and discrepancies"""
+
+    def __init__(self, chunk_size=5000, apply=False, report=None, receipt_column=RECEIPT_COLUMN,
+                 amount_column=AMOUNT_COLUMN, time_column=TIME_COLUMN, status_column=STATUS_COLUMN,
+                 details_column=DETAILS_COLUMN, match_window=MATCH_WINDOW):
+        self.chunk_size = chunk_size
+        self.apply = apply
+        # csv.writer (or None) receiving (kind, receipt, statement amount, our amount, payment id)
+        self.report = report
+        self.receipt_column = receipt_column
+        self.amount_column = amount_column
+        self.time_column = time_column
+        self.status_column = status_column
+        self.details_column = details_column
+        self.match_window = match_window
+
+        self.counts = {
+            'rows': 0, 'ignored': 0, 'matched': 0, AMOUNT_MISMATCH: 0, STATUS_MISMATCH: 0, MISSING_HERE: 0,
+            MISSING_FROM_STATEMENT: 0, 'corrections': 0,
+        }
+        self.matched_ids = set()
+        self.first_time = None
+        self.last_time = None
+
+    def run(self, lines, since=None, until=None):
+        """Reconcile the statement in `lines`; returns the counts"""
+        chunk = []
+        for row in read_statement(lines, self.receipt_column):
+            self.counts['rows'] += 1
+            entry = self.parse_row(row)
+            if entry is None:
+                self.counts['ignored'] += 1
+                continue
+            chunk.append(entry)
+            if len(chunk) >= self.chunk_size:
+                self.match_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.match_chunk(chunk)
+
+        since = since or self.first_time
+        until = until or self.last_time
+        if since and until:
+            self.find_missing_from_statement(since, until)
+        return self.counts
+
+    def parse_row(self, row):
+        """(receipt, amount, completion time, payer's phone) of a completed payment received, or None"""
+        receipt = (row.get(self.receipt_column) or '').strip()
+        amount = parse_amount(row.get(self.amount_column) or '')
+        if not receipt or not amount:
+            return None  # withdrawals, charges, blank lines
+        status = row.get(self.status_column)
+        if status is not None and status.strip().lower() != 'completed':
+            return None
+        completed = parse_time(row.get(self.time_column) or '')
+        if completed:
+            if self.first_time is None or completed < self.first_time:
+                self.first_time = completed
+            if self.last_time is None or completed > self.last_time:
+                self.last_time = completed
+        return receipt, amount, completed, parse_phone(row.get(self.details_column) or '')
+
+    @staticmethod
+    def receipt_index(receipts):
+        """receipt -> (model, id, amount, status, transaction date) for a chunk of receipts"""
+        index = {}
+        # Hot rows win over archived copies of the same receipt
+        for model in (ArchivedMpesaPayment, MpesaPayment):
+            rows = model.objects.filter(mpesa_receipt_number__in=receipts).values_list(
+                'mpesa_receipt_number', 'id', 'amount', 'status', 'transaction_date'
+            ).order_by()
+            for receipt, *fields in rows:
+                index[receipt] = (model, *fields)
+        return index
+
+    def unreceipted_index(self, rows):
+        """
+        receipt -> (MpesaPayment, id, amount, status, None) for statement rows
+        whose receipt we do not have, matched to a pending, failed or canceled
+        payment without receipt by amount, phone number and initiation time.
+        Rows matching several payments, and payments matched by several rows
+        (or an earlier chunk), are left unmatched.
+        """
+        rows = [row for row in rows if row[2] and row[3]]
+        if not rows:
+            return {}
+        times = [completed for receipt, amount, completed, phone in rows]
+        candidates = list(
+            MpesaPayment.objects.filter(
+                status__in=['pending', 'failed', 'canceled'],
+                mpesa_receipt_number__isnull=True,
+                amount__in={amount for receipt, amount, completed, phone in rows},
+                created_at__gte=min(times) - self.match_window,
+                created_at__lte=max(times),
+            ).values_list('id', 'amount', 'status', 'phone_number', 'created_at').order_by()
+        )
+        found = {}
+        for receipt, amount, completed, phone in rows:
+            matches = [
+                (payment_id, status)
+                for payment_id, our_amount, status, our_phone, created_at in candidates
+                if payment_id not in self.matched_ids and our_amount == amount
+                and completed - self.match_window <= created_at <= completed and phone_matches(phone, our_phone)
+            ]
+            if len(matches) == 1:
+                found[receipt] = (amount, *matches[0])
+        claims = Counter(payment_id for amount, payment_id, status in found.values())
+        return {
+            receipt: (MpesaPayment, payment_id, amount, status, None)
+            for receipt, (amount, payment_id, status) in found.items()
+            if claims[payment_id] == 1
+        }
+
+    def match_chunk(self, chunk):
+        index = self.receipt_index([receipt for receipt, amount, completed, phone in chunk])
+        index.update(self.unreceipted_index([row for row in chunk if row[0] not in index]))
+        # Payments to complete (id -> receipt, completion time) and dates to fill in
+        pending = {}
+        dates = []
+        for receipt, amount, completed, phone in chunk:
+            found = index.get(receipt)
+            if found is None:
+                self.counts[MISSING_HERE] += 1
+                self.write(MISSING_HERE, receipt, amount, None, None)
+                continue
+            model, payment_id, our_amount, status, transaction_date = found
+            self.matched_ids.add(payment_id)
+            if our_amount != amount:
+                self.counts[AMOUNT_MISMATCH] += 1
+                self.write(AMOUNT_MISMATCH, receipt, amount, our_amount, payment_id)
+                continue
+            self.counts['matched'] += 1
+            if model is not MpesaPayment:
+                continue
+            if status == 'pending':
+                pending[payment_id] = (receipt, completed)
+            elif status != 'completed':
+                self.counts[STATUS_MISMATCH] += 1
+                self.write(STATUS_MISMATCH, receipt, amount, our_amount, payment_id)
+            elif transaction_date is None and completed:
+                dates.append(MpesaPayment(id=payment_id, transaction_date=completed, updated_at=timezone.now()))
+        if not self.apply:
+            self.counts['corrections'] += len(pending) + len(dates)
+            return
+        if dates:
+            MpesaPayment.objects.bulk_update(dates, ['transaction_date', 'updated_at'], batch_size=1000)
+            self.counts['corrections'] += len(dates)
+        payments = MpesaPayment.objects.filter(pk__in=pending).select_related('subscription__plan')
+        for payment in payments:
+            receipt, completed = pending[payment.pk]
+            result = {
+                'result_code': 0, 'result_desc': '', 'receipt_number': receipt,
+                'transaction_date': completed, 'metadata': None,
+            }
+            # 'duplicate' if its callback arrived meanwhile
+            if apply_callback(payment, result) == 'completed':
+                self.counts['corrections'] += 1
+
+    def find_missing_from_statement(self, since, until):
+        """Completed payments dated within the statement period that it does not list"""
+        for model in (MpesaPayment, ArchivedMpesaPayment):
+            completed = model.objects.filter(
+                status='completed', transaction_date__gte=since, transaction_date__lte=until
+            ).values('id', 'mpesa_receipt_number', 'amount')
+            for payment in keyset_iterator(completed, self.chunk_size):
+                if payment['id'] not in self.matched_ids:
+                    self.counts[MISSING_FROM_STATEMENT] += 1
+                    self.write(
+                        MISSING_FROM_STATEMENT, payment['mpesa_receipt_number'], None, payment['amount'], payment['id']
+                    )
+
+    def write(self, kind, receipt, statement_amount, our_amount, payment_id):
+        if self.report is not None:
+            self.report.writerow([kind, receipt, statement_amount, our_amount, payment_id])
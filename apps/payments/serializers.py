@@ -3,7 +3,7 @@ Serializers for Payments app
 Created by Cavin Otieno
 """
 from rest_framework import serializers
-from .models import MpesaPayment
+from .models import ArchivedMpesaPayment, MpesaPayment
 
 
 class MpesaPaymentSerializer(serializers.ModelSerializer):
@@ -21,6 +21,13 @@ class MpesaPaymentSerializer(serializers.ModelSerializer):
         ]
 
 
+class ArchivedMpesaPaymentSerializer(MpesaPaymentSerializer):
+    """Serializer for archived M-Pesa payments (read only)"""
+    class Meta(MpesaPaymentSerializer.Meta):
+        model = ArchivedMpesaPayment
+        read_only_fields = MpesaPaymentSerializer.Meta.fields
+
+
 class InitiatePaymentSerializer(serializers.Serializer):
     """Serializer for initiating M-Pesa payment"""
     phone_number = serializers.CharField(
@@ -0,0 +1,151 @@
+"""
+Telemetry for the M-Pesa integration
+Timers and counters around Daraja calls and callbacks, exported through the
+shared metrics registry (/metrics/) and summarized on an admin page
+Created by Cavin Otieno
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from apps.core.metrics import histogram_quantile, registry
+
+DARAJA_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0)
+CALLBACK_LAG_BUCKETS = (1, 5, 10, 20, 30, 60, 120, 300, 900, 3600)
+
+registry.describe(
+    'adminova_mpesa_daraja_request_duration_seconds', 'histogram',
+    'Daraja API call latency by endpoint and outcome', DARAJA_BUCKETS
+)
+registry.describe(
+    'adminova_mpesa_token_requests_total', 'counter',
+    'Access token lookups by source (cache or daraja)'
+)
+registry.describe(
+    'adminova_mpesa_callbacks_total', 'counter',
+    'STK Push callbacks by outcome'
+)
+registry.describe(
+    'adminova_mpesa_callback_result_codes_total', 'counter',
+    'STK Push callback result codes'
+)
+registry.describe(
+    'adminova_mpesa_callback_lag_seconds', 'histogram',
+    'Time from payment creation to callback processing', CALLBACK_LAG_BUCKETS
+)
+registry.describe(
+    'adminova_mpesa_recent_payments', 'gauge',
+    'Payments created in the last 24 hours by status'
+)
+registry.describe(
+    'adminova_mpesa_stuck_pending_payments', 'gauge',
+    'Payments pending for longer than MPESA_PENDING_ALERT_SECONDS (last 24 hours)'
+)
+
+
+@contextmanager
+def daraja_call(endpoint):
+    """Time a Daraja request; the outcome is 'error' unless the block completes"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        registry.observe(
+            'adminova_mpesa_daraja_request_duration_seconds',
+            time.perf_counter() - started,
+            {'endpoint': endpoint, 'outcome': outcome}
+        )
+
+
+def record_token_lookup(source):
+    registry.inc('adminova_mpesa_token_requests_total', {'source': source})
+
+
+def record_callback(outcome, result_code=None, created_at=None):
+    """Count a processed callback, its result code and its lag"""
+    registry.inc('adminova_mpesa_callbacks_total', {'outcome': outcome})
+    if result_code is not None:
+        registry.inc('adminova_mpesa_callback_result_codes_total', {'result_code': str(result_code)})
+    if created_at is not None:
+        registry.observe(
+            'adminova_mpesa_callback_lag_seconds',
+            (timezone.now() - created_at).total_seconds()
+        )
+
+
+def payment_status_counts():
+    """Status counts of payments created in the last 24 hours, plus stuck pending"""
+    from .models import MpesaPayment
+
+    now = timezone.now()
+    recent = MpesaPayment.objects.filter(created_at__gte=now - timedelta(hours=24))
+    counts = dict(recent.order_by().values_list('status').annotate(total=Count('id')))
+    stuck = recent.filter(
+        status='pending',
+        created_at__lt=now - timedelta(seconds=settings.MPESA_PENDING_ALERT_SECONDS)
+    ).count()
+    return counts, stuck
+
+
+def collect_payment_gauges():
+    counts, stuck = payment_status_counts()
+    samples = [('adminova_mpesa_recent_payments', {'status': status}, total) for status, total in counts.items()]
+    samples.append(('adminova_mpesa_stuck_pending_payments', None, stuck))
+    return samples
+
+
+registry.add_collector(collect_payment_gauges)
+
+
+def _quantiles(values, buckets):
+    return {
+        f'p{int(q * 100)}': histogram_quantile(q, buckets, values)
+        for q in (0.5, 0.95, 0.99)
+    }
+
+
+def summary():
+    """Telemetry summary for the admin page (merged across workers)"""
+    merged = registry.collect()
+
+    daraja = {}
+    lag = None
+    tokens, callbacks, result_codes = {}, {}, {}
+    for (name, labels), value in merged.items():
+        labels = dict(labels)
+        if name == 'adminova_mpesa_daraja_request_duration_seconds':
+            row = daraja.setdefault(labels['endpoint'], {'ok': 0, 'error': 0, 'values': None})
+            row[labels['outcome']] += value[-1]
+            row['values'] = value if row['values'] is None else [a + b for a, b in zip(row['values'], value)]
+        elif name == 'adminova_mpesa_callback_lag_seconds':
+            lag = value
+        elif name == 'adminova_mpesa_token_requests_total':
+            tokens[labels['source']] = value
+        elif name == 'adminova_mpesa_callbacks_total':
+            callbacks[labels['outcome']] = value
+        elif name == 'adminova_mpesa_callback_result_codes_total':
+            result_codes[labels['result_code']] = value
+
+    for endpoint, row in daraja.items():
+        row.update(_quantiles(row.pop('values'), DARAJA_BUCKETS))
+        row['count'] = row['ok'] + row['error']
+
+    token_total = sum(tokens.values())
+    counts, stuck = payment_status_counts()
+    recent_total = sum(counts.values())
+    return {
+        'daraja': daraja,
+        'tokens': tokens,
+        'token_refresh_rate': tokens.get('daraja', 0) / token_total if token_total else None,
+        'callbacks': callbacks,
+        'result_codes': dict(sorted(result_codes.items(), key=lambda item: -item[1])),
+        'callback_lag': _quantiles(lag, CALLBACK_LAG_BUCKETS) if lag else None,
+        'recent_payments': counts,
+        'pending_share': counts.get('pending', 0) / recent_total if recent_total else None,
+        'stuck_pending': stuck,
+        'stuck_after_seconds': settings.MPESA_PENDING_ALERT_SECONDS,
+    }
@@ -0,0 +1,65 @@
+"""
+Tests for time-based archival of M-Pesa payments
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from apps.payments.archive import archive_payments
+from apps.payments.models import ArchivedMpesaPayment, MpesaPayment
+
+User = get_user_model()
+
+
+class ArchivePaymentsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='payer@example.com', username='payer', password='x')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        now = timezone.now()
+        payments = MpesaPayment.objects.bulk_create(
+            MpesaPayment(
+                user=self.user, amount=1000, phone_number='254700000000', status='completed',
+                checkout_request_id=f'ws_CO_{n}', merchant_request_id=f'merchant-{n}',
+                mpesa_receipt_number=f'R{n}', metadata={'MpesaReceiptNumber': f'R{n}'},
+            )
+            for n in range(5)
+        )
+        # Three payments from last year, two from this month
+        for n, payment in enumerate(payments[:3]):
+            MpesaPayment.objects.filter(pk=payment.pk).update(created_at=now - timedelta(days=365 + n))
+
+    def test_moves_old_payments_in_chunks(self):
+        old_ids = set(MpesaPayment.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=180)
+        ).values_list('id', flat=True))
+        with self.assertNumQueries(2 * 5):  # per chunk: select, insert and delete in a savepoint
+            moved = archive_payments(timezone.now() - timedelta(days=180), chunk_size=2)
+        self.assertEqual(moved, 3)
+        self.assertEqual(MpesaPayment.objects.count(), 2)
+        archived = ArchivedMpesaPayment.objects.get(mpesa_receipt_number='R1')
+        self.assertEqual(set(ArchivedMpesaPayment.objects.values_list('id', flat=True)), old_ids)
+        self.assertEqual(archived.metadata, {'MpesaReceiptNumber': 'R1'})
+        self.assertIsNotNone(archived.archived_at)
+
+    def test_command_and_archive_flag(self):
+        call_command('archive_payments', stdout=StringIO())
+        url = reverse('mpesa-payment-list')
+
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.data['count'], 2)
+        response = self.client.get(url, {'archive': '1'}, **self.auth)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'][0]['mpesa_receipt_number'], 'R0')
+
+        last_year = (timezone.now() - timedelta(days=365)).strftime('%Y-%m')
+        response = self.client.get(url, {'archive': 'true', 'month': last_year}, **self.auth)
+        self.assertGreaterEqual(response.data['count'], 1)
+        response = self.client.get(url, {'month': 'June'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
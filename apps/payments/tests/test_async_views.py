@@ -0,0 +1,67 @@
+"""
+Concurrency tests for the async payment views
+Under ASGI a sync-only middleware makes Django run the whole request through
+a thread-sensitive sync_to_async, one request at a time per process. These
+requests wait on a slow Daraja concurrently only if every middleware in
+MIDDLEWARE runs natively async.
+Created by Cavin Otieno
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from apps.payments.mpesa_service import AsyncMpesaService
+
+User = get_user_model()
+
+DARAJA_DELAY = 0.3
+REQUESTS = 10
+
+
+async def slow_stk_push(self, phone_number, amount, account_reference, transaction_desc, user, subscription=None):
+    await asyncio.sleep(DARAJA_DELAY)
+    return SimpleNamespace(checkout_request_id=f'ws_CO_{time.monotonic_ns()}', amount=amount)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class AsyncViewConcurrencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='async', email='async@example.com', password='x')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def test_every_middleware_is_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            with self.subTest(path):
+                self.assertTrue(getattr(import_string(path), 'async_capable', False))
+
+    async def test_daraja_calls_overlap(self):
+        async def initiate():
+            return await self.async_client.post(
+                '/api/payments/async/mpesa/initiate/',
+                {'phone_number': '254708374149', 'amount': '10'},
+                content_type='application/json',
+                headers={'Authorization': f'Token {self.token.key}'},
+            )
+
+        with mock.patch.object(AsyncMpesaService, 'ainitiate_stk_push', slow_stk_push):
+            started = time.monotonic()
+            responses = await asyncio.gather(*(initiate() for _ in range(REQUESTS)))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual([response.status_code for response in responses], [200] * REQUESTS)
+        # Serialized, this takes REQUESTS * DARAJA_DELAY (3 s)
+        self.assertLess(elapsed, REQUESTS * DARAJA_DELAY / 3)
+
+    async def test_subscription_check_runs_async(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/dashboard/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/pricing/')
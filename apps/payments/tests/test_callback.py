@@ -0,0 +1,78 @@
+"""
+Tests for applying M-Pesa callbacks
+Created by Cavin Otieno
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from apps.notifications.models import Notification
+from apps.payments.models import MpesaPayment
+from apps.payments.mpesa_service import MpesaService, apply_callback, get_mpesa_service
+from apps.subscriptions.models import Plan, Subscription
+
+User = get_user_model()
+
+
+def callback(checkout_request_id, result_code=0):
+    items = [
+        {'Name': 'Amount', 'Value': 1000},
+        {'Name': 'MpesaReceiptNumber', 'Value': 'QAB123'},
+        {'Name': 'TransactionDate', 'Value': 20240101120000},
+    ]
+    return {'Body': {'stkCallback': {
+        'CheckoutRequestID': checkout_request_id,
+        'ResultCode': result_code,
+        'ResultDesc': 'Processed' if result_code == 0 else 'Request cancelled by user',
+        'CallbackMetadata': {'Item': items} if result_code == 0 else {},
+    }}}
+
+
+class ApplyCallbackTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='payer@example.com', username='payer', password='x')
+        plan = Plan.objects.create(name='Pro', slug='pro', description='Pro', price=1000)
+        self.subscription = Subscription.objects.create(
+            user=self.user, plan=plan, status='trialing', end_date=timezone.now() + timedelta(days=30)
+        )
+        self.payment = MpesaPayment.objects.create(
+            user=self.user, subscription=self.subscription, amount=1000, phone_number='254700000000',
+            checkout_request_id='ws_CO_1', merchant_request_id='merchant-1',
+        )
+        self.service = get_mpesa_service()
+
+    def test_completes_payment_and_activates_subscription(self):
+        self.assertTrue(self.service.process_callback(callback('ws_CO_1')))
+        self.payment.refresh_from_db()
+        self.subscription.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.mpesa_receipt_number), ('completed', 'QAB123'))
+        self.assertEqual(self.payment.metadata['Amount'], 1000)
+        self.assertEqual(self.subscription.status, 'active')
+        receipt = Notification.objects.get()
+        self.assertEqual((receipt.kind, receipt.context['plan']), ('payment_receipt', 'Pro'))
+
+    def test_failure(self):
+        self.assertFalse(self.service.process_callback(callback('ws_CO_1', result_code=1032)))
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.result_code), ('failed', 1032))
+        self.assertEqual(self.payment.result_description, 'Request cancelled by user')
+        self.assertEqual(Notification.objects.get().kind, 'payment_failed')
+
+    def test_duplicate_is_one_read(self):
+        self.service.process_callback(callback('ws_CO_1'))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.service.process_callback(callback('ws_CO_1')))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_concurrent_duplicate_changes_nothing(self):
+        # Both callbacks read the payment while it was pending
+        stale = MpesaPayment.objects.select_related('subscription__plan').get(pk=self.payment.pk)
+        result = MpesaService.parse_callback(callback('ws_CO_1', result_code=1))
+        self.assertEqual(apply_callback(self.payment, MpesaService.parse_callback(callback('ws_CO_1'))), 'completed')
+        with self.assertNumQueries(3):  # the UPDATE that matches nothing, in a savepoint
+            self.assertEqual(apply_callback(stale, result), 'duplicate')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(Notification.objects.count(), 1)
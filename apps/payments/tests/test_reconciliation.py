@@ -0,0 +1,144 @@
+"""
+Tests for M-Pesa statement reconciliation
+Created by Cavin Otieno
+"""
+import csv
+import os
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from apps.notifications.models import Notification
+from apps.payments.models import ArchivedMpesaPayment, MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+
+User = get_user_model()
+
+STATEMENT = '''Account Holder:,ADMINOVA LTD
+Time Period:,01 Jan 2024 - 31 Jan 2024
+
+Receipt No.,Completion Time,Initiation Time,Details,Transaction Status,Paid In,Withdrawn,Balance
+QAA001,2024-01-02 10:00:00,2024-01-02 10:00:00,Pay Bill from 2547XXXXX001,Completed,"1,000.00",,1000.00
+QAA002,2024-01-03 10:00:00,2024-01-03 10:00:00,Pay Bill from 2547XXXXX002,Completed,500.00,,1500.00
+QAA003,2024-01-04 10:00:00,2024-01-04 10:00:00,Pay Bill from 2547XXXXX003,Completed,2000.00,,3500.00
+QAA004,2024-01-05 10:00:00,2024-01-05 10:00:00,Pay Bill from 2547XXXXX004,Completed,750.00,,4250.00
+QAA005,2024-01-06 10:00:00,2024-01-06 10:00:00,Business Charge,Completed,,-30.00,4220.00
+QAA006,2024-01-07 10:00:00,2024-01-07 10:00:00,Pay Bill from 2547XXXXX006,Completed,300.00,,4520.00
+'''
+
+
+def at(day):
+    return timezone.make_aware(datetime(2024, 1, day, 10))
+
+
+class ReconcileStatementTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='payer@example.com', username='payer', password='x')
+
+        def payment(receipt, amount, **fields):
+            return MpesaPayment.objects.create(
+                user=self.user, amount=amount, phone_number='254700000000', checkout_request_id=f'ws_CO_{receipt}',
+                merchant_request_id=f'merchant-{receipt}', mpesa_receipt_number=receipt, **fields
+            )
+
+        payment('QAA001', 1000, status='completed', result_code=0, transaction_date=at(2))
+        payment('QAA002', 400, status='completed', result_code=0, transaction_date=at(3))
+        # Paid as QAA004, but the callback never arrived: no receipt here
+        self.stuck = self.unreceipted(750, '254712345004', at(5) - timedelta(minutes=1))
+        # Within the statement period but not on it
+        payment('QZZ999', 250, status='completed', result_code=0, transaction_date=at(6))
+        ArchivedMpesaPayment.objects.create(
+            id=1000, user=self.user, amount=300, phone_number='254700000000', checkout_request_id='ws_CO_old',
+            merchant_request_id='merchant-old', mpesa_receipt_number='QAA006', status='completed',
+            transaction_date=at(7), created_at=at(7), updated_at=at(7),
+        )
+
+    def unreceipted(self, amount, phone_number, initiated, status='pending'):
+        payment = MpesaPayment.objects.create(
+            user=self.user, amount=amount, phone_number=phone_number, status=status,
+            checkout_request_id=f'ws_CO_{phone_number}_{initiated:%H%M}',
+            merchant_request_id=f'merchant-{phone_number}_{initiated:%H%M}',
+        )
+        MpesaPayment.objects.filter(pk=payment.pk).update(created_at=initiated)
+        return payment
+
+    def reconcile(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            statement = os.path.join(directory, 'statement.csv')
+            with open(statement, 'w', encoding='utf-8-sig') as handle:
+                handle.write(STATEMENT)
+            report = os.path.join(directory, 'report.csv')
+            out = StringIO()
+            call_command('reconcile_statement', statement, *args, report=report, chunk_size=2, stdout=out, **options)
+            with open(report, newline='') as handle:
+                return out.getvalue(), list(csv.DictReader(handle))
+
+    def test_report(self):
+        out, rows = self.reconcile()
+        self.assertIn('Matched:                 3', out)
+        self.assertIn('(1 not payments received)', out)
+        self.assertEqual(
+            sorted((row['kind'], row['receipt_number']) for row in rows),
+            [('amount_mismatch', 'QAA002'), ('missing_from_statement', 'QZZ999'), ('missing_here', 'QAA003')],
+        )
+        mismatch = next(row for row in rows if row['kind'] == 'amount_mismatch')
+        self.assertEqual((Decimal(mismatch['statement_amount']), Decimal(mismatch['our_amount'])), (500, 400))
+        # Dry run
+        self.assertIn('run with --apply', out)
+        self.stuck.refresh_from_db()
+        self.assertEqual(self.stuck.status, 'pending')
+
+    def test_apply_corrections(self):
+        out, rows = self.reconcile('--apply')
+        self.assertIn('Corrections applied:     1', out)
+        self.stuck.refresh_from_db()
+        self.assertEqual((self.stuck.status, self.stuck.result_code), ('completed', 0))
+        self.assertEqual((self.stuck.mpesa_receipt_number, self.stuck.transaction_date), ('QAA004', at(5)))
+
+    def test_unreceipted_payments_need_an_unambiguous_match(self):
+        # Another number, too early, and a different amount
+        self.unreceipted(750, '254712345005', at(5) - timedelta(minutes=2))
+        self.unreceipted(750, '254712345004', at(5) - timedelta(minutes=30))
+        self.unreceipted(700, '254712345004', at(5) - timedelta(minutes=3))
+        out, rows = self.reconcile()
+        self.assertIn('Matched:                 3', out)
+        self.assertIn('Corrections:             1', out)
+
+        # Two payments by the same payer the statement cannot tell apart
+        self.unreceipted(750, '254799999004', at(5) - timedelta(minutes=4))
+        out, rows = self.reconcile('--apply')
+        self.assertIn(('missing_here', 'QAA004'), [(row['kind'], row['receipt_number']) for row in rows])
+        self.assertIn('Corrections applied:     0', out)
+        self.stuck.refresh_from_db()
+        self.assertEqual(self.stuck.status, 'pending')
+
+    def test_apply_activates_the_subscription(self):
+        plan = Plan.objects.create(name='Pro', slug='pro', description='Pro', price=750)
+        subscription = Subscription.objects.create(
+            user=self.user, plan=plan, status='past_due', end_date=at(5) + timedelta(days=30)
+        )
+        MpesaPayment.objects.filter(pk=self.stuck.pk).update(subscription=subscription)
+        self.reconcile('--apply')
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'active')
+        receipt = Notification.objects.get(kind='payment_receipt')
+        self.assertEqual((receipt.user, receipt.context['plan']), (self.user, 'Pro'))
+        # Applying again changes nothing
+        out, rows = self.reconcile('--apply')
+        self.assertIn('Corrections applied:     0', out)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_failed_payments_are_reported(self):
+        # A timed out request the customer paid anyway
+        MpesaPayment.objects.filter(pk=self.stuck.pk).update(status='failed', result_code=1037)
+        out, rows = self.reconcile('--apply')
+        self.assertIn('Failed or canceled here: 1', out)
+        self.assertIn(('status_mismatch', 'QAA004'), [(row['kind'], row['receipt_number']) for row in rows])
+        self.stuck.refresh_from_db()
+        self.assertEqual(self.stuck.status, 'failed')
@@ -4,12 +4,28 @@ Created by Cavin Otieno
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MpesaPaymentViewSet, mpesa_callback
+from .views import (
+    MpesaPaymentViewSet,
+    mpesa_callback,
+    initiate_async,
+    mpesa_callback_async,
+    payment_status_async,
+)
 
 router = DefaultRouter()
 router.register(r'mpesa', MpesaPaymentViewSet, basename='mpesa-payment')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Before the router, whose mpesa/<pk>/ detail route would match it
     path('mpesa/callback/', mpesa_callback, name='mpesa-callback'),
+    path('', include(router.urls)),
+    
+    # Async endpoints (non-blocking under ASGI)
+    path('async/mpesa/initiate/', initiate_async, name='mpesa-initiate-async'),
+    path('async/mpesa/callback/', mpesa_callback_async, name='mpesa-callback-async'),
+    path(
+        'async/mpesa/status/<str:checkout_request_id>/',
+        payment_status_async,
+        name='mpesa-status-async'
+    ),
 ]
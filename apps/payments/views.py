@@ -6,29 +6,65 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse
 import json
 import logging
 
-from .models import MpesaPayment
-from .serializers import MpesaPaymentSerializer, InitiatePaymentSerializer
-from .mpesa_service import MpesaService
+from .archive import parse_month
+from .models import ArchivedMpesaPayment, MpesaPayment
+from .serializers import ArchivedMpesaPaymentSerializer, MpesaPaymentSerializer, InitiatePaymentSerializer
+from .mpesa_service import AsyncMpesaService, get_mpesa_service
+from apps.core.log import Redacted
+from apps.core.query_budget import query_budget
+from apps.core.mixins import ConditionalGetMixin, ValuesListMixin
+from apps.core.ratelimit import RateLimitThrottle, check_rate_limit, phone_ident
 from apps.subscriptions.models import Plan, Subscription
+from apps.users.authentication import authenticate_token
 
 logger = logging.getLogger(__name__)
 
 
-class MpesaPaymentViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet for M-Pesa payments"""
+class MpesaPaymentViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for M-Pesa payments
+    Lists recent payments; ?archive=1 reads those moved to the archive table
+    instead, and ?month=YYYY-MM limits either to one month.
+    """
     serializer_class = MpesaPaymentSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 3, 'retrieve': 2, 'initiate': 6}
+    throttle_scope = None
+    
+    @property
+    def archive(self):
+        return self.request.query_params.get('archive', '').lower() in ('1', 'true', 'yes')
     
     def get_queryset(self):
-        return MpesaPayment.objects.filter(user=self.request.user)
+        model = ArchivedMpesaPayment if self.archive else MpesaPayment
+        queryset = model.objects.filter(user=self.request.user)
+        month = self.request.query_params.get('month')
+        if month:
+            try:
+                start, end = parse_month(month)
+            except ValueError:
+                raise ValidationError({'month': 'Expected YYYY-MM.'})
+            queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.archive:
+            return ArchivedMpesaPaymentSerializer
+        return super().get_serializer_class()
     
-    @action(detail=False, methods=['post'])
+    @action(
+        detail=False, methods=['post'],
+        throttle_classes=[RateLimitThrottle], throttle_scope='payments.initiate'
+    )
     def initiate(self, request):
         """Initiate M-Pesa STK Push payment"""
         serializer = InitiatePaymentSerializer(data=request.data)
@@ -61,7 +97,7 @@ class MpesaPaymentViewSet(viewsets.ReadOnlyModelViewSet):
         
         try:
             # Initiate STK Push
-            mpesa_service = MpesaService()
+            mpesa_service = get_mpesa_service()
             payment = mpesa_service.initiate_stk_push(
                 phone_number=phone_number,
                 amount=amount,
@@ -82,13 +118,14 @@ class MpesaPaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
-            logger.error(f"Error initiating payment: {str(e)}")
+            logger.error("Error initiating payment: %s", e)
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+@query_budget(7)
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -99,10 +136,10 @@ def mpesa_callback(request):
     """
     try:
         callback_data = json.loads(request.body.decode('utf-8'))
-        logger.info(f"Received M-Pesa callback: {callback_data}")
+        logger.info("Received M-Pesa callback: %s", Redacted(callback_data))
         
         # Process callback
-        mpesa_service = MpesaService()
+        mpesa_service = get_mpesa_service()
         success = mpesa_service.process_callback(callback_data)
         
         if success:
@@ -111,5 +148,140 @@ def mpesa_callback(request):
             return JsonResponse({'ResultCode': 1, 'ResultDesc': 'Failed'})
             
     except Exception as e:
-        logger.error(f"Error processing M-Pesa callback: {str(e)}")
+        logger.error("Error processing M-Pesa callback: %s", e)
+        return JsonResponse({'ResultCode': 1, 'ResultDesc': str(e)})
+
+
+# Async endpoints
+# These run natively on the event loop under ASGI (adminova/asgi.py), so an
+# in-flight Daraja call does not hold a worker thread. DRF views are sync
+# only, hence plain Django async views with token authentication.
+
+async def _aauthenticate(request):
+    """Resolve the user from an 'Authorization: Token <key>' header"""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0] != 'Token':
+        return None
+    try:
+        user, token = await sync_to_async(authenticate_token)(parts[1])
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def _unauthorized():
+    return JsonResponse(
+        {'detail': 'Authentication credentials were not provided.'},
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+
+
+@query_budget(5)
+@csrf_exempt
+@require_POST
+async def initiate_async(request):
+    """Async version of MpesaPaymentViewSet.initiate"""
+    user = await _aauthenticate(request)
+    if user is None:
+        return _unauthorized()
+    
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    retry_after = await sync_to_async(check_rate_limit)('payments.initiate', {
+        'ip': RateLimitThrottle().get_ident(request),
+        'user': user.pk,
+        'phone': phone_ident(data.get('phone_number') if isinstance(data, dict) else None),
+    })
+    if retry_after:
+        response = JsonResponse(
+            {'detail': f'Request was throttled. Expected available in {retry_after} seconds.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+    
+    serializer = InitiatePaymentSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    phone_number = serializer.validated_data['phone_number']
+    amount = serializer.validated_data['amount']
+    plan_id = serializer.validated_data.get('plan_id')
+    description = serializer.validated_data.get('description', 'Payment')
+    
+    # Create pending subscription if plan_id is provided
+    subscription = None
+    if plan_id:
+        try:
+            plan = await Plan.objects.aget(id=plan_id, is_active=True)
+        except Plan.DoesNotExist:
+            return JsonResponse({'error': 'Invalid plan ID'}, status=status.HTTP_400_BAD_REQUEST)
+        amount = plan.price  # Use plan price
+        description = f"Subscription: {plan.name}"
+        subscription = await Subscription.objects.acreate(
+            user=user,
+            plan=plan,
+            status='trialing'
+        )
+    
+    try:
+        payment = await get_mpesa_service(AsyncMpesaService).ainitiate_stk_push(
+            phone_number=phone_number,
+            amount=amount,
+            account_reference=f"USER{user.id}",
+            transaction_desc=description,
+            user=user,
+            subscription=subscription,
+        )
+    except Exception as e:
+        logger.error("Error initiating payment: %s", e)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return JsonResponse({
+        'message': 'STK Push initiated successfully. Please check your phone.',
+        'checkout_request_id': payment.checkout_request_id,
+        'amount': str(payment.amount),
+    })
+
+
+@query_budget(7)
+@csrf_exempt
+@require_POST
+async def mpesa_callback_async(request):
+    """Async version of mpesa_callback"""
+    try:
+        callback_data = json.loads(request.body.decode('utf-8'))
+        logger.info("Received M-Pesa callback: %s", Redacted(callback_data))
+        
+        success = await get_mpesa_service(AsyncMpesaService).aprocess_callback(callback_data)
+        
+        if success:
+            return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Success'})
+        else:
+            return JsonResponse({'ResultCode': 1, 'ResultDesc': 'Failed'})
+            
+    except Exception as e:
+        logger.error("Error processing M-Pesa callback: %s", e)
         return JsonResponse({'ResultCode': 1, 'ResultDesc': str(e)})
+
+
+@query_budget(2)
+@require_GET
+async def payment_status_async(request, checkout_request_id):
+    """Status of one of the current user's payments, by checkout request ID"""
+    user = await _aauthenticate(request)
+    if user is None:
+        return _unauthorized()
+    
+    try:
+        payment = await MpesaPayment.objects.aget(
+            user=user,
+            checkout_request_id=checkout_request_id
+        )
+    except MpesaPayment.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return JsonResponse(MpesaPaymentSerializer(payment).data)
@@ -14,6 +14,7 @@ class PlanAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     ordering = ['display_order', 'price']
+    changelist_query_budget = 5
 
 
 @admin.register(Subscription)
@@ -24,5 +25,9 @@ class SubscriptionAdmin(admin.ModelAdmin):
     search_fields = ['user__email', 'user__username']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    list_select_related = ['user', 'plan']
+    # Skip the unfiltered COUNT(*) on this large table
+    show_full_result_count = False
+    changelist_query_budget = 7
     
     readonly_fields = ['created_at', 'updated_at']
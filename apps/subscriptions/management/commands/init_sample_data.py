@@ -117,24 +117,19 @@ class Command(BaseCommand):
             },
         ]
         
-        created_count = 0
+        created = set(Plan.objects.upsert(plans_data))
         for plan_data in plans_data:
-            plan, created = Plan.objects.get_or_create(
-                slug=plan_data['slug'],
-                defaults=plan_data
-            )
-            if created:
-                created_count += 1
+            if plan_data['slug'] in created:
                 self.stdout.write(
-                    self.style.SUCCESS(f'✓ Created plan: {plan.name}')
+                    self.style.SUCCESS(f"✓ Created plan: {plan_data['name']}")
                 )
             else:
                 self.stdout.write(
-                    self.style.WARNING(f'- Plan already exists: {plan.name}')
+                    self.style.WARNING(f"- Updated existing plan: {plan_data['name']}")
                 )
         
         self.stdout.write(
-            self.style.SUCCESS(f'\n✓ Created {created_count} new plans')
+            self.style.SUCCESS(f'\n✓ Created {len(created)} new plans')
         )
         self.stdout.write(
             self.style.SUCCESS(f'✓ Total plans in database: {Plan.objects.count()}')
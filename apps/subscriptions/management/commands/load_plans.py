@@ -1,5 +1,6 @@
 """
 Management command to load subscription plans
+Plans are upserted by slug, so re-running it applies edits to this list.
 """
 from django.core.management.base import BaseCommand
 from apps.subscriptions.models import Plan
@@ -124,22 +125,14 @@ class Command(BaseCommand):
             },
         ]
 
-        created_count = 0
+        created = set(Plan.objects.upsert(plans_data))
         for plan_data in plans_data:
-            plan, created = Plan.objects.get_or_create(
-                slug=plan_data['slug'],
-                defaults=plan_data
-            )
-            if created:
-                created_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'✓ Created: {plan.name} - KSh {plan.price}/{plan.billing_cycle}')
-                )
+            label = f"{plan_data['name']} - KSh {plan_data['price']}/{plan_data['billing_cycle']}"
+            if plan_data['slug'] in created:
+                self.stdout.write(self.style.SUCCESS(f'✓ Created: {label}'))
             else:
-                self.stdout.write(
-                    self.style.WARNING(f'• Already exists: {plan.name}')
-                )
+                self.stdout.write(self.style.WARNING(f'• Updated: {label}'))
 
         self.stdout.write(
-            self.style.SUCCESS(f'\n✓ Loaded {created_count} new plans!')
+            self.style.SUCCESS(f'\n✓ Loaded {len(plans_data)} plans ({len(created)} new)!')
         )
@@ -3,6 +3,7 @@ Subscription middleware for Adminova
 Checks user subscription status and enforces access control
 Created by Cavin Otieno
 """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
@@ -12,10 +13,16 @@ class SubscriptionCheckMiddleware:
     """
     Middleware to check if user has an active subscription
     before accessing protected views
+    Sync and async capable, so async views stay on the event loop under ASGI.
     """
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
         
         # URLs that don't require subscription check
         self.exempt_urls = [
@@ -28,27 +35,42 @@ class SubscriptionCheckMiddleware:
             '/checkout/',
         ]
     
+    def is_exempt_url(self, request):
+        return any(request.path.startswith(url) for url in self.exempt_urls)
+    
+    @staticmethod
+    def is_exempt_user(user):
+        """Unauthenticated users and staff/superusers skip the check"""
+        return not user.is_authenticated or user.is_staff or user.is_superuser
+    
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
         # Skip for exempt URLs
-        if any(request.path.startswith(url) for url in self.exempt_urls):
+        if self.is_exempt_url(request) or self.is_exempt_user(request.user):
             return self.get_response(request)
         
-        # Skip for unauthenticated users
-        if not request.user.is_authenticated:
-            return self.get_response(request)
+        # Check if user has an active subscription
+        if not request.user.subscriptions.filter(status='active').exists():
+            return self.require_subscription(request)
         
-        # Skip for staff/superusers
-        if request.user.is_staff or request.user.is_superuser:
-            return self.get_response(request)
+        return self.get_response(request)
+    
+    async def __acall__(self, request):
+        if self.is_exempt_url(request):
+            return await self.get_response(request)
         
-        # Check if user has an active subscription
-        has_active_subscription = request.user.subscriptions.filter(
-            status='active'
-        ).exists()
+        user = await request.auser()
+        if self.is_exempt_user(user):
+            return await self.get_response(request)
         
-        if not has_active_subscription:
-            messages.warning(request, 'You need an active subscription to access this feature.')
-            return redirect('pricing')
+        if not await user.subscriptions.filter(status='active').aexists():
+            return self.require_subscription(request)
         
-        response = self.get_response(request)
-        return response
+        return await self.get_response(request)
+    
+    @staticmethod
+    def require_subscription(request):
+        messages.warning(request, 'You need an active subscription to access this feature.')
+        return redirect('pricing')
@@ -10,6 +10,26 @@ from datetime import timedelta
 from apps.core.models import TimeStampedModel
 
 
+class PlanQuerySet(models.QuerySet):
+    
+    def upsert(self, plans_data):
+        """
+        Insert or update plans by slug
+        One SELECT of the existing slugs, then one INSERT ... ON CONFLICT
+        DO UPDATE. Returns the slugs that did not exist before.
+        """
+        slugs = [plan_data['slug'] for plan_data in plans_data]
+        existing = set(self.filter(slug__in=slugs).values_list('slug', flat=True))
+        update_fields = sorted({field for plan_data in plans_data for field in plan_data} - {'slug'})
+        self.bulk_create(
+            [self.model(**plan_data) for plan_data in plans_data],
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=[*update_fields, 'updated_at'],
+        )
+        return [slug for slug in slugs if slug not in existing]
+
+
 class Plan(TimeStampedModel):
     """
     Subscription plan model
@@ -33,6 +53,8 @@ class Plan(TimeStampedModel):
     is_popular = models.BooleanField(default=False)
     display_order = models.IntegerField(default=0)
     
+    objects = PlanQuerySet.as_manager()
+    
     class Meta:
         db_table = 'subscription_plans'
         verbose_name = 'Subscription Plan'
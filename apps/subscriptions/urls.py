@@ -7,8 +7,9 @@ from rest_framework.routers import DefaultRouter
 from .views import PlanViewSet, SubscriptionViewSet
 
 router = DefaultRouter()
-router.register(r'', PlanViewSet, basename='plan')
+# Before the plans, whose <slug>/ detail route would match subscriptions/
 router.register(r'subscriptions', SubscriptionViewSet, basename='subscription')
+router.register(r'', PlanViewSet, basename='plan')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -6,37 +6,43 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from apps.core.mixins import ConditionalGetMixin, ValuesListMixin
+from apps.notifications.dispatch import notify
 from .models import Plan, Subscription
 from .serializers import PlanSerializer, SubscriptionSerializer
 
 
-class PlanViewSet(viewsets.ReadOnlyModelViewSet):
+class PlanViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for subscription plans"""
     queryset = Plan.objects.filter(is_active=True)
     serializer_class = PlanSerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
+    query_budgets = {'list': 3, 'retrieve': 1}
 
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+class SubscriptionViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for user subscriptions"""
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
+    # Each subscription nests its plan
+    last_modified_fields = ('updated_at', 'plan__updated_at')
+    query_budgets = {
+        'list': 3, 'retrieve': 2, 'create': 3, 'update': 3, 'partial_update': 3,
+        'destroy': 4, 'active': 2, 'cancel': 4,
+    }
     
     def get_queryset(self):
-        return Subscription.objects.filter(user=self.request.user)
+        # SubscriptionSerializer nests the plan (list reads it with a join instead)
+        return Subscription.objects.filter(user=self.request.user).select_related('plan')
     
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get user's active subscription"""
-        subscription = Subscription.objects.filter(
-            user=request.user,
-            status='active'
-        ).first()
+        subscription = self.get_queryset().filter(status='active').first()
         
         if subscription:
-            serializer = self.get_serializer(subscription)
-            return Response(serializer.data)
+            return self.object_response(subscription, lambda: Response(self.get_serializer(subscription).data))
         return Response({'detail': 'No active subscription found.'}, status=status.HTTP_404_NOT_FOUND)
     
     @action(detail=True, methods=['post'])
@@ -44,4 +50,8 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         """Cancel a subscription"""
         subscription = self.get_object()
         subscription.cancel()
+        notify(
+            subscription.user_id, 'subscription_canceled',
+            plan=subscription.plan.name, end_date=f'{subscription.end_date:%Y-%m-%d}'
+        )
         return Response({'detail': 'Subscription canceled successfully.'})
@@ -14,6 +14,7 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ['is_staff', 'is_superuser', 'is_active', 'is_premium', 'email_verified']
     search_fields = ['email', 'username', 'first_name', 'last_name']
     ordering = ['-date_joined']
+    changelist_query_budget = 5
     
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Additional Info', {'fields': ('phone_number', 'avatar', 'bio', 'email_verified', 'is_premium')}),
@@ -26,3 +27,5 @@ class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'city', 'country', 'created_at']
     search_fields = ['user__email', 'user__username', 'city', 'country']
     list_filter = ['country', 'receive_notifications']
+    list_select_related = ['user']
+    changelist_query_budget = 6
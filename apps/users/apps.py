@@ -0,0 +1,14 @@
+"""
+App configuration for Users app
+Created by Cavin Otieno
+"""
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    name = 'apps.users'
+    verbose_name = 'Users'
+
+    def ready(self):
+        # Connect the token cache invalidation receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,94 @@
+"""
+Cached token authentication for Adminova
+Resolves API tokens from the default cache (Redis in production) instead of
+querying authtoken_token on every request. Cache entries are dropped as soon
+as the token is deleted or its user or profile is saved (see .signals), so the TTL
+only bounds how long an unused entry lives. That only holds for a cache every
+process shares: with a per-process one (no REDIS_URL) other workers would
+keep serving the dropped entries, so nothing is cached.
+
+With AUTH_SIGNED_TOKENS the token endpoint issues signed, expiring tokens
+carrying the user id instead; they need no token lookup at all.
+Created by Cavin Otieno
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from apps.core.cache import cache_is_shared
+from .signals import token_cache_key, user_cache_key
+
+User = get_user_model()
+
+SIGNED_TOKEN_SALT = 'apps.users.authentication.signed-token'
+
+
+def credentials_cache_timeout():
+    """Seconds to cache resolved tokens and users for; 0 to not cache them"""
+    return settings.AUTH_TOKEN_CACHE_TIMEOUT if cache_is_shared() else 0
+
+
+def issue_signed_token(user):
+    """
+    Signed token for `user`; it embeds part of the session auth hash, so a
+    password change revokes it
+    """
+    return signing.dumps({'u': user.pk, 'h': user.get_session_auth_hash()[:16]}, salt=SIGNED_TOKEN_SALT)
+
+
+def _authenticate_signed(key):
+    try:
+        data = signing.loads(key, salt=SIGNED_TOKEN_SALT, max_age=settings.AUTH_SIGNED_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+
+    timeout = credentials_cache_timeout()
+    user = cache.get(user_cache_key(data['u'])) if timeout else None
+    if user is None:
+        try:
+            user = User.objects.select_related('profile').get(pk=data['u'])
+        except User.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if timeout:
+            cache.set(user_cache_key(user.pk), user, timeout)
+
+    if user.get_session_auth_hash()[:16] != data['h']:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    return user, key
+
+
+def authenticate_token(key):
+    """
+    Resolve an API token to (user, token), raising AuthenticationFailed
+    Shared by the DRF authentication class and the async payment views.
+    """
+    if ':' in key:
+        # Database tokens are hex; signed tokens contain separators
+        if not settings.AUTH_SIGNED_TOKENS:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        user, token = _authenticate_signed(key)
+    else:
+        timeout = credentials_cache_timeout()
+        token = cache.get(token_cache_key(key)) if timeout else None
+        if token is None:
+            try:
+                token = Token.objects.select_related('user__profile').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            if timeout:
+                cache.set(token_cache_key(key), token, timeout)
+        user = token.user
+
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication backed by the cache (and signed tokens, if enabled)"""
+
+    def authenticate_credentials(self, key):
+        return authenticate_token(key)
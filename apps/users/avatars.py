@@ -0,0 +1,176 @@
+"""
+Avatar processing for Adminova
+Uploaded avatars are resized to the AVATAR_VARIANTS sizes, each saved as
+WebP and JPEG under a content-hashed name (avatars/variants/<hash>-<variant>.<ext>),
+so variants never change once written and are served with an immutable
+Cache-Control header. Processing starts after the upload's transaction
+commits, on a small thread pool (inline with AVATAR_WORKERS=0), and the
+result is recorded in User.avatar_variants:
+
+    {'source': 'avatars/me.png',
+     'thumb': {'webp': 'avatars/variants/3f2a...-thumb.webp', 'jpeg': '...'},
+     'medium': {...}}
+
+Run `manage.py process_avatars` to backfill existing avatars.
+Created by Cavin Otieno
+"""
+import hashlib
+import io
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.http import FileResponse, Http404
+from django.utils.cache import patch_cache_control
+from apps.core.query_budget import query_budget
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+VARIANT_DIR = 'avatars/variants'
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# <hash>-<variant>.<ext>, plus the suffix storage adds to a name taken meanwhile
+VARIANT_NAME = re.compile(rf'[0-9a-f]{{20}}-[\w-]+\.(?:{"|".join(FORMATS)})')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatars')
+        return _executor
+
+
+def _run(user_id, name):
+    try:
+        process_avatar(user_id, name)
+    finally:
+        # Worker threads hold their own connections
+        connections.close_all()
+
+
+def schedule_avatar(user):
+    """Process the current avatar of `user` once the transaction commits"""
+    user_id, name = user.pk, user.avatar.name
+
+    def submit():
+        if settings.AVATAR_WORKERS > 0:
+            _get_executor().submit(_run, user_id, name)
+        else:
+            process_avatar(user_id, name)
+
+    transaction.on_commit(submit)
+
+
+def variant_name(prefix, variant, fmt):
+    return f'{VARIANT_DIR}/{prefix}-{variant}.{fmt}'
+
+
+def render_variants(original):
+    """Resize an image file to every variant; returns {variant: {fmt: bytes}}"""
+    from PIL import Image, ImageOps
+
+    sizes = sorted(settings.AVATAR_VARIANTS.items(), key=lambda item: item[1], reverse=True)
+    with Image.open(original) as image:
+        # JPEG decoders can downscale while decoding, far cheaper than resizing
+        image.draft('RGB', (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    rendered = {}
+    for variant, size in sizes:
+        # Each variant is resized from the previous (larger) one
+        image.thumbnail((size, size), Image.LANCZOS)
+        opaque = image
+        if image.mode == 'RGBA':
+            opaque = Image.new('RGB', image.size, 'white')
+            opaque.paste(image, mask=image.getchannel('A'))
+        rendered[variant] = {}
+        for fmt, pil_format in FORMATS.items():
+            buffer = io.BytesIO()
+            (image if fmt == 'webp' else opaque).save(
+                buffer, pil_format, quality=settings.AVATAR_QUALITY, optimize=fmt == 'jpeg', method=4
+            )
+            rendered[variant][fmt] = buffer.getvalue()
+    return rendered
+
+
+def generate_variants(name):
+    """Write the variants of the stored image `name`; returns the avatar_variants value"""
+    digest = hashlib.sha256(repr((sorted(settings.AVATAR_VARIANTS.items()), settings.AVATAR_QUALITY)).encode())
+    with default_storage.open(name, 'rb') as original:
+        for chunk in original.chunks():
+            digest.update(chunk)
+        prefix = digest.hexdigest()[:20]
+
+        variants = {'source': name}
+        missing = False
+        for variant in settings.AVATAR_VARIANTS:
+            variants[variant] = {fmt: variant_name(prefix, variant, fmt) for fmt in FORMATS}
+            missing = missing or not all(default_storage.exists(path) for path in variants[variant].values())
+        if not missing:
+            # Same image uploaded before
+            return variants
+
+        original.seek(0)
+        rendered = render_variants(original)
+
+    for variant, formats in rendered.items():
+        for fmt, data in formats.items():
+            path = variants[variant][fmt]
+            if not default_storage.exists(path):
+                variants[variant][fmt] = default_storage.save(path, ContentFile(data))
+    return variants
+
+
+def process_avatar(user_id, name):
+    """Generate the variants of avatar `name` and record them on the user"""
+    from .signals import invalidate_user
+
+    try:
+        variants = generate_variants(name)
+    except Exception:
+        logger.exception('Avatar processing failed for user %s (%s)', user_id, name)
+        return None
+    # Skipped if the avatar was replaced meanwhile; its own job records it
+    if User.objects.filter(pk=user_id, avatar=name).update(avatar_variants=variants):
+        invalidate_user(user_id)
+    return variants
+
+
+def avatar_urls(user, request=None):
+    """{variant: {fmt: url}} for the current avatar; empty until processed"""
+    variants = user.avatar_variants or {}
+    if not user.avatar or variants.get('source') != user.avatar.name:
+        return {}
+    urls = {}
+    for variant, formats in variants.items():
+        if variant == 'source':
+            continue
+        urls[variant] = {}
+        for fmt, path in formats.items():
+            url = default_storage.url(path)
+            urls[variant][fmt] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+@query_budget(0)
+def avatar_variant_view(request, name):
+    """Serve an avatar variant from storage; the names are content-hashed, so cache forever"""
+    path = f'{VARIANT_DIR}/{name}'
+    if not VARIANT_NAME.fullmatch(name) or not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path, 'rb'))
+    patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
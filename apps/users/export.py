@@ -0,0 +1,79 @@
+"""
+Per-user data export for Adminova
+Streams a ZIP archive with one NDJSON file per model (user, profile,
+subscriptions, payments with their callback metadata, archived payments,
+notifications).
+Rows are read in keyset-paginated chunks and compressed straight into the
+output as it is consumed, so memory stays flat however much a user has.
+Used by UserViewSet.export and `manage.py export_user`.
+Created by Cavin Otieno
+"""
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from apps.core.iterators import keyset_iterator
+from apps.notifications.models import Notification
+from apps.payments.models import ArchivedMpesaPayment, MpesaPayment
+from apps.subscriptions.models import Subscription
+from .models import Profile
+
+User = get_user_model()
+
+# Bytes buffered before a piece of the archive is handed to the response
+FLUSH_SIZE = 64 * 1024
+
+
+def export_querysets(user):
+    """(file name, .values() queryset) pairs making up the export"""
+    user_fields = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+    return [
+        ('user.ndjson', User.objects.filter(pk=user.pk).values(*user_fields)),
+        ('profile.ndjson', Profile.objects.filter(user=user).values()),
+        ('subscriptions.ndjson', Subscription.objects.filter(user=user).values()),
+        ('payments.ndjson', MpesaPayment.objects.filter(user=user).values()),
+        ('archived_payments.ndjson', ArchivedMpesaPayment.objects.filter(user=user).values()),
+        ('notifications.ndjson', Notification.objects.filter(user=user).values()),
+    ]
+
+
+class _StreamBuffer:
+    """Write-only file object; ZipFile writes a streamable archive into it"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_export(user, chunk_size=1000):
+    """Yield the export archive of `user` as bytes"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, queryset in export_querysets(user):
+            with archive.open(name, 'w', force_zip64=True) as member:
+                for row in keyset_iterator(queryset, chunk_size):
+                    member.write(encoder.encode(row).encode() + b'\n')
+                    if buffer.size >= FLUSH_SIZE:
+                        yield buffer.pop()
+    # The rest of the last file and the central directory
+    yield buffer.pop()
+
+
+def export_filename(user):
+    return f'adminova-user-{user.pk}-export.zip'
+
@@ -0,0 +1,44 @@
+"""
+Management command to export everything stored for a user
+Run: python manage.py export_user customer@example.com
+     python manage.py export_user 42 --output - > export.zip
+Created by Cavin Otieno
+
+Writes the same streamed ZIP of NDJSON files as GET /api/auth/users/<id>/export/.
+"""
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.export import export_filename, iter_export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Export a user and their profile, subscriptions, payments and notifications as a ZIP of NDJSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Email address or id')
+        parser.add_argument('--output', help="File to write, or '-' for stdout (default: adminova-user-<id>-export.zip)")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'email__iexact': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        output = options['output'] or export_filename(user)
+        handle = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            size = 0
+            for chunk in iter_export(user, options['chunk_size']):
+                handle.write(chunk)
+                size += len(chunk)
+        finally:
+            if handle is not sys.stdout.buffer:
+                handle.close()
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {output} ({size:,} bytes)'))
@@ -0,0 +1,52 @@
+"""
+Management command to generate missing avatar variants
+Run: python manage.py process_avatars
+     python manage.py process_avatars --all --workers 4
+Created by Cavin Otieno
+
+Backfills avatars uploaded before variants existed, or after AVATAR_VARIANTS
+changed (--all). Variants already in storage are reused, see apps.users.avatars.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from apps.users.avatars import process_avatar
+
+User = get_user_model()
+
+
+def _process(user_id, name):
+    try:
+        return process_avatar(user_id, name)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for avatars that do not have them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocess every avatar')
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        users = (
+            User.objects.exclude(avatar='').exclude(avatar__isnull=True)
+            .only('pk', 'avatar', 'avatar_variants').order_by('pk')
+        )
+        jobs = [
+            (user.pk, user.avatar.name) for user in users.iterator()
+            if options['all'] or user.avatar_variants.get('source') != user.avatar.name
+        ]
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(lambda job: _process(*job), jobs))
+        else:
+            results = [process_avatar(*job) for job in jobs]
+
+        failed = results.count(None)
+        self.stdout.write(self.style.SUCCESS(f'✓ Processed {len(jobs) - failed} avatars'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} avatars failed, see the log'))
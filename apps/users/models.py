@@ -2,11 +2,19 @@
 Custom user model for Adminova
 Created by Cavin Otieno
 """
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db import models
 from apps.core.models import TimeStampedModel
 
 
+def validate_avatar_size(file):
+    """Reject avatars larger than AVATAR_MAX_UPLOAD_SIZE"""
+    if file.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+        raise ValidationError(f'Avatar must be at most {settings.AVATAR_MAX_UPLOAD_SIZE // 1048576}MB.')
+
+
 class User(AbstractUser, TimeStampedModel):
     """
     Custom user model extending Django's AbstractUser
@@ -15,7 +23,9 @@ class User(AbstractUser, TimeStampedModel):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     
     # Profile fields
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, validators=[validate_avatar_size])
+    # Resized copies of the avatar, see apps.users.avatars
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     
     # Metadata
@@ -4,6 +4,8 @@ Created by Cavin Otieno
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from apps.notifications.dispatch import notify
+from .avatars import avatar_urls
 from .models import Profile
 
 User = get_user_model()
@@ -22,15 +24,31 @@ class ProfileSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user model"""
     profile = ProfileSerializer(read_only=True)
+    avatar_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = [
             'id', 'email', 'username', 'first_name', 'last_name',
-            'phone_number', 'avatar', 'bio', 'is_premium',
+            'phone_number', 'avatar', 'avatar_urls', 'bio', 'is_premium',
             'email_verified', 'date_joined', 'profile'
         ]
         read_only_fields = ['id', 'is_premium', 'email_verified', 'date_joined']
+    
+    def get_avatar_urls(self, obj):
+        """Resized variants, e.g. {'thumb': {'webp': url, 'jpeg': url}}; empty while processing"""
+        return avatar_urls(obj, self.context.get('request'))
+
+
+class UserListSerializer(serializers.ModelSerializer):
+    """Lean serializer for user listings, without the profile"""
+    class Meta:
+        model = User
+        fields = [
+            'id', 'email', 'username', 'first_name', 'last_name',
+            'is_premium', 'date_joined'
+        ]
+        read_only_fields = fields
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -51,4 +69,5 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         validated_data.pop('password_confirm')
         user = User.objects.create_user(**validated_data)
         Profile.objects.create(user=user)
+        notify(user.pk, 'welcome')
         return user
@@ -0,0 +1,70 @@
+"""
+Signal receivers for Users app
+Invalidate cached API credentials (apps.users.authentication) and `me`
+payloads when a token is deleted or its user or profile changes, e.g.
+deactivation or a password change, and schedule avatar processing
+(apps.users.avatars) when a new avatar is saved
+Created by Cavin Otieno
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import Profile
+
+User = get_user_model()
+
+
+def token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def me_cache_key(user_id):
+    return f'users:me:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Drop everything cached for a user: its tokens, the user and its `me` payload"""
+    keys = [token_cache_key(key) for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True)]
+    cache.delete_many([user_cache_key(user_id), me_cache_key(user_id), *keys])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, created=False, update_fields=None, **kwargs):
+    """Drop cached credentials whenever the user changes (but not on login)"""
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def process_new_avatar(sender, instance, update_fields=None, **kwargs):
+    """Generate the avatar variants when a new avatar is saved"""
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if instance.avatar and instance.avatar_variants.get('source') != instance.avatar.name:
+        from .avatars import schedule_avatar
+        schedule_avatar(instance)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    # Its tokens are deleted by cascade, which fires invalidate_deleted_token
+    cache.delete_many([user_cache_key(instance.pk), me_cache_key(instance.pk)])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_user(sender, instance, **kwargs):
+    # Cached users carry their profile
+    invalidate_user(instance.user_id)
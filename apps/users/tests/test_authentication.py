@@ -0,0 +1,108 @@
+"""
+Tests for cached and signed token authentication
+Created by Cavin Otieno
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from apps.users.authentication import issue_signed_token
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='token@example.com', username='token', password='TokenPass123!'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('user-me')
+
+    def get_me(self, key=None):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        with self.assertNumQueries(1):  # token, user and profile
+            self.assertEqual(self.get_me().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.get_me()
+        self.assertEqual(response.data['email'], 'token@example.com')
+
+    def test_deleted_token_is_rejected(self):
+        self.get_me()
+        self.token.delete()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_user_changes_are_not_served_stale(self):
+        self.get_me()
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertEqual(self.get_me().data['first_name'], 'Changed')
+
+    def test_login_does_not_invalidate(self):
+        self.get_me()
+        self.client.force_login(self.user)  # saves last_login only
+        self.client.logout()
+        with self.assertNumQueries(0):
+            self.get_me()
+
+    @override_settings(CACHE_SHARED=False)
+    def test_per_process_cache_is_not_used(self):
+        # Another worker deactivating the user could not clear this process' entries
+        self.get_me()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_me().status_code, 200)
+        self.assertFalse(cache.has_key(f'users:me:{self.user.pk}'))
+
+    def test_signed_tokens_rejected_unless_enabled(self):
+        self.assertEqual(self.get_me(issue_signed_token(self.user)).status_code, 401)
+
+
+@override_settings(AUTH_SIGNED_TOKENS=True)
+class SignedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='signed@example.com', username='signed', password='TokenPass123!'
+        )
+        response = self.client.post(
+            reverse('api-token-auth'), {'username': 'signed@example.com', 'password': 'TokenPass123!'}
+        )
+        self.key = response.data['token']
+        self.url = reverse('user-me')
+
+    def get_me(self, key=None):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key or self.key}')
+
+    def test_issued_token_is_signed(self):
+        self.assertIn(':', self.key)
+        self.assertFalse(Token.objects.exists())
+
+    def test_no_token_lookup(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_me().status_code, 200)
+
+    def test_tampered_token_is_rejected(self):
+        self.assertEqual(self.get_me(self.key[:-1] + 'x').status_code, 401)
+
+    def test_password_change_revokes(self):
+        self.get_me()
+        self.user.set_password('NewPass123!')
+        self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    @override_settings(AUTH_SIGNED_TOKEN_MAX_AGE=-1)
+    def test_expired_token_is_rejected(self):
+        self.assertEqual(self.get_me().status_code, 401)
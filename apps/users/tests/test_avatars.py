@@ -0,0 +1,87 @@
+"""
+Tests for avatar variant processing
+Created by Cavin Otieno
+"""
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+
+def image_file(name='avatar.png', size=(1200, 800), mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class AvatarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, AVATAR_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(email='avatar@example.com', username='avatar', password='x')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                reverse('user-detail', args=[self.user.pk]),
+                data=encode_multipart(BOUNDARY, {'avatar': file}),
+                content_type=MULTIPART_CONTENT, **self.auth
+            )
+
+    def test_upload_generates_variants(self):
+        self.assertEqual(self.upload(image_file()).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants['source'], self.user.avatar.name)
+        with Image.open(self.user.avatar.storage.open(self.user.avatar_variants['medium']['webp'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (320, 213))
+        with Image.open(self.user.avatar.storage.open(self.user.avatar_variants['thumb']['jpeg'])) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (96, 64)))
+
+        urls = self.client.get(reverse('user-me'), **self.auth).data['avatar_urls']
+        self.assertEqual(set(urls), {'thumb', 'medium'})
+        self.assertTrue(urls['thumb']['webp'].startswith('http://testserver/media/avatars/variants/'))
+
+    def test_identical_images_share_variants(self):
+        self.upload(image_file('first.png'))
+        first = User.objects.get(pk=self.user.pk).avatar_variants
+        self.upload(image_file('second.png'))
+        second = User.objects.get(pk=self.user.pk).avatar_variants
+        self.assertNotEqual(first['source'], second['source'])
+        self.assertEqual(first['thumb'], second['thumb'])
+
+    def test_variants_are_served_immutable(self):
+        self.upload(image_file(mode='RGB'))
+        name = User.objects.get(pk=self.user.pk).avatar_variants['thumb']['webp'].rsplit('/', 1)[1]
+        response = self.client.get(reverse('avatar-variant', args=[name]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('avatar-variant', args=['missing.webp'])).status_code, 404)
+
+    def test_only_variant_names_are_served(self):
+        # avatars/ and avatars/variants/ exist from here on
+        self.upload(image_file(mode='RGB'))
+        for name in ('..', '.', f'{"0" * 20}-thumb.png', 'source.jpeg'):
+            with self.subTest(name):
+                self.assertEqual(self.client.get(reverse('avatar-variant', args=[name])).status_code, 404)
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        self.assertEqual(self.upload(image_file()).status_code, 400)
@@ -0,0 +1,95 @@
+"""
+Tests for the streamed per-user data export
+Created by Cavin Otieno
+"""
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from apps.payments.models import MpesaPayment
+from apps.subscriptions.models import Plan, Subscription
+from apps.users.export import iter_export
+from apps.users.models import Profile
+
+User = get_user_model()
+
+
+def read_archive(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return {
+            name: [json.loads(line) for line in archive.read(name).decode().splitlines()]
+            for name in archive.namelist()
+        }
+
+
+class UserExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='export@example.com', username='export', password='x')
+        Profile.objects.create(user=cls.user, city='Nairobi')
+        plan = Plan.objects.create(name='Pro', slug='pro', description='Pro', price=1000)
+        subscription = Subscription.objects.create(
+            user=cls.user, plan=plan, status='active', end_date=timezone.now() + timedelta(days=30)
+        )
+        MpesaPayment.objects.bulk_create(
+            MpesaPayment(
+                user=cls.user, subscription=subscription, amount=1000, phone_number='254700000000',
+                checkout_request_id=f'ws_CO_{n}', merchant_request_id=f'merchant-{n}', status='completed',
+                metadata={'MpesaReceiptNumber': f'R{n:06d}', 'Amount': 1000},
+            )
+            for n in range(2500)
+        )
+        cls.staff = User.objects.create_user(email='support@example.com', username='support', password='x', is_staff=True)
+
+    def test_staff_download(self):
+        token = Token.objects.create(user=self.staff)
+        response = self.client.get(
+            reverse('user-export', args=[self.user.pk]), HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('adminova-user-', response['Content-Disposition'])
+
+        files = read_archive(b''.join(response.streaming_content))
+        self.assertEqual(set(files), {
+            'user.ndjson', 'profile.ndjson', 'subscriptions.ndjson', 'payments.ndjson', 'archived_payments.ndjson',
+            'notifications.ndjson',
+        })
+        self.assertNotIn('password', files['user.ndjson'][0])
+        self.assertEqual(files['profile.ndjson'][0]['city'], 'Nairobi')
+        self.assertEqual(len(files['payments.ndjson']), 2500)
+        self.assertEqual(files['payments.ndjson'][-1]['metadata']['MpesaReceiptNumber'], 'R002499')
+
+    def test_non_staff_forbidden(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(
+            reverse('user-export', args=[self.user.pk]), HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @mock.patch('apps.users.export.FLUSH_SIZE', 1024)
+    def test_streams_in_bounded_chunks(self):
+        with self.assertNumQueries(8):  # one per file, payments in three chunks
+            chunks = list(iter_export(self.user, chunk_size=1000))
+        self.assertGreater(len(chunks), 1)
+        # About 1MB of NDJSON, never held at once
+        self.assertLess(max(len(chunk) for chunk in chunks), 64 * 1024)
+
+    def test_command_writes_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.zip')
+            call_command('export_user', 'Export@example.com', output=path, stdout=StringIO())
+            with open(path, 'rb') as handle:
+                self.assertEqual(len(read_archive(handle.read())['payments.ndjson']), 2500)
@@ -0,0 +1,55 @@
+"""
+Tests for the import_users management command
+Created by Cavin Otieno
+"""
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from apps.users.models import Profile
+
+User = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(TestCase):
+
+    def import_file(self, content, suffix, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as handle:
+            handle.write(content)
+            handle.flush()
+            output = StringIO()
+            call_command('import_users', handle.name, stdout=output, workers=1, **options)
+        return output.getvalue()
+
+    def test_csv_import_creates_users_and_profiles(self):
+        output = self.import_file(
+            'email,username,password,first_name,city\n'
+            'ann@Example.com,ann,Secret123!,Ann,Nairobi\n'
+            'ben@example.com,,,Ben,Mombasa\n',
+            '.csv', chunk_size=1,
+        )
+        ann = User.objects.get(email='ann@example.com')
+        self.assertTrue(ann.check_password('Secret123!'))
+        self.assertEqual(ann.profile.city, 'Nairobi')
+        ben = User.objects.get(username='ben@example.com')
+        self.assertFalse(ben.has_usable_password())
+        self.assertEqual(Profile.objects.count(), 2)
+        self.assertIn('Imported 2 users, skipped 0', output)
+
+    def test_ndjson_skips_duplicates_and_existing_users(self):
+        User.objects.create_user(email='existing@example.com', username='existing', password='x')
+        rows = [
+            {'email': 'existing@example.com'},
+            {'email': 'new@example.com', 'password_hash': make_password('Hashed123!')},
+            {'email': 'new@example.com'},
+            {'email': ''},
+        ]
+        output = self.import_file('\n'.join(json.dumps(row) for row in rows), '.ndjson')
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('Hashed123!'))
+        self.assertEqual(User.objects.count(), 2)
+        self.assertIn('Imported 1 users, skipped 3', output)
@@ -0,0 +1,66 @@
+"""
+Tests for the user API views
+Created by Cavin Otieno
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from apps.users.models import Profile
+
+User = get_user_model()
+
+
+class UserViewSetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='member@example.com', username='member', password='x')
+        Profile.objects.create(user=self.user, city='Nairobi')
+        self.other = User.objects.create_user(email='other@example.com', username='other', password='x')
+        self.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='x', is_staff=True
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def test_non_staff_only_see_themselves(self):
+        response = self.client.get(reverse('user-list'), **self.auth)
+        self.assertEqual([user['id'] for user in response.data['results']], [self.user.pk])
+        self.assertNotIn('profile', response.data['results'][0])
+        response = self.client.get(reverse('user-detail', args=[self.other.pk]), **self.auth)
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_see_everyone(self):
+        token = Token.objects.create(user=self.staff)
+        response = self.client.get(reverse('user-list'), HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.data['count'], 3)
+
+    def test_me_is_cached(self):
+        self.client.get(reverse('user-me'), **self.auth)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-me'), **self.auth)
+        self.assertEqual(response.data['profile']['city'], 'Nairobi')
+
+    @override_settings(ALLOWED_HOSTS=['admin.example.com', 'preview.example.com'])
+    def test_me_urls_follow_the_request_host(self):
+        User.objects.filter(pk=self.user.pk).update(
+            avatar='avatars/me.png',
+            avatar_variants={'source': 'avatars/me.png', 'thumb': {'webp': 'avatars/variants/abc-thumb.webp'}},
+        )
+        self.client.get(reverse('user-me'), HTTP_HOST='admin.example.com', **self.auth)
+        response = self.client.get(reverse('user-me'), HTTP_HOST='preview.example.com', secure=True, **self.auth)
+        self.assertEqual(response.data['avatar'], 'https://preview.example.com/media/avatars/me.png')
+        self.assertEqual(
+            response.data['avatar_urls']['thumb']['webp'],
+            'https://preview.example.com/media/avatars/variants/abc-thumb.webp',
+        )
+
+    def test_profile_save_invalidates_me(self):
+        self.client.get(reverse('user-me'), **self.auth)
+        self.client.patch(
+            reverse('user-update-profile'), data={'city': 'Kisumu'},
+            content_type='application/json', **self.auth
+        )
+        response = self.client.get(reverse('user-me'), **self.auth)
+        self.assertEqual(response.data['profile']['city'], 'Kisumu')
@@ -4,13 +4,13 @@ Created by Cavin Otieno
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework.authtoken.views import obtain_auth_token
-from .views import UserViewSet
+from apps.core.query_budget import query_budget
+from .views import ObtainTokenView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('token/', obtain_auth_token, name='api-token-auth'),
+    path('token/', query_budget(2)(ObtainTokenView.as_view()), name='api-token-auth'),
 ]
@@ -5,41 +5,120 @@ Created by Cavin Otieno
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, UserRegistrationSerializer, ProfileSerializer
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from apps.core.ratelimit import RateLimitThrottle
+from .authentication import credentials_cache_timeout, issue_signed_token
+from .export import export_filename, iter_export
+from .serializers import UserSerializer, UserListSerializer, UserRegistrationSerializer, ProfileSerializer
 from .models import Profile
+from .signals import me_cache_key
 
 User = get_user_model()
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    """ViewSet for user management"""
-    queryset = User.objects.all()
+    """
+    ViewSet for user management
+    Staff see every user; everyone else only sees (and edits) themselves.
+    """
+    # UserSerializer nests the profile
+    queryset = User.objects.select_related('profile')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'list': 3, 'retrieve': 2, 'create': 7, 'update': 3, 'partial_update': 3,
+        'destroy': 3, 'me': 1, 'update_profile': 3, 'export': 8,
+    }
     
     def get_permissions(self):
         if self.action == 'create':
             return [AllowAny()]
         return super().get_permissions()
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(pk=self.request.user.pk)
+        if self.action == 'list':
+            # The list serializer leaves out the profile
+            queryset = queryset.select_related(None).only(*UserListSerializer.Meta.fields)
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return UserRegistrationSerializer
+        if self.action == 'list':
+            return UserListSerializer
         return UserSerializer
     
     @action(detail=False, methods=['get'])
     def me(self, request):
-        """Get current user details"""
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        """
+        Get current user details
+        Token authentication already loads the user with its profile; the
+        payload is cached like credentials, until the user or profile is saved
+        (see .signals). It is cached with relative media URLs, made absolute
+        for each request as it may come through another host or scheme.
+        """
+        key = me_cache_key(request.user.pk)
+        timeout = credentials_cache_timeout()
+        data = cache.get(key) if timeout else None
+        if data is None:
+            data = dict(self.get_serializer(request.user, context={'request': None}).data)
+            if timeout:
+                cache.set(key, data, timeout)
+        return Response(self.absolute_media_urls(data, request))
+    
+    @staticmethod
+    def absolute_media_urls(data, request):
+        """Copy of a UserSerializer payload with absolute `avatar` and `avatar_urls`"""
+        return {
+            **data,
+            'avatar': data['avatar'] and request.build_absolute_uri(data['avatar']),
+            'avatar_urls': {
+                variant: {fmt: request.build_absolute_uri(url) for fmt, url in formats.items()}
+                for variant, formats in data['avatar_urls'].items()
+            },
+        }
     
     @action(detail=False, methods=['put', 'patch'])
     def update_profile(self, request):
         """Update current user profile"""
-        profile, created = Profile.objects.get_or_create(user=request.user)
+        try:
+            profile = request.user.profile
+        except Profile.DoesNotExist:
+            profile = Profile.objects.create(user=request.user)
         serializer = ProfileSerializer(profile, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request, pk=None):
+        """Stream a ZIP of NDJSON files with all data stored for the user (staff only)"""
+        user = self.get_object()
+        response = StreamingHttpResponse(iter_export(user), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(user)}"'
+        return response
+
+
+class ObtainTokenView(ObtainAuthToken):
+    """Exchange email and password for a database or, with AUTH_SIGNED_TOKENS, a signed token"""
+    # Rate limited before the password is hashed
+    throttle_classes = [RateLimitThrottle]
+    throttle_scope = 'auth.token'
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        if settings.AUTH_SIGNED_TOKENS:
+            return Response({'token': issue_signed_token(user)})
+        token, created = Token.objects.get_or_create(user=user)
+        return Response({'token': token.key})
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+"""
+End-to-end API benchmark suite for Adminova
+Seeds a local database with a reproducible dataset, serves the app
+in-process (threaded WSGI server) or under gunicorn with Daraja replaced by
+benchmarks/daraja_stub.py, drives the main flows at a fixed concurrency and
+prints throughput and p50/p95/p99 latency per flow as JSON.
+
+    python benchmarks/api_suite.py --concurrency 8 --requests 500
+    python benchmarks/api_suite.py --server gunicorn --workers 3 --output build/bench.json
+    BENCH_DB_ENGINE=postgresql DB_NAME=adminova_bench python benchmarks/api_suite.py
+
+Flows: token_auth, plan_list, initiate, callback, dashboard, payment_list.
+Compare two releases by running the same command (same --seed and sizes)
+on each and diffing the JSON.
+
+Created by Cavin Otieno
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from common import BASE_DIR, setup_django, summarize
+from daraja_stub import DarajaStub
+
+PASSWORD = 'BenchPass123!'
+FLOWS = ('token_auth', 'plan_list', 'initiate', 'callback', 'dashboard', 'payment_list')
+
+
+def seed(users, payments_per_user, pending, rng):
+    """Create a fresh dataset; returns [(email, token key, session key)]"""
+    from importlib import import_module
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+    from apps.payments.models import MpesaPayment
+    from apps.subscriptions.models import Plan, Subscription
+    from apps.users.models import Profile
+
+    User = get_user_model()
+    call_command('migrate', verbosity=0)
+    call_command('flush', interactive=False, verbosity=0)
+    call_command('load_plans', stdout=io.StringIO())  # keep stdout for the JSON report
+
+    # One hash for everyone: hashing cost belongs to the token_auth flow
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(email=f'bench{i}@example.com', username=f'bench{i}', password=password,
+             phone_number=f'2547{i:08d}')
+        for i in range(users)
+    )
+    accounts = list(User.objects.filter(email__startswith='bench').order_by('id'))
+    Profile.objects.bulk_create(Profile(user=user) for user in accounts)
+    Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in accounts)
+
+    now = timezone.now()
+    plans = list(Plan.objects.filter(is_active=True, price__gt=0))
+    active = [
+        Subscription(user=user, plan=plan, status='active', start_date=now,
+                     end_date=now + timedelta(days=plan.get_duration_days()))
+        for user, plan in ((user, rng.choice(plans)) for user in accounts)
+    ]
+    Subscription.objects.bulk_create(active)
+
+    MpesaPayment.objects.bulk_create(
+        MpesaPayment(
+            user=user, amount=rng.choice(plans).price, phone_number=user.phone_number,
+            checkout_request_id=f'ws_CO_seed_{user.id}_{n}', merchant_request_id=f'seed-{user.id}-{n}',
+            mpesa_receipt_number=f'SEED{user.id:05d}{n:04d}', status=rng.choice(['completed', 'failed']),
+            description='Seeded payment',
+        )
+        for user in accounts for n in range(payments_per_user)
+    )
+
+    # Pending payments (with trialing subscriptions) for the callback flow
+    trialing = Subscription.objects.bulk_create(
+        Subscription(user=accounts[n % users], plan=rng.choice(plans), status='trialing',
+                     start_date=now, end_date=now + timedelta(days=30))
+        for n in range(pending)
+    )
+    MpesaPayment.objects.bulk_create(
+        MpesaPayment(
+            user=subscription.user, subscription=subscription, amount=subscription.plan.price,
+            phone_number=subscription.user.phone_number, checkout_request_id=f'ws_CO_pending_{n}',
+            merchant_request_id=f'pending-{n}', description='Pending payment',
+        )
+        for n, subscription in enumerate(trialing)
+    )
+
+    tokens = dict(Token.objects.values_list('user_id', 'key'))
+    credentials = []
+    for user in accounts:
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        credentials.append((user.email, tokens[user.id], session.session_key))
+    return credentials
+
+
+def callback_payload(number):
+    return {
+        'Body': {
+            'stkCallback': {
+                'MerchantRequestID': f'pending-{number}',
+                'CheckoutRequestID': f'ws_CO_pending_{number}',
+                'ResultCode': 0,
+                'ResultDesc': 'The service request is processed successfully.',
+                'CallbackMetadata': {
+                    'Item': [
+                        {'Name': 'Amount', 'Value': 1000},
+                        {'Name': 'MpesaReceiptNumber', 'Value': f'BENCH{number:07d}'},
+                        {'Name': 'TransactionDate', 'Value': 20240101120000},
+                        {'Name': 'PhoneNumber', 'Value': 254700000000},
+                    ]
+                },
+            }
+        }
+    }
+
+
+def build_flows(base_url, credentials, plan_id):
+    """Map flow name -> callable(http session, request number) -> ok"""
+    from django.conf import settings
+
+    def account(number):
+        return credentials[number % len(credentials)]
+
+    def token_auth(http, number):
+        email = account(number)[0]
+        response = http.post(f'{base_url}/api/auth/token/', data={'username': email, 'password': PASSWORD})
+        return response.status_code == 200 and 'token' in response.json()
+
+    def plan_list(http, number):
+        return http.get(f'{base_url}/api/plans/').status_code == 200
+
+    def initiate(http, number):
+        response = http.post(
+            f'{base_url}/api/payments/mpesa/initiate/',
+            json={'phone_number': '254708374149', 'amount': 100, 'plan_id': plan_id},
+            headers={'Authorization': f'Token {account(number)[1]}'},
+        )
+        return response.status_code == 200
+
+    def callback(http, number):
+        response = http.post(f'{base_url}/api/payments/mpesa/callback/', json=callback_payload(number))
+        return response.status_code == 200 and response.json().get('ResultCode') == 0
+
+    def dashboard(http, number):
+        response = http.get(
+            f'{base_url}/dashboard/', cookies={settings.SESSION_COOKIE_NAME: account(number)[2]}, allow_redirects=False
+        )
+        return response.status_code == 200
+
+    def payment_list(http, number):
+        response = http.get(
+            f'{base_url}/api/payments/mpesa/', headers={'Authorization': f'Token {account(number)[1]}'}
+        )
+        return response.status_code == 200
+
+    return {
+        'token_auth': token_auth,
+        'plan_list': plan_list,
+        'initiate': initiate,
+        'callback': callback,
+        'dashboard': dashboard,
+        'payment_list': payment_list,
+    }
+
+
+def run_flow(flow, concurrency, requests, numbers):
+    """Closed loop: `concurrency` clients issue `requests` requests in total"""
+    import requests as http_client
+
+    samples = []
+    errors = []
+
+    def client():
+        http = http_client.Session()
+        while True:
+            number = next(numbers)
+            if number >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                ok = flow(http, number)
+            except http_client.RequestException:
+                ok = False
+            samples.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(number)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        'errors': len(errors),
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_inprocess_server():
+    from django.core.wsgi import get_wsgi_application
+
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(), server_class=ThreadingWSGIServer, handler_class=QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def start_gunicorn(port, workers, threads):
+    import requests as http_client
+
+    env = {
+        **os.environ,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_THREADS': str(threads),
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'adminova.wsgi:application'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            http_client.get(f'{base_url}/api/plans/', timeout=1)
+            break
+        except http_client.ConnectionError:
+            time.sleep(0.2)
+    else:
+        process.kill()
+        raise RuntimeError('gunicorn did not start within 30s')
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=30)
+
+    return base_url, stop
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--server', choices=['inprocess', 'gunicorn'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765, help='gunicorn port')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per flow')
+    parser.add_argument('--warmup', type=int, default=20, help='unrecorded requests per flow')
+    parser.add_argument('--flows', nargs='+', choices=FLOWS, default=list(FLOWS))
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--payments-per-user', type=int, default=20)
+    parser.add_argument('--daraja-latency-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=1, help='dataset random seed')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    stub = DarajaStub(latency_ms=args.daraja_latency_ms).start()
+    os.environ['MPESA_BASE_URL'] = stub.url
+    os.environ['BENCH_DB_PATH'] = os.environ.get('BENCH_DB_PATH', str(BASE_DIR / 'build' / 'bench.sqlite3'))
+    (BASE_DIR / 'build').mkdir(exist_ok=True)
+
+    setup_django()
+    # Always the benchmark settings, also for the gunicorn workers
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [str(BASE_DIR), os.environ.get('PYTHONPATH')]))
+
+    import django
+    django.setup()
+    from django.db import connection, connections
+    from apps.subscriptions.models import Plan
+
+    credentials = seed(args.users, args.payments_per_user, args.warmup + args.requests, random.Random(args.seed))
+    plan_id = Plan.objects.filter(is_active=True, price__gt=0).values_list('id', flat=True).first()
+    vendor = connection.vendor
+    connections.close_all()
+
+    if args.server == 'gunicorn':
+        base_url, stop = start_gunicorn(args.port, args.workers, args.threads)
+    else:
+        base_url, stop = start_inprocess_server()
+
+    flows = build_flows(base_url, credentials, plan_id)
+    results = {}
+    try:
+        for name in args.flows:
+            # Warm-up numbers come after the recorded ones so every
+            # callback still targets a distinct pending payment
+            warm = itertools.count(args.requests)
+            run_flow(flows[name], args.concurrency, args.requests + args.warmup, warm)
+            results[name] = run_flow(flows[name], args.concurrency, args.requests, itertools.count())
+    finally:
+        stop()
+        stub.shutdown()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'server': args.server,
+            'workers': args.workers if args.server == 'gunicorn' else 1,
+            'concurrency': args.concurrency,
+            'requests_per_flow': args.requests,
+            'users': args.users,
+            'payments_per_user': args.payments_per_user,
+            'daraja_latency_ms': args.daraja_latency_ms,
+            'seed': args.seed,
+            'database': vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'flows': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
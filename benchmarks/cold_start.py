@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Cold-start benchmark for the Adminova WSGI entrypoint
+Boots adminova.wsgi in fresh interpreters and times the boot and the first
+request to /test/, optionally with an import-time profile.
+
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --importtime --top 25
+    python benchmarks/cold_start.py --save-baseline benchmarks/cold_start_baseline.json
+    python benchmarks/cold_start.py --baseline benchmarks/cold_start_baseline.json --tolerance 0.25
+
+With --baseline the script exits non-zero when the median cold start
+regresses by more than the tolerance, so it can gate CI.
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from common import BASE_DIR
+
+PROBE = r'''
+import io, json, sys, time
+started = time.perf_counter()
+from adminova.wsgi import application
+booted = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/test/', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1',
+    'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}
+statuses = []
+b''.join(application(environ, lambda status, headers: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({
+    'status': statuses[0],
+    'boot_ms': (booted - started) * 1000,
+    'first_request_ms': (served - booted) * 1000,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def run_probe(settings_module, importtime=False):
+    """Run the probe in a fresh interpreter and return (result, stderr)"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE]
+    completed = subprocess.run(
+        command, cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def import_profile(stderr, top):
+    """Parse `-X importtime` output into the slowest modules by cumulative time"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append({
+            'module': module.strip(),
+            'self_ms': round(int(self_us) / 1000, 2),
+            'cumulative_ms': round(int(cumulative_us) / 1000, 2),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--settings', default='adminova.settings.local')
+    parser.add_argument('--importtime', action='store_true', help='include an import-time profile')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--baseline', help='fail if slower than this baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', help='write the results to this path')
+    args = parser.parse_args()
+
+    samples = [run_probe(args.settings)[0] for _ in range(args.runs)]
+    totals = [s['boot_ms'] + s['first_request_ms'] for s in samples]
+    results = {
+        'runs': args.runs,
+        'status': samples[0]['status'],
+        'modules': samples[0]['modules'],
+        'boot_ms': round(statistics.median(s['boot_ms'] for s in samples), 2),
+        'first_request_ms': round(statistics.median(s['first_request_ms'] for s in samples), 2),
+        'cold_start_ms': round(statistics.median(totals), 2),
+    }
+    if args.importtime:
+        results['import_profile'] = import_profile(run_probe(args.settings, importtime=True)[1], args.top)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        limit = baseline['cold_start_ms'] * (1 + args.tolerance)
+        results['baseline_ms'] = baseline['cold_start_ms']
+        results['regressed'] = results['cold_start_ms'] > limit
+        exit_code = 1 if results['regressed'] else 0
+
+    print(json.dumps(results, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as handle:
+            json.dump({k: v for k, v in results.items() if k != 'import_profile'}, handle, indent=2)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
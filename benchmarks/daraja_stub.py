@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Safaricom Daraja API
+Answers the OAuth and STK Push endpoints MpesaService calls, with an
+optional fixed latency, so benchmarks never reach Safaricom. Point
+MPESA_BASE_URL at it:
+
+    python benchmarks/daraja_stub.py --port 8900 --latency-ms 150
+    MPESA_BASE_URL=http://127.0.0.1:8900 python manage.py runserver
+
+Created by Cavin Otieno
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DarajaStubHandler(BaseHTTPRequestHandler):
+    """OAuth token and STK Push responses shaped like Daraja's"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, payload, status=200):
+        time.sleep(self.server.latency)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/oauth/v1/generate'):
+            self._reply({'access_token': 'stub-access-token', 'expires_in': '3599'})
+        else:
+            self._reply({'errorMessage': 'Not found'}, status=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.startswith('/mpesa/stkpush/v1/processrequest'):
+            number = next(self.server.counter)
+            self._reply({
+                'MerchantRequestID': f'stub-merchant-{number}',
+                'CheckoutRequestID': f'ws_CO_stub_{number}',
+                'ResponseCode': '0',
+                'ResponseDescription': 'Success. Request accepted for processing',
+                'CustomerMessage': 'Success. Request accepted for processing',
+            })
+        else:
+            self._reply({'errorMessage': 'Not found'}, status=404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DarajaStub(ThreadingHTTPServer):
+    """Threaded stub server; `url` is the value for MPESA_BASE_URL"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0):
+        super().__init__((host, port), DarajaStubHandler)
+        self.latency = latency_ms / 1000
+        # Unique IDs across runs against the same database
+        self.counter = itertools.count(int(time.time() * 1000))
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serve on a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    stub = DarajaStub(args.host, args.port, args.latency_ms)
+    print(f'Daraja stub listening on {stub.url}')
+    stub.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
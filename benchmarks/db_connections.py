@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Database connection reuse benchmark for Adminova
+Compares per-request latency with a fresh connection per request
+(CONN_MAX_AGE=0) against persistent connections with health checks.
+
+Run against a local PostgreSQL, e.g. the docker-compose `db` service:
+
+    docker compose up -d db
+    DB_NAME=adminova DB_USER=postgres DB_PASSWORD=postgres DB_HOST=localhost \\
+        python benchmarks/db_connections.py --requests 500
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import time
+
+from common import setup_django, summarize
+
+setup_django()
+
+import django  # noqa: E402
+from decouple import config  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES['default'] = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': config('DB_NAME', default='adminova'),
+    'USER': config('DB_USER', default='postgres'),
+    'PASSWORD': config('DB_PASSWORD', default='postgres'),
+    'HOST': config('DB_HOST', default='localhost'),
+    'PORT': config('DB_PORT', default='5432'),
+    'OPTIONS': {
+        'sslmode': config('DB_SSLMODE', default='prefer'),
+    },
+}
+django.setup()
+
+from django.core.signals import request_finished, request_started  # noqa: E402
+from django.db import connection  # noqa: E402
+
+
+def run_mode(conn_max_age, health_checks, requests):
+    """Simulate `requests` request cycles, each running one short query"""
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=None)
+        samples.append(time.perf_counter() - started)
+    connection.close()
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    results = {
+        'per_request_connection': run_mode(0, False, args.requests),
+        'persistent_with_health_checks': run_mode(600, True, args.requests),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
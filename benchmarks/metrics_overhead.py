@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+MetricsMiddleware overhead benchmark
+Times a trivial view that runs one query and one cache lookup, called
+directly and through MetricsMiddleware, and reports the added cost.
+
+    python benchmarks/metrics_overhead.py --requests 20000
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import time
+
+from common import setup_django, summarize
+
+setup_django()
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES['default']['NAME'] = ':memory:'
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+from apps.core.middleware import MetricsMiddleware  # noqa: E402
+
+
+def view(request):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    cache.get('benchmark')
+    return HttpResponse('ok')
+
+
+def run(handler, request, requests):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        handler(request)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    request = RequestFactory().get('/api/plans/')
+    request.resolver_match = resolve('/api/plans/')
+
+    run(view, request, 1000)  # warm up
+    baseline = run(view, request, args.requests)
+    instrumented = run(MetricsMiddleware(view), request, args.requests)
+    print(json.dumps({
+        'without_middleware': baseline,
+        'with_middleware': instrumented,
+        'overhead_us_mean': round((instrumented['mean_ms'] - baseline['mean_ms']) * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Statement reconciliation benchmark
+Seeds --payments completed payments, writes an M-Pesa statement of --lines
+rows (mostly our receipts, some other receipts and charges, a few amount
+mismatches) and times `manage.py reconcile_statement` on it.
+
+    python benchmarks/reconcile.py --lines 1000000 --payments 500000
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from common import setup_django
+
+os.environ.setdefault('BENCH_DB_PATH', ':memory:')
+setup_django('benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from datetime import timedelta  # noqa: E402
+from io import StringIO  # noqa: E402
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from apps.payments.models import MpesaPayment  # noqa: E402
+
+User = get_user_model()
+
+
+def seed(payments, start):
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user(email='payer@example.com', username='payer', password='x')
+    for offset in range(0, payments, 10000):
+        MpesaPayment.objects.bulk_create(
+            MpesaPayment(
+                user=user, amount=1000, phone_number='254700000000', status='completed', result_code=0,
+                checkout_request_id=f'ws_CO_{n}', merchant_request_id=f'merchant-{n}',
+                mpesa_receipt_number=f'Q{n:09d}', transaction_date=start + timedelta(seconds=n),
+            )
+            for n in range(offset, min(offset + 10000, payments))
+        )
+
+
+def write_statement(path, lines, payments, start):
+    rng = random.Random(42)
+    with open(path, 'w') as handle:
+        handle.write('Account Holder:,ADMINOVA LTD\n\n')
+        handle.write('Receipt No.,Completion Time,Initiation Time,Details,Transaction Status,Paid In,Withdrawn,Balance\n')
+        for n in range(lines):
+            when = f'{start + timedelta(seconds=n):%Y-%m-%d %H:%M:%S}'
+            if n % 20 == 19:
+                handle.write(f'C{n:09d},{when},{when},Business Charge,Completed,,-30.00,0.00\n')
+                continue
+            receipt = f'Q{n:09d}' if n < payments else f'X{n:09d}'
+            amount = '1,000.00' if rng.random() > 0.001 else '900.00'
+            handle.write(f'{receipt},{when},{when},Pay Bill from 2547XXXXXXXX,Completed,"{amount}",,0.00\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--payments', type=int, default=500000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    start = timezone.now() - timedelta(days=30)
+    seed(args.payments, start)
+    with tempfile.TemporaryDirectory() as directory:
+        statement = os.path.join(directory, 'statement.csv')
+        write_statement(statement, args.lines, args.payments, start)
+        out = StringIO()
+        started = time.perf_counter()
+        call_command(
+            'reconcile_statement', statement, report=os.path.join(directory, 'report.csv'),
+            chunk_size=args.chunk_size, stdout=out,
+        )
+        elapsed = time.perf_counter() - started
+    print(out.getvalue())
+    print(json.dumps({'lines': args.lines, 'payments': args.payments, 'seconds': round(elapsed, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
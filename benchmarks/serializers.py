@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+List serialization benchmark
+Seeds load data with seed_load_data and times turning --rows payments,
+subscriptions and plans into a response body three ways: ModelSerializer
+with DRF's JSONRenderer (before), RowSerializer over .values() with
+JSONRenderer, and RowSerializer with ORJSONRenderer (what the list
+endpoints use now). Checks the three bodies are identical.
+
+    python benchmarks/serializers.py --rows 1000 --repeat 20
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import os
+import time
+
+from common import setup_django, summarize
+
+os.environ.setdefault('BENCH_DB_PATH', ':memory:')
+setup_django('benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from io import StringIO  # noqa: E402
+
+from django.core.management import call_command  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from apps.core.renderers import ORJSONRenderer  # noqa: E402
+from apps.core.serializers import row_serializer  # noqa: E402
+from apps.payments.models import MpesaPayment  # noqa: E402
+from apps.payments.serializers import MpesaPaymentSerializer  # noqa: E402
+from apps.subscriptions.models import Plan, Subscription  # noqa: E402
+from apps.subscriptions.serializers import PlanSerializer, SubscriptionSerializer  # noqa: E402
+
+
+def model_serializer(serializer_class, queryset, rows):
+    return JSONRenderer().render(serializer_class(queryset[:rows], many=True).data)
+
+
+def values_rows(serializer_class, queryset, rows, renderer):
+    converter = row_serializer(serializer_class)
+    return renderer.render(converter.serialize(converter.values(queryset)[:rows]))
+
+
+def run(body, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per response, as a page size')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    call_command('seed_load_data', users=args.rows * 2, payments=args.rows * 2, stdout=StringIO())
+
+    results = {}
+    for name, serializer_class, queryset in [
+        ('payments', MpesaPaymentSerializer, MpesaPayment.objects.all()),
+        ('subscriptions', SubscriptionSerializer, Subscription.objects.select_related('plan')),
+        ('plans', PlanSerializer, Plan.objects.all()),
+    ]:
+        ways = {
+            'model_serializer': lambda: model_serializer(serializer_class, queryset, args.rows),
+            'values': lambda: values_rows(serializer_class, queryset, args.rows, JSONRenderer()),
+            'values_orjson': lambda: values_rows(serializer_class, queryset, args.rows, ORJSONRenderer()),
+        }
+        bodies = {way: body() for way, body in ways.items()}
+        timings = {way: run(body, args.repeat) for way, body in ways.items()}
+        results[name] = {
+            'rows': min(args.rows, queryset.count()),
+            'identical': len(set(bodies.values())) == 1,
+            **timings,
+            'speedup': round(timings['model_serializer']['mean_ms'] / timings['values_orjson']['mean_ms'], 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
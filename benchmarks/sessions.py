@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Session backend benchmark
+Logs a subscriber and a non-subscriber in under each session strategy
+(SESSION_ENGINES) and reports queries, session table queries and latency
+per dashboard page. The non-subscriber is redirected to /pricing/ with a
+flash message, then loads /pricing/.
+
+    python benchmarks/sessions.py --requests 200
+
+Created by Cavin Otieno
+"""
+import argparse
+import json
+import os
+import time
+
+from common import setup_django, summarize
+
+os.environ.setdefault('BENCH_DB_PATH', ':memory:')
+setup_django('benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from datetime import timedelta  # noqa: E402
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from apps.subscriptions.models import Plan, Subscription  # noqa: E402
+
+User = get_user_model()
+
+
+def seed():
+    call_command('migrate', verbosity=0)
+    call_command('load_plans', stdout=open(os.devnull, 'w'))
+    subscriber = User.objects.create_user(email='subscriber@example.com', username='subscriber', password='x')
+    visitor = User.objects.create_user(email='visitor@example.com', username='visitor', password='x')
+    plan = Plan.objects.filter(is_active=True).first()
+    now = timezone.now()
+    Subscription.objects.create(
+        user=subscriber, plan=plan, status='active', start_date=now, end_date=now + timedelta(days=30)
+    )
+    return subscriber, visitor
+
+
+def measure(client, path, requests):
+    queries, session_queries, samples = [], [], []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - started)
+        queries.append(len(context.captured_queries))
+        session_queries.append(sum('django_session' in query['sql'] for query in context.captured_queries))
+    return {
+        'queries_per_page': round(sum(queries) / requests, 2),
+        'session_queries_per_page': round(sum(session_queries) / requests, 2),
+        **summarize(samples),
+    }
+
+
+def run(engine, subscriber, visitor, requests):
+    with override_settings(SESSION_ENGINE=engine):
+        cache.clear()
+        member, guest = Client(HTTP_HOST='localhost'), Client(HTTP_HOST='localhost')
+        member.force_login(subscriber)
+        guest.force_login(visitor)
+        for client, path in [(member, '/dashboard/'), (guest, '/dashboard/'), (guest, '/pricing/')]:
+            client.get(path)  # warm up
+        return {
+            'dashboard': measure(member, '/dashboard/', requests),
+            # Redirect with a flash message, then the page showing it
+            'redirect': measure(guest, '/dashboard/', requests),
+            'pricing': measure(guest, '/pricing/', requests),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--strategies', default=','.join(settings.SESSION_ENGINES))
+    args = parser.parse_args()
+
+    subscriber, visitor = seed()
+    print(json.dumps({
+        strategy: run(settings.SESSION_ENGINES[strategy], subscriber, visitor, args.requests)
+        for strategy in args.strategies.split(',')
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
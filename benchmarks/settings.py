@@ -0,0 +1,59 @@
+"""
+Settings for benchmarks/api_suite.py
+Production-like (DEBUG off, quiet logging) against a local seeded database
+and the Daraja stub. Shared by the in-process server and gunicorn workers
+through environment variables.
+Created by Cavin Otieno
+"""
+import os
+
+from adminova.settings.base import *  # noqa: F401,F403
+from adminova.settings.base import BASE_DIR, TEMPLATES
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+# PostgreSQL (DB_* variables) with BENCH_DB_ENGINE=postgresql, otherwise
+# a SQLite file created by the seed step
+if os.environ.get('BENCH_DB_ENGINE', 'sqlite') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'adminova_bench'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_DB_PATH', str(BASE_DIR / 'build' / 'bench.sqlite3')),
+            'CONN_MAX_AGE': 600,
+            'OPTIONS': {'timeout': 30},
+        }
+    }
+
+MPESA_BASE_URL = os.environ.get('MPESA_BASE_URL', 'http://127.0.0.1:8900')
+MPESA_CONSUMER_KEY = 'bench-key'
+MPESA_CONSUMER_SECRET = 'bench-secret'
+MPESA_PASSKEY = 'bench-passkey'
+MPESA_CALLBACK_URL = 'http://127.0.0.1/api/payments/mpesa/callback/'
+
+# The project ships no dashboard templates yet; fall back to a minimal one
+# that renders the same context, after any real templates/ directory
+TEMPLATES[0]['DIRS'] = [*TEMPLATES[0]['DIRS'], BASE_DIR / 'benchmarks' / 'templates']
+
+# No collectstatic step before a run
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'null': {'class': 'logging.NullHandler'}},
+    'root': {'handlers': ['null'], 'level': 'WARNING'},
+}
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for Adminova
+Sizes workers and threads against the database connection budget
+Created by Cavin Otieno
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Worker processes (WEB_CONCURRENCY is the usual platform convention)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# With persistent connections (CONN_MAX_AGE) every worker thread holds one
+# database connection, so the pool size is workers * threads. Derive the
+# thread count from the connection budget so the total never exceeds it.
+db_max_connections = int(os.environ.get('DB_MAX_CONNECTIONS', workers * 4))
+threads = int(os.environ.get('GUNICORN_THREADS', max(1, db_max_connections // workers)))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    """Start from empty per-worker metrics snapshots"""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Warm each worker before it accepts requests"""
+    from adminova.warmup import warmup
+
+    # gthread workers serve requests from a thread pool, so a DB connection
+    # opened on the main thread would never be reused
+    timings = warmup(connect_database=worker_class == 'sync')
+    worker.log.info('Worker warmed up: %s', timings)
+
+
+def worker_exit(server, worker):
+    """Write the final metrics snapshot of a recycled or stopped worker"""
+    if os.environ.get('METRICS_DIR'):
+        from apps.core.metrics import registry
+
+        registry.flush(force=True)
+
+
+def child_exit(server, worker):
+    """Fold the exited worker's metrics snapshot into the aggregate (runs in the master)"""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        from apps.core.metrics import absorb_snapshot
+
+        absorb_snapshot(metrics_dir, worker.pid)
@@ -12,6 +12,10 @@ export DJANGO_SETTINGS_MODULE=adminova.settings.production
 echo "📊 Running database migrations..."
 python manage.py migrate --noinput
 
+# Precompute the OpenAPI schema so it is served as a static asset
+echo "📘 Generating OpenAPI schema..."
+python manage.py build_openapi_schema
+
 # Collect static files
 echo "📁 Collecting static files..."
 python manage.py collectstatic --noinput